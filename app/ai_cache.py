@@ -0,0 +1,163 @@
+"""
+Keyed cache for AI match analyses (SQLite).
+
+The key hashes the normalized matches (team ids + kickoff day), the model and
+PROMPT_VERSION, so reordering, whitespace or name spelling changes still hit.
+An entry stops being served AI_CACHE_GRACE after the last kickoff it covers
+(expired rows are cache misses but stay in the AI history); the least recently
+used entries are dropped beyond AI_CACHE_MAX_ENTRIES.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from teams import team_id
+
+try:
+    from zoneinfo import ZoneInfo
+    MSK = ZoneInfo("Europe/Moscow")
+except Exception:
+    MSK = timezone(timedelta(hours=3))  # No tz database: Moscow has been UTC+3 year-round since 2014
+
+AI_CACHE_DB = os.getenv("AI_CACHE_DB", "data/ai_cache.db")
+AI_CACHE_MAX_ENTRIES = int(os.getenv("AI_CACHE_MAX_ENTRIES", "500"))
+AI_CACHE_GRACE = 3600 * 2          # A pre-match analysis is stale 2h after kickoff
+AI_CACHE_DEFAULT_TTL = 3600 * 24   # Requests without a kickoff date
+PROMPT_VERSION = 1                 # Bump when the analysis prompt changes
+
+DATE_RE = re.compile(r"(\d{4}-\d{2}-\d{2})(?:[ T](\d{1,2}:\d{2}))?")
+
+MIGRATIONS = [
+    '''CREATE TABLE IF NOT EXISTS ai_cache
+       (key TEXT PRIMARY KEY, matches TEXT, model TEXT, analysis TEXT,
+        created REAL, last_used REAL, expires_at REAL)''',
+    "CREATE INDEX IF NOT EXISTS idx_ai_cache_last_used ON ai_cache (last_used)",
+    "CREATE INDEX IF NOT EXISTS idx_ai_cache_expires ON ai_cache (expires_at)",
+]
+
+
+# ========================================
+# KEYS
+# ========================================
+def parse_match_line(line):
+    """'Home vs Away | Date: 2026-02-08 20:00 (MSK) | League: X' -> dict (missing parts empty/None)"""
+    parts = [p.strip() for p in str(line).split("|")]
+    teams = re.split(r"\s+(?:vs\.?|v|-)\s+", parts[0], maxsplit=1, flags=re.IGNORECASE)
+    home, away = (teams + [""])[:2]
+    kickoff, league = None, ""
+    for part in parts[1:]:
+        label, _, value = part.partition(":")
+        if label.strip().lower() == "date":
+            m = DATE_RE.search(value)
+            if m:
+                kickoff = datetime.strptime(f"{m.group(1)} {m.group(2) or '00:00'}", "%Y-%m-%d %H:%M")
+        elif label.strip().lower() == "league":
+            league = value.strip()
+    return {"home": home.strip(), "away": away.strip(), "kickoff": kickoff, "league": league}
+
+
+def match_key(line):
+    """Normalized identity of one match line: team ids + kickoff day"""
+    m = parse_match_line(line)
+    if not m["home"] or not m["away"]:
+        return " ".join(str(line).lower().split())
+    day = m["kickoff"].strftime("%Y-%m-%d") if m["kickoff"] else ""
+    return f"{team_id(m['home'])}-{team_id(m['away'])}@{day}"
+
+
+def analysis_key(matches, model, prompt_version=PROMPT_VERSION):
+    payload = json.dumps([prompt_version, model, sorted(match_key(m) for m in matches)])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def expires_at(matches, now=None):
+    """Epoch seconds when the analysis goes stale (kickoffs are naive MSK times)"""
+    now = now or time.time()
+    kickoffs = [k for k in (parse_match_line(m)["kickoff"] for m in matches) if k]
+    if not kickoffs:
+        return now + AI_CACHE_DEFAULT_TTL
+    return max(kickoffs).replace(tzinfo=MSK).timestamp() + AI_CACHE_GRACE
+
+
+# ========================================
+# STORE
+# ========================================
+class AnalysisCache:
+    def __init__(self, db_file=AI_CACHE_DB, max_entries=AI_CACHE_MAX_ENTRIES):
+        if os.path.dirname(db_file):
+            os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, stmt in enumerate(MIGRATIONS[version:], start=version + 1):
+                with self._conn:
+                    self._conn.execute(stmt)
+                    self._conn.execute(f"PRAGMA user_version = {target}")
+
+    def get(self, key):
+        """Cached entry dict, or None if missing/expired (a hit refreshes its LRU stamp)"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT matches, model, analysis, created FROM ai_cache WHERE key=? AND expires_at > ?",
+                (key, now)).fetchone()
+            if not row:
+                return None
+            self._conn.execute("UPDATE ai_cache SET last_used=? WHERE key=?", (now, key))
+        return {"matches": json.loads(row[0]), "model": row[1], "analysis": row[2], "timestamp": row[3]}
+
+    def put(self, key, matches, model, analysis, expires=None):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ai_cache (key, matches, model, analysis, created, last_used, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(list(matches), ensure_ascii=False), model, analysis, now, now,
+                 expires if expires is not None else expires_at(matches, now)))
+            self._evict(now)
+        return now
+
+    def _evict(self, now):
+        # Only the size bound deletes: expired analyses remain in history()
+        self._conn.execute(
+            "DELETE FROM ai_cache WHERE key IN "
+            "(SELECT key FROM ai_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def history(self):
+        """All stored analyses, expired included, newest first (shape of the old ai_history.json)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT matches, model, analysis, created FROM ai_cache ORDER BY created DESC").fetchall()
+        return [{
+            "matches": json.loads(r[0]),
+            "matches_key": sorted(json.loads(r[0])),
+            "model": r[1],
+            "analysis": r[2],
+            "timestamp": r[3],
+            "date_str": datetime.fromtimestamp(r[3]).strftime("%Y-%m-%d %H:%M"),
+        } for r in rows]
+
+    def delete(self, timestamp=None, delete_all=False):
+        """Returns the number of deleted entries"""
+        with self._lock, self._conn:
+            if delete_all:
+                cur = self._conn.execute("DELETE FROM ai_cache")
+            elif timestamp:
+                cur = self._conn.execute("DELETE FROM ai_cache WHERE ABS(created - ?) <= 0.001", (timestamp,))
+            else:
+                return 0
+        return cur.rowcount
+
+
+ai_cache = AnalysisCache()
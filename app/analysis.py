@@ -0,0 +1,269 @@
+"""
+Match analysis pipeline: one LLM request per match, run concurrently.
+
+Each match is cached on its own (app.ai_cache), so a repeated match costs
+nothing and one failed match does not discard the others. Results are
+yielded as they land:
+    stream_analyses()  async generator (API streaming endpoint, async callers)
+    iter_analyses()    the same as a plain generator (dashboard, bot_runner)
+    analyze_matches()  all results, in input order
+structured=True asks for JSON validated against MatchAnalysis, so callers
+read typed fields from result["data"] instead of scraping the text.
+"""
+
+import os
+import queue
+import asyncio
+import threading
+from functools import lru_cache
+from typing import List
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from app.ai_cache import ai_cache, analysis_key, PROMPT_VERSION
+
+AI_CONCURRENCY = int(os.getenv("AI_CONCURRENCY", "4"))   # LLM requests in flight
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT", "60"))         # Seconds per request
+
+SYSTEM_PROMPT = "Ты профессиональный спортивный аналитик, специализирующийся на футбольной статистике."
+
+
+def resolve_model(model: str):
+    """(api_key, base_url, model_id) for the dashboard's model choice"""
+    if "Perplexity" in model or "Sonar" in model:
+        return os.getenv("PERPLEXITY_API_KEY"), "https://api.perplexity.ai", "sonar"  # prev. sonar-medium-online
+    return os.getenv("OPENAI_API_KEY"), None, "gpt-4o-mini"  # User requested this as backup
+
+
+@lru_cache(maxsize=4)
+def openai_client(api_key, base_url=None):
+    """Shared blocking client per provider (thread-safe; reuses its HTTP pool)"""
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, base_url=base_url, timeout=AI_TIMEOUT)
+
+
+def analysis_prompt(matches):
+    matches_text = "\n".join(matches)
+    # Enhanced prompt in Russian
+    return f"""
+🤖 АНАЛИЗ МАТЧЕЙ (ТМ 3.5)
+
+📋 МАТЧИ ДЛЯ АНАЛИЗА (Формат: Матч | Date: ... | League: ...):
+{matches_text}
+
+📊 ЗАДАЧА: Для КАЖДОГО из перечисленных матчей дай прогноз.
+Твой ответ ДОЛЖЕН содержать ровно столько блоков "⚽", сколько матчей в списке.
+
+⚠️ КРИТИЧЕСКИ ВАЖНО ПРО ДАТЫ И ЛИГИ:
+1. Во входных строках указана точная "Date" и "League". ИСПОЛЬЗУЙ ИМЕННО ИХ.
+2. НЕ ВЫДУМЫВАЙ даты. Если написано "Date: 2026-02-08...", то в ответе пиши "8.02".
+3. Учитывай специфику лиги (League) при анализе (например, Аргентина = часто ТМ).
+
+ФОРМАТ ОТВЕТА (СТРОГО СОБЛЮДАЙ):
+⚽ [Название Команды 1] vs [Название Команды 2] (на Русском)
+📅 ДАТА: [Число.Месяц Время] МСК
+
+🎯 СЧЕТА:
+💎 [Счет 1] (40%)
+🔹 [Счет 2] (30%)
+🔹 [Счет 3] (20%)
+
+📉 ТМ 3.5: [Процент]%
+🛡️ УВЕРЕННОСТЬ: [X]/10
+📝 ПРИЧИНА: [Твой анализ, учитывающий Лигу и форму команд...]
+
+ДОПОЛНИТЕЛЬНЫЕ ТРЕБОВАНИЯ:
+1. Если информации о матче мало — НЕ ОТКАЗЫВАЙСЯ, сделай оценку по силе лиги/команд.
+2. ПРИДУМАЙ наиболее вероятный исход, если данных нет.
+3. Названия команд пиши СТРОГО НА РУССКОМ.
+4. Не используй ссылки [1][2].
+5. Обязательно используй разделитель ⚽.
+    """
+
+
+# ========================================
+# STRUCTURED OUTPUT
+# ========================================
+class ScorePick(BaseModel):
+    score: str = Field(pattern=r"^\d{1,2}:\d{1,2}$")
+    probability: float = Field(ge=0, le=100)
+
+    @field_validator("probability", mode="before")
+    @classmethod
+    def _strip_percent(cls, v):
+        return v.strip().rstrip("%") if isinstance(v, str) else v
+
+
+class MatchAnalysis(BaseModel):
+    match: str                                    # "Команда 1 vs Команда 2" (Russian)
+    date: str = ""                                # "8.02 20:00" MSK
+    scores: List[ScorePick] = Field(min_length=1, max_length=5)
+    under35_pct: float = Field(ge=0, le=100)
+    confidence: int = Field(ge=1, le=10)
+    reason: str = ""
+
+    @field_validator("under35_pct", mode="before")
+    @classmethod
+    def _strip_percent(cls, v):
+        return v.strip().rstrip("%") if isinstance(v, str) else v
+
+
+STRUCTURED_PROMPT_VERSION = f"{PROMPT_VERSION}-json"
+
+
+def structured_prompt(match):
+    return (
+        "🤖 АНАЛИЗ МАТЧА (ТМ 3.5)\n\n"
+        "📋 МАТЧ (Формат: Матч | Date: ... | League: ...):\n"
+        f"{match}\n\n"
+        "Верни ТОЛЬКО JSON-объект с полями:\n"
+        '- "match": "Команда 1 vs Команда 2" (названия СТРОГО НА РУССКОМ)\n'
+        '- "date": "Число.Месяц Время" по МСК, ИМЕННО из строки Date (не выдумывай)\n'
+        '- "scores": ровно 3 объекта {"score": "1:0", "probability": 40}, по убыванию вероятности\n'
+        '- "under35_pct": вероятность ТМ 3.5 в процентах (число 0-100)\n'
+        '- "confidence": уверенность, целое 1-10\n'
+        '- "reason": краткий анализ с учётом лиги (League) и формы команд\n\n'
+        "Если информации мало — НЕ ОТКАЗЫВАЙСЯ, оцени по силе лиги/команд. Не используй ссылки [1][2]."
+    )
+
+
+def render_analysis(data):
+    """MatchAnalysis dict -> the ⚽ text block format of the free-text mode"""
+    lines = [f"⚽ {data['match']}", f"📅 ДАТА: {data['date']} МСК", "", "🎯 СЧЕТА:"]
+    for i, pick in enumerate(data["scores"]):
+        lines.append(f"{'💎' if i == 0 else '🔹'} {pick['score']} ({pick['probability']:g}%)")
+    lines += ["", f"📉 ТМ 3.5: {data['under35_pct']:g}%", f"🛡️ УВЕРЕННОСТЬ: {data['confidence']}/10",
+              f"📝 ПРИЧИНА: {data['reason']}"]
+    return "\n".join(lines)
+
+
+# ========================================
+# PIPELINE
+# ========================================
+def _result(index, match, model_id, analysis=None, cached=False, error=None, data=None):
+    return {"index": index, "match": match, "model": model_id,
+            "analysis": analysis, "cached": cached, "error": error, "data": data}
+
+
+def _finish(index, match, model_id, content, structured, cached=False):
+    """Result from raw model (or cached) content; structured content is validated here"""
+    if not structured:
+        return _result(index, match, model_id, analysis=content, cached=cached)
+    try:
+        data = MatchAnalysis.model_validate_json(content).model_dump()
+    except ValidationError as e:
+        return _result(index, match, model_id, error=f"Invalid structured output: {e.errors()[0]['msg']}")
+    return _result(index, match, model_id, analysis=render_analysis(data), cached=cached, data=data)
+
+
+async def _analyze_one(client, semaphore, index, match, model_id, key, structured):
+    if structured:
+        prompt = structured_prompt(match)
+        extra = {"response_format": {"type": "json_schema", "json_schema": {
+            "name": "match_analysis", "schema": MatchAnalysis.model_json_schema()}}}
+    else:
+        prompt, extra = analysis_prompt([match]), {}
+
+    async with semaphore:
+        try:
+            response = await client.chat.completions.create(
+                model=model_id,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1,  # Deterministic
+                **extra
+            )
+            content = response.choices[0].message.content
+        except Exception as e:
+            return _result(index, match, model_id, error=str(e))
+
+    result = _finish(index, match, model_id, content, structured)
+    if result["error"]:
+        return result  # Never cache output that failed validation
+    try:
+        ai_cache.put(key, [match], model_id, content)
+    except Exception as e:
+        print(f"Cache Save Error: {e}")
+    return result
+
+
+async def stream_analyses(matches, model="gpt-4o-mini", concurrency=AI_CONCURRENCY, structured=False):
+    """
+    Yields one result dict per match as soon as it is ready (cache hits first).
+    structured=True: JSON output validated into MatchAnalysis, in result["data"].
+    """
+    api_key, base_url, model_id = resolve_model(model)
+    prompt_version = STRUCTURED_PROMPT_VERSION if structured else PROMPT_VERSION
+    pending = []
+    for index, match in enumerate(matches):
+        key = analysis_key([match], model_id, prompt_version)
+        item = ai_cache.get(key)
+        if item:
+            yield _finish(index, match, model_id, item["analysis"], structured, cached=True)
+        else:
+            pending.append((index, match, key))
+    if not pending:
+        return
+
+    try:
+        from openai import AsyncOpenAI
+        client = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=AI_TIMEOUT)
+    except Exception as e:
+        for index, match, _ in pending:
+            yield _result(index, match, model_id, error=str(e))
+        return
+
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [asyncio.create_task(_analyze_one(client, semaphore, index, match, model_id, key, structured))
+             for index, match, key in pending]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await client.close()
+
+
+def iter_analyses(matches, model="gpt-4o-mini", concurrency=AI_CONCURRENCY, structured=False):
+    """Blocking generator over stream_analyses (runs the event loop on a helper thread)"""
+    results = queue.Queue()
+    done = object()
+
+    async def pump():
+        async for result in stream_analyses(matches, model, concurrency, structured):
+            results.put(result)
+
+    def run():
+        try:
+            asyncio.run(pump())
+        except Exception as e:
+            results.put(e)
+        finally:
+            results.put(done)
+
+    threading.Thread(target=run, daemon=True, name="ai-analysis").start()
+    while True:
+        item = results.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def analyze_matches(matches, model="gpt-4o-mini", concurrency=AI_CONCURRENCY, structured=False):
+    """All per-match results, in input order"""
+    return sorted(iter_analyses(matches, model, concurrency, structured), key=lambda r: r["index"])
+
+
+def combine_analyses(results):
+    """Per-match texts joined into one ⚽-separated analysis (input order)"""
+    blocks = []
+    for r in sorted(results, key=lambda r: r["index"]):
+        if r["analysis"]:
+            text = r["analysis"].strip()
+            blocks.append(text if text.startswith("⚽") else f"⚽ {text}")
+        else:
+            blocks.append(f"⚽ {r['match']}\n❌ AI Analysis Error: {r['error']}")
+    return "\n\n".join(blocks)
@@ -0,0 +1,109 @@
+"""
+In-process scan jobs.
+
+The scanner is imported once and run on a background executor, so its
+caches (odds DB connection, CSV store, form tables) stay warm between scans
+and API workers are never blocked while a scan runs.
+"""
+
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_JOBS_KEPT = 50  # Finished jobs remembered for status queries
+
+
+class ScanJob:
+    def __init__(self, days: int, incremental: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.days = days
+        self.incremental = incremental
+        self.status = "queued"  # queued -> running -> success | failed
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.leagues = {}       # league -> {"status", "seconds", "signals", "error"}
+        self.total = None       # Leagues in this scan, known once the scanner is loaded
+        self.found = None
+        self.error = None
+        self.done = threading.Event()
+
+    def on_progress(self, league, status, **info):
+        self.leagues[league] = dict(self.leagues.get(league, {}), status=status, **info)
+
+    def to_dict(self):
+        leagues = dict(self.leagues)  # Snapshot: scan threads keep updating it
+        finished_leagues = sum(1 for l in leagues.values() if l["status"] in ("done", "timeout", "failed"))
+        return {
+            "job_id": self.id,
+            "days": self.days,
+            "incremental": self.incremental,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "elapsed": round((self.finished or time.time()) - self.started, 2) if self.started else None,
+            "progress": {"done": finished_leagues, "total": self.total},
+            "leagues": leagues,
+            "found": self.found,
+            "error": self.error,
+        }
+
+
+class ScanJobManager:
+    def __init__(self, max_workers: int = 1):
+        # One scan at a time: leagues inside a scan are already parallel
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scan-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, days: int, incremental: bool = False) -> ScanJob:
+        with self._lock:
+            # A pending scan for the same horizon answers this request too
+            for job in self._jobs.values():
+                if job.days == days and job.incremental == incremental and job.status in ("queued", "running"):
+                    return job
+            job = ScanJob(days, incremental)
+            self._jobs[job.id] = job
+            self._trim()
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return self._sorted()
+
+    def _sorted(self):
+        # Caller holds self._lock (not reentrant)
+        return sorted(self._jobs.values(), key=lambda j: j.created, reverse=True)
+
+    def _trim(self):
+        # Caller holds self._lock
+        finished = [j for j in self._sorted() if j.status in ("success", "failed")]
+        for job in finished[MAX_JOBS_KEPT:]:
+            self._jobs.pop(job.id, None)
+
+    def _run(self, job: ScanJob):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            import under35_scanner
+            job.total = len(under35_scanner.FILTER_PROFILES)
+            signals_df = under35_scanner.scan_5leagues(days_ahead=job.days, progress=job.on_progress,
+                                                       incremental=job.incremental)
+            job.found = len(signals_df)
+            job.status = "success"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            job.done.set()
+
+
+scan_jobs = ScanJobManager()
@@ -1,12 +1,19 @@
 import sys
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 import pandas as pd
 import json
 import os
-import subprocess
 from dotenv import load_dotenv
+import http_client
+from app.jobs import scan_jobs
+from signal_store import store as signal_store
+from translations import store as translation_store
+from app.ai_cache import ai_cache
+from stakes import kelly_fraction
+from app.analysis import resolve_model, openai_client, analyze_matches, stream_analyses, combine_analyses
 
 load_dotenv()
 
@@ -37,6 +44,7 @@ class ScanRequest(BaseModel):
 class AnalyzeRequest(BaseModel):
     matches: List[str]
     model: str = "gpt-3.5-turbo" # Default
+    structured: bool = False # Typed per-match JSON (see app.analysis.MatchAnalysis)
 
 class KellyRequest(BaseModel):
     odds: float
@@ -55,9 +63,7 @@ def translate_teams_batch(teams: List[str]) -> dict:
     if not teams: return {}
     
     try:
-        from openai import OpenAI
-        api_key = os.getenv("OPENAI_API_KEY")
-        client = OpenAI(api_key=api_key)
+        client = openai_client(os.getenv("OPENAI_API_KEY"))
         
         teams_txt = "\n".join(teams)
         prompt = f"""
@@ -95,48 +101,23 @@ def translate_teams_batch(teams: List[str]) -> dict:
         print(f"Translation Error: {e}")
         return {t: t for t in teams} # Fallback to original
 
-def load_signals():
-    csv_file = "under35_signals_5leagues.csv"
-    ru_csv_file = "under35_signals_5leagues_ru.csv"
-    
+def load_signals(league: Optional[str] = None, top: Optional[int] = None,
+                 min_confidence: Optional[int] = None, date_from: Optional[str] = None,
+                 date_to: Optional[str] = None):
+    """Latest published scan from the signal store, team names in Russian"""
     try:
-        if not os.path.exists(csv_file):
+        scan_id = signal_store.latest_scan_id()
+        if scan_id is None:
             return []
-            
-        # Check Cache Validity
-        use_cache = False
-        if os.path.exists(ru_csv_file):
-            # If RU file is newer than or same age as Source
-            if os.path.getmtime(ru_csv_file) >= os.path.getmtime(csv_file):
-                use_cache = True
-        
-        if use_cache:
-            try:
-                return pd.read_csv(ru_csv_file).to_dict(orient="records")
-            except:
-                pass # Cache corrupted? Proceed to regenerate
-        
-        # --- GENERATE TRANSLATION ---
-        df = pd.read_csv(csv_file)
-        if df.empty: return []
-        
-        # 1. Get Unique Teams
-        teams = pd.concat([df['Home'], df['Away']]).unique().tolist()
         
-        # 2. Translate
-        print(f"Translating {len(teams)} teams for signals cache...")
-        trans_map = translate_teams_batch(teams)
-        
-        # 3. Apply
-        # Handle JSON returning slightly different keys or missing keys gracefully
-        # Normalize map slightly?
-        
-        df['Home'] = df['Home'].map(lambda x: trans_map.get(x, x))
-        df['Away'] = df['Away'].map(lambda x: trans_map.get(x, x))
-        
-        # 4. Save Cache
-        df.to_csv(ru_csv_file, index=False)
+        # Attach names once per scan; the dictionary only asks the LLM about new teams
+        missing = signal_store.untranslated_teams(scan_id)
+        if missing:
+            signal_store.save_translations(scan_id, translation_store.translate(missing, translate_teams_batch))
         
+        df = signal_store.read(scan_id, league=league, date_from=date_from, date_to=date_to,
+                               min_confidence=min_confidence, top=top,
+                               by_confidence=top is not None, translated=True)
         return df.to_dict(orient="records")
         
     except Exception as e:
@@ -150,172 +131,107 @@ def read_root():
     return {"status": "active", "system": "Signalizer 3.5"}
 
 @app.post("/scan/{days}")
-def run_scan(days: int):
-    """Trigger the external scanner script"""
-    try:
-        # Calling the script as a subprocess ensures isolation
-        result = subprocess.run(
-            [sys.executable, "under35_scanner.py"], 
-            capture_output=True, text=True
-        )
-        if result.returncode == 0:
-            signals = load_signals()
-            return {"status": "success", "found": len(signals), "log": result.stdout}
-        else:
-            raise HTTPException(status_code=500, detail=result.stderr)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+def run_scan(days: int, wait: bool = False, incremental: bool = False):
+    """
+    Start a scan for the next `days` days on the in-process scan executor.
+    Returns the job id right away; pass wait=true to block until it finishes.
+    incremental=true recomputes only leagues whose inputs changed.
+    """
+    job = scan_jobs.submit(days, incremental)
+    if not wait:
+        return {"status": job.status, "job_id": job.id}
+    
+    job.done.wait()
+    if job.status != "success":
+        raise HTTPException(status_code=500, detail=job.error or "Scan failed")
+    return {"status": "success", "found": job.found, "job_id": job.id, "log": job.to_dict()["leagues"]}
+
+@app.get("/scan/jobs")
+def list_scan_jobs():
+    """Recent scan jobs, newest first"""
+    return [job.to_dict() for job in scan_jobs.list()]
+
+@app.get("/scan/jobs/{job_id}")
+def get_scan_job(job_id: str):
+    """Progress, per-league timings and result of a scan job"""
+    job = scan_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.to_dict()
 
 @app.get("/signals")
-def get_signals():
-    """Get current signals"""
-    return load_signals()
+def get_signals(league: Optional[str] = None, top: Optional[int] = None, min_confidence: Optional[int] = None,
+                date_from: Optional[str] = None, date_to: Optional[str] = None):
+    """Get current signals (latest scan); top=N returns the N most confident"""
+    return load_signals(league, top, min_confidence, date_from, date_to)
 
-@app.get("/backtest")
-def get_backtest():
-    """Mock backtest data"""
-    return {
-        "Primeira Liga": {"ROI": "6.2%", "WinRate": "68%"},
-        "Greek Super League": {"ROI": "4.1%", "WinRate": "62%"},
-        "La Liga 2": {"ROI": "5.5%", "WinRate": "65%"},
-        "Eredivisie": {"ROI": "3.8%", "WinRate": "60%"},
-        "Argentina Liga": {"ROI": "7.0%", "WinRate": "72%"}
-    }
+@app.get("/http_metrics")
+def get_http_metrics():
+    """Outbound HTTP stats per host (latency histogram, retries, errors)"""
+    return http_client.metrics()
 
-@app.post("/analyze_express")
-def analyze_express(req: AnalyzeRequest):
+@app.get("/backtest")
+def get_backtest(seasons: Optional[str] = None):
     """
-    AI Analysis using OpenAI/Perplexity.
-    Uses keys from .env
+    Historical replay of the scanner per league (see backtest.py).
+    seasons: comma separated football-data codes, e.g. "2324,2425".
     """
-    matches_text = "\n".join(req.matches)
-    
-    # 1. Check Cache
     try:
-        current_key = sorted(req.matches)
-        history = get_ai_cache()
-        for item in history:
-            # Check cached items
-            if item.get("matches_key") == current_key:
-                # Found valid cache!
-                return {
-                    "analysis": item["analysis"],
-                    "recommendation": f"Loaded from Cache ({item['date_str']})",
-                    "cached": True,
-                    "timestamp": item.get("timestamp")
-                }
+        from backtest import run_backtest
+        season_list = [x.strip() for x in seasons.split(",") if x.strip()] if seasons else None
+        report = run_backtest(seasons=season_list)
     except Exception as e:
-        print(f"Cache Check Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
     
-    # Enhanced prompt in Russian
-    prompt = f"""
-🤖 АНАЛИЗ МАТЧЕЙ (ТМ 3.5)
-
-📋 МАТЧИ ДЛЯ АНАЛИЗА (Формат: Матч | Date: ... | League: ...):
-{matches_text}
-
-📊 ЗАДАЧА: Для КАЖДОГО из перечисленных матчей дай прогноз.
-Твой ответ ДОЛЖЕН содержать ровно столько блоков "⚽", сколько матчей в списке.
-
-⚠️ КРИТИЧЕСКИ ВАЖНО ПРО ДАТЫ И ЛИГИ:
-1. Во входных строках указана точная "Date" и "League". ИСПОЛЬЗУЙ ИМЕННО ИХ.
-2. НЕ ВЫДУМЫВАЙ даты. Если написано "Date: 2026-02-08...", то в ответе пиши "8.02".
-3. Учитывай специфику лиги (League) при анализе (например, Аргентина = часто ТМ).
-
-ФОРМАТ ОТВЕТА (СТРОГО СОБЛЮДАЙ):
-⚽ [Название Команды 1] vs [Название Команды 2] (на Русском)
-📅 ДАТА: [Число.Месяц Время] МСК
-
-🎯 СЧЕТА:
-💎 [Счет 1] (40%)
-🔹 [Счет 2] (30%)
-🔹 [Счет 3] (20%)
-
-📉 ТМ 3.5: [Процент]%
-🛡️ УВЕРЕННОСТЬ: [X]/10
-📝 ПРИЧИНА: [Твой анализ, учитывающий Лигу и форму команд...]
-
-ДОПОЛНИТЕЛЬНЫЕ ТРЕБОВАНИЯ:
-1. Если информации о матче мало — НЕ ОТКАЗЫВАЙСЯ, сделай оценку по силе лиги/команд.
-2. ПРИДУМАЙ наиболее вероятный исход, если данных нет.
-3. Названия команд пиши СТРОГО НА РУССКОМ.
-4. Не используй ссылки [1][2].
-5. Обязательно используй разделитель ⚽.
+    out = {}
+    for league, res in report.items():
+        t = res["total"]
+        out[league] = {
+            "ROI": f"{t['roi']}%" if t["roi"] is not None else "n/a",
+            "WinRate": f"{t['hit_rate']}%" if t["hit_rate"] is not None else "n/a",
+            "Bets": t["bets"],
+            "PricedBets": t["priced"],  # ROI covers these (CSV closing 2.5 prices, line-adjusted to 3.5)
+            "MaxDrawdown": t["max_drawdown"],
+            "Seasons": res["seasons"],
+        }
+    return out
+
+@app.post("/analyze_express")
+def analyze_express(req: AnalyzeRequest):
+    """
+    AI Analysis using OpenAI/Perplexity.
+    Uses keys from .env. One request per match (concurrent, cached per match);
+    the combined text keeps the ⚽-separated format.
     """
+    results = analyze_matches(req.matches, req.model, structured=req.structured)
+    model_id = resolve_model(req.model)[2]
+    failed = [r for r in results if r["error"]]
     
-    try:
-        from openai import OpenAI
-        
-        # Select provider based on model choice
-        if "Perplexity" in req.model or "Sonar" in req.model:
-            api_key = os.getenv("PERPLEXITY_API_KEY")
-            base_url = "https://api.perplexity.ai"
-            model_id = "sonar" # Defaulting to 'sonar' (prev. sonar-medium-online or similar)
-        else:
-            api_key = os.getenv("OPENAI_API_KEY")
-            base_url = None
-            model_id = "gpt-4o-mini" # User requested this as backup
-            
-        client = OpenAI(api_key=api_key, base_url=base_url)
-        
-        response = client.chat.completions.create(
-            model=model_id,
-            messages=[
-                {"role": "system", "content": "Ты профессиональный спортивный аналитик, специализирующийся на футбольной статистике."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1 # Deterministic
-        )
-        
-        analysis = response.choices[0].message.content
-        
-        # Save to AI Caching History
-        try:
-            timestamp = datetime.now().timestamp()
-            cache_item = {
-                "matches": req.matches,
-                "matches_key": sorted(req.matches),
-                "model": model_id,
-                "analysis": analysis,
-                "timestamp": timestamp,
-                "date_str": datetime.now().strftime("%Y-%m-%d %H:%M")
-            }
-            save_ai_cache(cache_item)
-        except Exception as ex:
-            print(f"Cache Save Error: {ex}")
-
+    if results and len(failed) == len(results):
         return {
-            "analysis": analysis,
-            "recommendation": "Analysis generated by " + model_id,
-            "cached": False
-        }
-    except Exception as e:
-        return {
-            "analysis": f"AI Analysis Error: {str(e)}",
+            "analysis": f"AI Analysis Error: {failed[0]['error']}",
             "recommendation": "Please check API keys."
         }
-
-AI_HISTORY_FILE = "data/ai_history.json"
-
-def get_ai_cache():
-    if os.path.exists(AI_HISTORY_FILE):
-        with open(AI_HISTORY_FILE, "r") as f:
-            return json.load(f)
-    return []
-
-def save_ai_cache(item):
-    history = get_ai_cache()
-    # Check if duplicate (same matches key and very recent? or just append)
-    # We append but maybe limit size?
-    history.insert(0, item) # Newest first
-    if len(history) > 50: history = history[:50] # Keep last 50
     
-    with open(AI_HISTORY_FILE, "w") as f:
-        json.dump(history, f, indent=4)
+    all_cached = all(r["cached"] for r in results)
+    return {
+        "analysis": combine_analyses(results),
+        "recommendation": "Loaded from Cache" if all_cached else "Analysis generated by " + model_id,
+        "cached": all_cached,
+        "matches": results
+    }
+
+@app.post("/analyze_express/stream")
+async def analyze_express_stream(req: AnalyzeRequest):
+    """Same analysis, streamed as NDJSON: one line per match as soon as it is ready"""
+    async def lines():
+        async for result in stream_analyses(req.matches, req.model, structured=req.structured):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @app.get("/get_ai_history")
 def get_ai_history_endpoint():
-    return get_ai_cache()
+    return ai_cache.history()
 
 @app.post("/delete_ai_history")
 def delete_ai_history(req: DeleteHistoryRequest):
@@ -323,25 +239,8 @@ def delete_ai_history(req: DeleteHistoryRequest):
     Delete AI history item by timestamp or delete all.
     """
     try:
-        if not os.path.exists(AI_HISTORY_FILE):
-             return {"status": "empty"}
-             
-        with open(AI_HISTORY_FILE, "r") as f:
-            history = json.load(f)
-            
-        initial_len = len(history)
-        
-        if req.delete_all:
-            history = []
-        elif req.timestamp:
-            # Filter out the item with matching timestamp
-            # Use a small tolerance for float comparison if needed, or exact match
-            history = [h for h in history if abs(h.get("timestamp", 0) - req.timestamp) > 0.001]
-            
-        with open(AI_HISTORY_FILE, "w") as f:
-            json.dump(history, f, indent=4)
-            
-        return {"status": "deleted", "deleted_count": initial_len - len(history)}
+        deleted = ai_cache.delete(timestamp=req.timestamp, delete_all=req.delete_all)
+        return {"status": "deleted", "deleted_count": deleted}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -354,11 +253,7 @@ def calculate_kelly(req: KellyRequest):
     p = win_prob
     q = 1 - p
     """
-    b = req.odds - 1
-    p = req.win_prob
-    q = 1 - p
-    
-    f_star = (b * p - q) / b
+    f_star = kelly_fraction(req.odds, req.win_prob)
     
     if f_star < 0:
         return {"action": "Do not bet", "fraction": 0, "amount": 0}
@@ -451,8 +346,7 @@ def notify_telegram(req: NotifyRequest):
     payload = {"chat_id": chat_id, "text": req.message}
     
     try:
-        import requests
-        res = requests.post(url, json=payload)
+        res = http_client.post(url, json=payload)
         if res.status_code != 200:
              raise HTTPException(status_code=res.status_code, detail=res.text)
         return {"status": "sent"}
@@ -4,10 +4,13 @@ import logging
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-import requests
 import sys
 from dotenv import load_dotenv
 
+# Run as `python app/tg_bot.py`: make the project root importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import http_client
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
@@ -44,7 +47,7 @@ async def cmd_get_id(message: types.Message):
 @dp.message(Command("signals"))
 async def cmd_signals(message: types.Message):
     try:
-        res = requests.get(f"{API_URL}/signals")
+        res = await asyncio.to_thread(http_client.get, f"{API_URL}/signals")
         signals = res.json()
         
         if not signals:
@@ -62,10 +65,10 @@ async def cmd_signals(message: types.Message):
 @dp.message(Command("backtest"))
 async def cmd_backtest(message: types.Message):
     try:
-        res = requests.get(f"{API_URL}/backtest").json()
+        res = (await asyncio.to_thread(http_client.get, f"{API_URL}/backtest")).json()
         text = "📈 **League Performance:**\n\n"
         for league, stats in res.items():
-            text += f"**{league}**: ROI {stats['ROI']} | WR {stats['WinRate']}\n"
+            text += f"**{league}**: ROI {stats['ROI']} | WR {stats['WinRate']} | Bets {stats.get('Bets', '-')}\n"
         await message.answer(text, parse_mode="Markdown")
     except:
         await message.answer("Error fetching backtest data.")
@@ -91,7 +94,7 @@ async def process_kelly(message: types.Message):
         bank = float(parts[3])
         
         payload = {"odds": odds, "win_prob": prob, "bankroll": bank}
-        res = requests.post(f"{API_URL}/kelly", json=payload).json()
+        res = (await asyncio.to_thread(http_client.post, f"{API_URL}/kelly", json=payload)).json()
         
         await message.answer(
             f"💰 **Kelly Advice:**\n\n"
@@ -1,9 +1,11 @@
 import re
 import os
 import json
-import requests
 import paramiko
+import http_client
 from datetime import datetime
+from system_bets import SystemBet, infer_outcomes
+from stakes import solve_stakes
 
 def clean_match_name_html(m):
      m = re.sub(r'\d{4}-\d{2}-\d{2}', '', m)
@@ -14,12 +16,13 @@ def clean_match_name_html(m):
 
 def generate_variations(outcomes_list):
     """
-    Generates 27 variations from 3 lists of 3 outcomes.
-    outcomes_list: [[o1a, o1b, o1c], [o2a...], [o3a...]]
-    Returns list of 27 tuples: [(o1a, o2a, o3a), ...]
+    All variations of a system: one outcome list per match, any number of
+    matches/outcomes. Returns tuples in itertools.product order:
+    [(o1a, o2a, o3a), (o1a, o2a, o3b), ...]; [] for an empty selection.
     """
-    import itertools
-    return list(itertools.product(*outcomes_list))
+    if not outcomes_list or any(not o for o in outcomes_list):
+        return []
+    return list(SystemBet(outcomes_list).iter_slips())
 
 def calculate_stakes(budget, variations_count):
     """
@@ -29,66 +32,25 @@ def calculate_stakes(budget, variations_count):
     stake = budget / variations_count
     return [stake] * variations_count
 
-def calculate_dutching_stakes(budget, variations, odds_flat_list=None):
+def calculate_dutching_stakes(budget, variations, odds_flat_list=None, outcomes_list=None, step=None, min_stake=0):
     """
     Calculates stakes for Equal Profit (Dutching).
     budget: Total Budget (e.g. 3000)
-    variations: List of 27 tuples
-    odds_flat_list: List of 9 floats [m1_o1, m1_o2, m1_o3, m2_o1...] 
-                    or None (defaults to 1.9 for all)
+    variations: List of outcome tuples (any subset/order of the system)
+    odds_flat_list: odds per match [[m1_o1, m1_o2, ...], [m2_o1, ...]] or flat
+                    [m1_o1, m1_o2, ..., m2_o1, ...], or None (1.9 for all)
+    outcomes_list: outcome lists per match (the odds order); inferred from
+                   variations if omitted
+    step/min_stake: round stakes to multiples of step (e.g. 10 RUB), see stakes.round_stakes
     """
     if not variations: return []
-    
-    # Default odds if missing (effectively flat stake but via dutching formula)
-    if not odds_flat_list or len(odds_flat_list) != 9:
-        odds_flat_list = [1.9] * 9 # Default approx odd
-        
-    combos = []
-    implied_prob_sum = 0
-    
-    # Reconstruct combo odds
-    # Variations are generated by itertools.product(*outcomes)
-    # So iteration order is: M1(0-2) -> M2(0-2) -> M3(0-2)
-    # We map this to flat odds list indices:
-    # M1 indices: 0, 1, 2
-    # M2 indices: 3, 4, 5
-    # M3 indices: 6, 7, 8
-    
-    # We need to iterate EXACTLY as itertools.product does to match 'variations' order
-    # i range(3), j range(3), k range(3)
-    
-    calculated_stakes = []
-    
-    # 1. Calculate Total Implied Prob
-    for i in range(3):
-        for j in range(3):
-            for k in range(3):
-                # Indices in flat list
-                idx1 = i
-                idx2 = 3 + j
-                idx3 = 6 + k
-                
-                odd1 = odds_flat_list[idx1]
-                odd2 = odds_flat_list[idx2]
-                odd3 = odds_flat_list[idx3]
-                
-                combo_odd = odd1 * odd2 * odd3
-                if combo_odd <= 1.0: combo_odd = 1.01
-                
-                prob = 1 / combo_odd
-                implied_prob_sum += prob
-                
-                combos.append(combo_odd)
-                
-    # 2. Calculate Constant Return
-    constant_return = budget / implied_prob_sum
-    
-    # 3. Calculate Individual Stakes
-    for combo_odd in combos:
-        stake = constant_return / combo_odd
-        calculated_stakes.append(stake)
-        
-    return calculated_stakes
+
+    system = SystemBet(outcomes_list or infer_outcomes(variations), odds_flat_list)
+    # Each variation's odds come from its own outcome positions, not from loop order
+    combo_odds = system.combo_odds()[system.index_of(variations)]
+
+    plan = solve_stakes(combo_odds, "budget", step=step, min_stake=min_stake, budget=budget)
+    return plan["stakes"].tolist()
 
 def generate_express_html(m1, m2, m3, variations, stakes, m1_meta, m2_meta, m3_meta, timestamp):
     """
@@ -280,7 +242,7 @@ def send_telegram_message(token, chat_id, message):
     url = f"https://api.telegram.org/bot{token}/sendMessage"
     payload = {"chat_id": chat_id, "text": message, "parse_mode": "Markdown"}
     try:
-        requests.post(url, json=payload)
-        return True
+        res = http_client.post(url, json=payload)
+        return res.status_code == 200
     except:
         return False
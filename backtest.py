@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Backtest: replay the scanner's filters and confidence over past
+football-data.co.uk seasons and grade Under 3.5 (total goals) from FTHG/FTAG.
+
+Each season is evaluated in one vectorized pass using the form every team
+had *before* each match. Results are cached per (profile hash, season).
+
+The CSVs only carry Over/Under 2.5 prices, so each bet is priced at a
+line-adjusted Under 3.5 equivalent of the closing 2.5 market (see
+under35_prices); matches without any 2.5 price count towards the hit rate
+but not the ROI.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+import under35_scanner as scanner
+
+BACKTEST_SEASONS = ['2223', '2324', '2425']
+BACKTEST_CACHE_DIR = "data/backtest_cache"
+BACKTEST_VERSION = 2  # Bump when pricing/summary logic changes to invalidate cached results
+FORM_COLS = scanner.FORM_COLUMNS
+# (under, over) 2.5 price columns in football-data CSVs, closing averages first
+TOTALS_25_COLUMNS = [('AvgC<2.5', 'AvgC>2.5'), ('Avg<2.5', 'Avg>2.5'), ('BbAv<2.5', 'BbAv>2.5'),
+                     ('B365C<2.5', 'B365C>2.5'), ('B365<2.5', 'B365>2.5')]
+
+
+def profile_hash(profile):
+    payload = json.dumps([scanner.SCAN_LOGIC_VERSION, BACKTEST_VERSION, profile], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+
+
+def _poisson_cdf(lam, k):
+    """P(N <= k) for Poisson(lam), vectorized over lam"""
+    terms = np.cumprod(np.column_stack([np.ones_like(lam)] + [lam / i for i in range(1, k + 1)]), axis=1)
+    return np.exp(-lam) * terms.sum(axis=1)
+
+
+def under35_prices(season_df):
+    """
+    Line-adjusted Under 3.5 price per row (NaN without a 2.5 price): the
+    de-vigged P(Under 2.5) fixes a Poisson total-goals rate (bisection), which
+    gives P(Under 3.5); the price carries the 2.5 market's overround.
+    """
+    under = pd.Series(np.nan, index=season_df.index)
+    over = pd.Series(np.nan, index=season_df.index)
+    for u_col, o_col in TOTALS_25_COLUMNS:
+        if u_col in season_df.columns and o_col in season_df.columns:
+            missing = under.isna() | over.isna()
+            under = under.where(~missing, pd.to_numeric(season_df[u_col], errors='coerce'))
+            over = over.where(~missing, pd.to_numeric(season_df[o_col], errors='coerce'))
+    u, o = under.to_numpy(dtype=float), over.to_numpy(dtype=float)
+    valid = (u > 1) & (o > 1)
+    overround = np.where(valid, 1 / u + 1 / o, np.nan)
+    p_u25 = np.where(valid, (1 / u) / overround, 0.5)
+
+    lo, hi = np.full(len(u), 0.05), np.full(len(u), 10.0)
+    for _ in range(50):  # P(N <= 2) falls as the rate grows
+        mid = (lo + hi) / 2
+        above = _poisson_cdf(mid, 2) > p_u25
+        lo, hi = np.where(above, mid, lo), np.where(above, hi, mid)
+    p_u35 = _poisson_cdf((lo + hi) / 2, 3)
+    return pd.Series(np.round(1 / (p_u35 * overround), 3), index=season_df.index)
+
+
+def season_matches(season_df):
+    """
+    One row per finished match with both teams' pre-match form
+    (home_*/away_* columns, NaN before a team's first match) and its
+    line-adjusted Under 3.5 price ('odds', NaN if the CSV has none).
+    """
+    long = scanner.build_team_form(season_df)
+    if long.empty:
+        return pd.DataFrame()
+    # Same rows and order as build_team_form's 'order'
+    prices = under35_prices(season_df.loc[scanner._results_frame(season_df).index]).to_numpy()
+
+    # Form as of kick-off = rolling values after the team's previous match
+    pre = long.groupby('team_id', sort=False)[FORM_COLS].shift(1)
+    long = pd.concat([long[['team', 'date', 'order', 'is_home', 'gf', 'ga']], pre], axis=1)
+
+    home = long[long['is_home']].set_index('order')
+    away = long[~long['is_home']].set_index('order')
+    matches = pd.DataFrame({
+        'date': home['date'],
+        'home': home['team'],
+        'away': away['team'],
+        'hg': home['gf'],
+        'ag': home['ga'],
+    })
+    matches['odds'] = prices[matches.index.to_numpy()]
+    for col in FORM_COLS:
+        matches[f'home_{col}'] = home[col]
+        matches[f'away_{col}'] = away[col]
+    return matches.sort_index().reset_index(drop=True)
+
+
+def replay_season(name, profile, season_df):
+    """Signals the scanner would have produced over a season, graded"""
+    matches = season_matches(season_df)
+    if matches.empty:
+        return pd.DataFrame()
+
+    home_form = matches[[f'home_{c}' for c in FORM_COLS]].set_axis(FORM_COLS, axis=1)
+    away_form = matches[[f'away_{c}' for c in FORM_COLS]].set_axis(FORM_COLS, axis=1)
+    features = scanner.fixture_features(matches['home'], matches['away'], home_form, away_form,
+                                        profile['team_top'])
+
+    mask = scanner.league_filter_mask(features, profile)
+    bets = matches[mask.to_numpy()].copy()
+    bets['confidence'] = scanner.confidence_vector(features, name)[mask].to_numpy()
+    bets['won'] = (bets['hg'] + bets['ag']) < 3.5
+    # Flat 1-unit stakes at the line-adjusted closing price; NaN where unpriced
+    bets['profit'] = np.where(bets['won'], bets['odds'] - 1.0, np.where(bets['odds'].notna(), -1.0, np.nan))
+    return bets
+
+
+def summarize(bets):
+    """Hit rate over all bets; ROI, profit and max drawdown over priced bets (flat 1-unit stakes)"""
+    n = len(bets)
+    if n == 0:
+        return {'bets': 0, 'wins': 0, 'priced': 0, 'hit_rate': None, 'roi': None, 'profit': 0.0, 'max_drawdown': 0.0}
+    priced = int(bets['profit'].notna().sum())
+    equity = bets['profit'].fillna(0.0).cumsum().to_numpy()
+    drawdown = np.maximum.accumulate(np.concatenate([[0.0], equity]))[1:] - equity
+    profit = float(bets['profit'].sum())
+    return {
+        'bets': int(n),
+        'wins': int(bets['won'].sum()),
+        'priced': priced,
+        'hit_rate': round(float(bets['won'].mean()) * 100, 1),
+        'roi': round(profit / priced * 100, 1) if priced else None,
+        'profit': round(profit, 2),
+        'max_drawdown': round(float(drawdown.max()), 2),
+    }
+
+
+def backtest_league_season(name, profile, season):
+    """Cached per (profile hash, season, CSV version)"""
+    code = scanner.FOOTBALL_DATA_CODES.get(name)
+    if not code:
+        return None
+
+    season_df = scanner.load_football_data_csv(name, season)
+    if season_df.empty:
+        return None
+    csv_version = scanner.csv_store.version(code, season) or ""
+
+    key = f"{code}_{season}_{profile_hash(profile)}"
+    path = os.path.join(BACKTEST_CACHE_DIR, f"{key}.json")
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                cached = json.load(f)
+            if cached.get('csv_version') == csv_version:
+                return cached['summary']
+        except Exception:
+            pass
+
+    summary = summarize(replay_season(name, profile, season_df))
+    os.makedirs(BACKTEST_CACHE_DIR, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({'csv_version': csv_version, 'summary': summary}, f)
+    os.replace(tmp, path)
+    return summary
+
+
+def run_backtest(seasons=None, profiles=None):
+    """
+    Per-league results: {league: {'total': summary, 'seasons': {season: summary}}}.
+    Leagues without football-data CSVs are skipped.
+    """
+    seasons = seasons or BACKTEST_SEASONS
+    profiles = profiles or scanner.FILTER_PROFILES
+    report = {}
+    for name, profile in profiles.items():
+        if name not in scanner.FOOTBALL_DATA_CODES:
+            continue
+        per_season = {}
+        all_bets = []
+        for season in seasons:
+            summary = backtest_league_season(name, profile, season)
+            if summary is None:
+                continue
+            per_season[season] = summary
+            all_bets.append(summary)
+        if not per_season:
+            continue
+        bets = sum(s['bets'] for s in all_bets)
+        wins = sum(s['wins'] for s in all_bets)
+        priced = sum(s['priced'] for s in all_bets)
+        profit = sum(s['profit'] for s in all_bets)
+        report[name] = {
+            'total': {
+                'bets': bets,
+                'wins': wins,
+                'priced': priced,
+                'hit_rate': round(wins / bets * 100, 1) if bets else None,
+                'roi': round(profit / priced * 100, 1) if priced else None,
+                'profit': round(profit, 2),
+                # Seasons are separate runs: worst single-season drawdown
+                'max_drawdown': max(s['max_drawdown'] for s in all_bets),
+            },
+            'seasons': per_season,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    for league, res in run_backtest().items():
+        t = res['total']
+        print(f"{league}: {t['bets']} bets ({t['priced']} priced) | ROI {t['roi']}% | WR {t['hit_rate']}% | DD {t['max_drawdown']}u")
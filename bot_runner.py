@@ -9,7 +9,8 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Internal Imports
-from app.main import run_scan, load_signals, analyze_express, save_history, HistoryItem, AnalyzeRequest
+from app.main import run_scan, load_signals, save_history, HistoryItem
+from app.analysis import iter_analyses
 from app.utils import generate_variations, calculate_stakes, generate_express_html, upload_to_beget, send_telegram_message
 
 def main():
@@ -18,7 +19,7 @@ def main():
     # 1. Run Scan (3 Days)
     print("🔍 Running Scan (3 Days)...")
     try:
-        scan_res = run_scan(days=3)
+        scan_res = run_scan(days=3, wait=True)
         if scan_res.get("status") != "success":
             print(f"❌ Scan failed: {scan_res.get('log')}")
             # Even if scan failed, check if we have cached signals? 
@@ -53,37 +54,30 @@ def main():
     
     print(f"🔬 Analyzing Matches: {matches_for_ai}")
     
-    # 3. AI Analysis
-    req = AnalyzeRequest(matches=matches_for_ai, model="gpt-4o-mini")
-    ai_res = analyze_express(req)
-    analysis_text = ai_res.get("analysis", "")
+    # 3. AI Analysis (per match, concurrently, typed JSON; report each as it lands)
+    results = []
+    for res in iter_analyses(matches_for_ai, "gpt-4o-mini", structured=True):
+        results.append(res)
+        if res["error"]:
+            print(f"  ❌ {res['match']}: {res['error']}")
+        else:
+            print(f"  ✅ {res['match']}{' (cache)' if res['cached'] else ''}")
     
-    if not analysis_text or "Error" in analysis_text:
-        print(f"❌ AI Analysis Failed: {analysis_text}")
+    failed = [r for r in results if r["error"]]
+    if failed:
+        print(f"❌ AI Analysis Failed for {len(failed)} match(es)")
         return
 
-    # 4. Parse Analysis (Self-Healing Logic Replicated)
-    # Improve: Import parsing logic? For now, replicate minimal necessary or use regex from utils?
-    # Actually, let's keep it simple. We need explicit outcomes to generate variations.
-    # We will try to parse "Strict" format from AI.
-    
-    import re
-    blocks = analysis_text.split('⚽')
-    if len(blocks) < 2: blocks = analysis_text.split('\n\n')
-    
+    # 4. Outcomes from the validated scores: even totals collapse into "ЧЕТ"
     parsed_outcomes = []
     meta_info = []
     
-    for block in blocks:
-        if not block.strip(): continue
-        scores = re.findall(r'\b(\d{1})[:|-](\d{1})\b', block)
+    for res in sorted(results, key=lambda r: r["index"]):
+        data = res["data"]
         outcomes = []
-        for s in scores:
-            try:
-                g1, g2 = int(s[0]), int(s[1])
-                if (g1+g2)%2 == 0: outcomes.append("ЧЕТ")
-                else: outcomes.append(f"Счет {g1}:{g2}")
-            except: pass
+        for pick in data["scores"]:
+            g1, g2 = (int(x) for x in pick["score"].split(":"))
+            outcomes.append("ЧЕТ" if (g1 + g2) % 2 == 0 else f"Счет {g1}:{g2}")
         
         # Uniquify & Enforce CHET
         u_out = []
@@ -94,17 +88,7 @@ def main():
         while len(u_out) < 3: u_out.append("ЧЕТ") # Fallback
         
         parsed_outcomes.append(u_out[:3])
-        
-        # Meta
-        d = ""
-        r = ""
-        dm = re.search(r'📅.*?: (.*)', block)
-        if dm: d = dm.group(1).strip()
-        rm = re.search(r'📝.*?: (.*)', block)
-        if rm: r = rm.group(1).strip()
-        meta_info.append({'date': d, 'reason': r})
-        
-        if len(parsed_outcomes) == 3: break
+        meta_info.append({'date': data["date"], 'reason': data["reason"]})
 
     if len(parsed_outcomes) < 3:
         print("❌ Could not parse 3 matches outcomes.")
@@ -0,0 +1,162 @@
+"""
+Local store for football-data.co.uk season CSVs.
+
+Parsed frames are kept on disk per (league code, season) and refreshed with
+conditional requests (ETag / Last-Modified) once the TTL runs out.
+Set CSV_OFFLINE=1 to serve only what is already on disk (snapshot mode).
+"""
+
+import io
+import os
+import json
+import time
+import threading
+import pandas as pd
+import http_client
+
+CACHE_DIR = os.getenv("CSV_CACHE_DIR", "data/csv_cache")
+CSV_TTL = int(os.getenv("CSV_TTL", 3600 * 6))  # 6 hours before revalidating
+OFFLINE = os.getenv("CSV_OFFLINE", "0") == "1"
+BASE_URL = "https://www.football-data.co.uk/mmz4281"
+
+try:
+    import pyarrow  # noqa: F401  (enables Parquet)
+    FRAME_EXT = "parquet"
+except ImportError:
+    FRAME_EXT = "pkl"
+
+
+class SeasonCSVStore:
+    def __init__(self, cache_dir=CACHE_DIR, ttl=CSV_TTL, offline=OFFLINE):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.offline = offline
+        self._memory = {}  # (code, season) -> (meta, frame)
+        self._locks = {}
+        self._guard = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # --- paths / disk ---
+    def _path(self, code, season, ext):
+        return os.path.join(self.cache_dir, f"{code}_{season}.{ext}")
+
+    def _read_meta(self, code, season):
+        path = self._path(code, season, "json")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def _write_meta(self, code, season, meta):
+        path = self._path(code, season, "json")
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, path)
+
+    def _read_frame(self, code, season, meta):
+        path = self._path(code, season, meta.get("format", FRAME_EXT))
+        if not os.path.exists(path):
+            return None
+        try:
+            if path.endswith(".parquet"):
+                return pd.read_parquet(path)
+            return pd.read_pickle(path)
+        except Exception as e:
+            print(f"  [CSV] Corrupt cache for {code}/{season}: {e}")
+            return None
+
+    def _write_frame(self, code, season, df):
+        path = self._path(code, season, FRAME_EXT)
+        tmp = path + ".tmp"
+        if FRAME_EXT == "parquet":
+            df.to_parquet(tmp, index=False)
+        else:
+            df.to_pickle(tmp)
+        os.replace(tmp, path)  # Atomic swap, readers never see half a file
+
+    def _lock(self, key):
+        with self._guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    # --- public API ---
+    def version(self, code, season):
+        """Identifier of the stored copy (ETag/Last-Modified/fetch time), or None"""
+        meta = self._read_meta(code, season)
+        if not meta:
+            return None
+        return meta.get("etag") or meta.get("last_modified") or str(meta.get("fetched_at"))
+
+    def get(self, code, season):
+        """Returns the season frame, from memory/disk when fresh, else revalidated over HTTP"""
+        key = (code, season)
+        with self._lock(key):
+            meta, df = self._memory.get(key, (None, None))
+            if df is None:
+                meta = self._read_meta(code, season)
+                df = self._read_frame(code, season, meta) if meta else None
+
+            if df is not None and (self.offline or time.time() - meta["fetched_at"] < self.ttl):
+                self._memory[key] = (meta, df)
+                return df.copy()
+
+            if self.offline:
+                print(f"  [CSV] Offline and no snapshot for {code}/{season}")
+                return pd.DataFrame()
+
+            fresh = self._fetch(code, season, meta if df is not None else None)
+            if fresh is None:
+                # Network failed: stale copy beats nothing
+                if df is not None:
+                    print(f"  [CSV] Serving stale {code}/{season}")
+                    self._memory[key] = (meta, df)
+                    return df.copy()
+                return pd.DataFrame()
+
+            meta, new_df = fresh
+            if new_df is not None:
+                df = new_df
+                self._write_frame(code, season, df)
+            self._write_meta(code, season, meta)
+            self._memory[key] = (meta, df)
+            return df.copy()
+
+    def _fetch(self, code, season, meta):
+        """Conditional GET. Returns (meta, frame) or (meta, None) on 304, None on failure"""
+        url = f"{BASE_URL}/{season}/{code}.csv"
+        headers = {}
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        try:
+            res = http_client.get(url, headers=headers)
+        except Exception as e:
+            print(f"  [CSV] Request failed for {code}/{season}: {e}")
+            return None
+
+        if res.status_code == 304 and meta:
+            print(f"  [CSV] {code}/{season} not modified")
+            return dict(meta, fetched_at=time.time()), None
+        if res.status_code != 200:
+            print(f"  [CSV] HTTP {res.status_code} for {url}")
+            return None
+
+        try:
+            df = pd.read_csv(io.BytesIO(res.content))
+        except Exception as e:
+            print(f"  [CSV] Parse error for {code}/{season}: {e}")
+            return None
+
+        print(f"  [CSV] Downloaded {code}/{season} ({len(df)} rows)")
+        return {
+            "url": url,
+            "etag": res.headers.get("ETag"),
+            "last_modified": res.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+            "format": FRAME_EXT,
+        }, df
@@ -1,9 +1,14 @@
 import streamlit as st
 import pandas as pd
-import requests
+import numpy as np
+import http_client
 import json
 import os
 import re
+from system_bets import SystemBet
+from stakes import solve_stakes
+from enrichment import enrich_signals
+import scoring
 
 # config
 st.set_page_config(page_title="Signalizer 3.5 Dashboard", layout="wide")
@@ -53,11 +58,19 @@ try:
         NotifyRequest, 
         DeleteHistoryRequest
     )
+    from app.analysis import iter_analyses, combine_analyses
     USE_INTERNAL_API = True
 except ImportError:
     USE_INTERNAL_API = False
     st.error("❌ Could not import backend logic. Ensure 'app/main.py' exists.")
 
+def structured_match(data):
+    """MatchAnalysis dict -> editor entry {'name', 'scores' (3), 'date', 'reason'}"""
+    scores = [pick['score'] for pick in data['scores']][:3]
+    while len(scores) < 3:
+        scores.append("1:1")
+    return {'name': data['match'], 'scores': scores, 'date': data.get('date', ''), 'reason': data.get('reason', '')}
+
 def parse_analysis(text):
     """
     Parses OpenAI analysis text to extract matches and probable scores.
@@ -174,7 +187,7 @@ if st.sidebar.checkbox("Manual Override (Debug)"):
         with st.spinner("Scanning..."):
             try:
                 if USE_INTERNAL_API:
-                     res = run_scan(3)
+                     res = run_scan(3, wait=True)
                      if res.get("status") == "success":
                          st.sidebar.success(f"Found {res.get('found')} signals.")
                      else:
@@ -184,70 +197,78 @@ if st.sidebar.checkbox("Manual Override (Debug)"):
 
 
 
-# --- Data Loading (Hoisted) ---
+# --- Data Layer (cached) ---
+# Every widget click reruns this script; loaders below are memoized on the
+# signal store's latest scan id / history file mtime and expire after a TTL.
+def suggest_odds(outcome):
+    # Heuristic Odds Map
+    o = outcome.lower().replace("счет ", "").strip()
+    if "чет" in o: return 1.87
+    if "1:0" in o or "0:1" in o: return 6.50
+    if "0:0" in o: return 7.50
+    if "1:1" in o: return 5.80
+    if "2:0" in o or "0:2" in o: return 9.00
+    if "2:1" in o or "1:2" in o: return 10.00
+    if "2:2" in o: return 15.00
+    return 2.50 # Default
+
+def suggest_match_odds(match_name, outcomes):
+    """Fair odds from the score model when the match is a modelled signal, heuristic prices otherwise"""
+    row = None
+    if not signals_df.empty and 'Exp Home' in signals_df.columns:
+        names = (signals_df['Home'] + " vs " + signals_df['Away']).tolist()
+        hits = [i for i, n in enumerate(names) if n in str(match_name) and pd.notna(signals_df['Exp Home'].iloc[i])]
+        row = signals_df.iloc[hits[0]] if hits else None
+    odds = []
+    for o in outcomes:
+        p = scoring.outcome_probability(row['Exp Home'], row['Exp Away'], row['Rho'] or 0.0, o) if row is not None else None
+        odds.append(round(min(1 / p, 100.0), 2) if p else suggest_odds(o))
+    return odds
+
+def express_odds(ed):
+    """Flat odds list for the editor's three matches"""
+    return [x for i in (1, 2, 3) for x in suggest_match_odds(ed[f'm{i}_name'], ed[f'outcomes_{i}'])]
+
+def signals_version():
+    """Cache key of the signal data: latest published scan id (None = no scan yet)"""
+    try:
+        from signal_store import store as signal_store
+        return signal_store.latest_scan_id()
+    except Exception:
+        return None
+
+@st.cache_data(ttl=600, show_spinner="Loading signals...")
+def load_signals_df(scan_id):
+    """Latest scan with display columns precomputed (one pass per scan, not per rerun)"""
+    data = load_signals()
+    signals_df = pd.DataFrame(data)
+    return enrich_signals(signals_df)
+
+def history_version():
+    try:
+        from app.main import HISTORY_FILE
+        return os.path.getmtime(HISTORY_FILE)
+    except (ImportError, OSError):
+        return None
+
+@st.cache_data(ttl=600, show_spinner=False)
+def load_history(mtime):
+    """Saved express history, re-read only when the file changes"""
+    return get_history()
+
+def paged(df, key, page_sizes=(25, 50, 100, 250)):
+    """Server-side pagination: only the visible slice is rendered and sent to the browser"""
+    c_size, c_page = st.columns([1, 3])
+    page_size = c_size.selectbox("Строк на странице", page_sizes, index=1, key=f"{key}_size")
+    n_pages = max(1, -(-len(df) // page_size))
+    page = c_page.number_input(f"Страница (из {n_pages})", 1, n_pages, 1, key=f"{key}_page") if n_pages > 1 else 1
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size], f"{key}_{page_size}_{page}"
+
 signals_df = pd.DataFrame()
 if USE_INTERNAL_API:
     try:
-        from app.main import load_signals
-        data = load_signals()
-        if data:
-             signals_df = pd.DataFrame(data)
-             
-             # Enrich with Numeric Confidence (Heuristic/Random for Demo)
-             # Use session state to keep consistency across reruns
-             if 'confidence_map' not in st.session_state:
-                 st.session_state['confidence_map'] = {}
-             
-             import random
-             
-             def get_conf_num(row):
-                 # Use real confidence if available
-                 c = row.get('Confidence')
-                 if isinstance(c, (int, float)):
-                     return int(c)
-                 if isinstance(c, str) and c.isdigit():
-                     return int(c)
-                 
-                 # Fallback/Demo Logic
-                 key = f"{row['Date']}_{row['Home']}_{row['Away']}"
-                 if key in st.session_state['confidence_map']:
-                     return st.session_state['confidence_map'][key]
-                 
-                 if c == 'HIGH':
-                     val = random.randint(85, 99)
-                 else:
-                     # Identify newly scanned signals which might not be HIGH but are valid
-                     val = random.randint(60, 79)
-                 
-                 st.session_state['confidence_map'][key] = val
-                 return val
-                 
-             def get_prob_scores(row):
-                 # Heuristic for "Under 3.5" signals: low scores
-                 # Use match name as seed for deterministic results
-                 options = ["1:0, 2:0, 1:1", "1:1, 0:0, 1:0", "0:1, 0:2, 1:1", "2:1, 1:1, 1:0", "1:0, 0:0, 0:1"]
-                 match_str = f"{row['Home']}_{row['Away']}"
-                 # Use hash of match name to pick consistent option
-                 seed = hash(match_str) % len(options)
-                 return options[seed]
-             
-             def suggest_odds(outcome):
-                 # Heuristic Odds Map
-                 o = outcome.lower().replace("счет ", "").strip()
-                 if "чет" in o: return 1.87
-                 if "1:0" in o or "0:1" in o: return 6.50
-                 if "0:0" in o: return 7.50
-                 if "1:1" in o: return 5.80
-                 if "2:0" in o or "0:2" in o: return 9.00
-                 if "2:1" in o or "1:2" in o: return 10.00
-                 if "2:2" in o: return 15.00
-                 return 2.50 # Default
-
-             if not signals_df.empty:
-                 signals_df['Confidence Score'] = signals_df.apply(get_conf_num, axis=1)
-                 signals_df['Confidence Text'] = signals_df['Confidence Score'].apply(lambda x: f"9/10 ({x}%)" if x >= 90 else f"{x//10}/10 ({x}%)")
-                 signals_df['Probable Scores'] = signals_df.apply(get_prob_scores, axis=1)
-
+        signals_df = load_signals_df(signals_version())
     except Exception as e:
         st.error(f"Error loading signals: {e}")
 
@@ -259,104 +280,55 @@ with tab_top:
     
     # 1. Prepare Data
     if not signals_df.empty and 'Confidence Score' in signals_df.columns:
-        # Filter & Sort - Show mostly everything found by scanner (> 60)
-        df_top = signals_df[signals_df['Confidence Score'] >= 60].sort_values('Confidence Score', ascending=False)
+        # Filter & Sort - Confidence is the model's P(Under 3.5) in %, so no fixed cut-off by default
+        min_conf = st.slider("Мин. уверенность, P(ТМ 3.5) %", 0, 99, 0, key="top_min_conf")
+        df_top = signals_df[signals_df['Confidence Score'] >= min_conf].sort_values('Confidence Score', ascending=False)
         
         st.info(f"Найдено {len(df_top)} сигналов")
         
-        # 2. Selection UI
+        # 2. Selection UI: one data editor per page, sorted server-side
         if 'top_selected' not in st.session_state: st.session_state['top_selected'] = []
         
-        def toggle_select(match_str):
-            if match_str in st.session_state['top_selected']:
-                st.session_state['top_selected'].remove(match_str)
-            else:
-                st.session_state['top_selected'].append(match_str)
+        TOP_SORTS = {"Уверенность": "Confidence Score", "Дата": "Date", "Лига": "League", "Матч": "Home"}
+        c_sort, c_dir = st.columns([3, 1])
+        sort_by = c_sort.selectbox("Сортировка", list(TOP_SORTS), key="top_sort")
+        descending = c_dir.toggle("По убыванию", value=sort_by == "Уверенность", key="top_desc")
+        df_top = df_top.sort_values(TOP_SORTS[sort_by], ascending=not descending, kind="stable")
         
-        def get_match_badges(row):
-            """Generate visual badges for match characteristics"""
-            badges = []
-            home = row['Home']
-            away = row['Away']
-            prob_scores = row.get('Probable Scores', '')
-            
-            # Watchlist Detection (from scanner data or dynamic check)
-            watchlist_col = row.get('Watchlist', '')
-            if watchlist_col:
-                badges.append(watchlist_col)
-            
-            # Home Favorite Detection (based on probable scores)
-            if '1:0' in prob_scores or '2:0' in prob_scores:
-                if '0:1' not in prob_scores and '0:2' not in prob_scores:
-                    badges.append('🏠 H')
-            
-            # Away Favorite Detection
-            if '0:1' in prob_scores or '0:2' in prob_scores:
-                if '1:0' not in prob_scores and '2:0' not in prob_scores:
-                    badges.append('✈️ A')
-            
-            # Draw/Balanced Match
-            if '1:1' in prob_scores or '0:0' in prob_scores:
-                if ('1:0' in prob_scores or '0:1' in prob_scores):
-                    badges.append('⚔️ Bal')
-            
-            # High-scoring potential (if any score > 2)
-            if '2:1' in prob_scores or '2:2' in prob_scores:
-                badges.append('⚡ H/S')
-            
-            # Liga Argentina Elite Teams (heuristic detection)
-            elite_teams = ['Ривер Плейт', 'Бока Хуниорс', 'Расинг', 'Индепендьенте']
-            if any(team in home for team in elite_teams) or any(team in away for team in elite_teams):
-                badges.append('⭐')
-            
-            
-            return ' '.join(badges) if badges else '—'
-
-        # Header with Badges
-        c1, c2, c3, c4, c5, c6, c7 = st.columns([1, 4, 2, 2, 2, 2, 2])
-        c1.markdown("**Sel**")
-        c2.markdown("**Match**")
-        c3.markdown("**Type**")
-        c4.markdown("**Conf**")
-        c5.markdown("**Prob. Scores**")
-        c6.markdown("**H2H**")
-        c7.markdown("**Date**")
-        
-        # Cache badges to prevent changes on rerun
-        if 'cached_badges' not in st.session_state:
-            st.session_state['cached_badges'] = {}
+        page_df, page_key = paged(df_top, "top")
+        match_strs = page_df['Home'] + " vs " + page_df['Away']
+        h2h = page_df['H2H'] if 'H2H' in page_df.columns else pd.Series('', index=page_df.index)
+        # H2H fallback: link to Flashscore/Google
+        stats_links = "https://www.google.com/search?q=" + (match_strs + " flashscore h2h").str.replace(" ", "+")
+        table = pd.DataFrame({
+            "Sel": match_strs.isin(st.session_state['top_selected']),
+            "Match": match_strs,
+            "Type": page_df['Badges'],
+            "Conf": page_df['Confidence Text'],
+            "Prob. Scores": page_df['Probable Scores'],
+            "H2H": h2h.fillna('').replace('—', ''),
+            "Stats": stats_links,
+            "Date": page_df['Date'].astype(str).str.split(' ').str[0],
+            "League": page_df['League'],
+        })
+        edited = st.data_editor(
+            table,
+            key=f"top_editor_{sort_by}_{descending}_{page_key}",
+            hide_index=True,
+            use_container_width=True,
+            disabled=[c for c in table.columns if c != "Sel"],
+            column_config={
+                "Sel": st.column_config.CheckboxColumn("Sel", width="small"),
+                "Match": st.column_config.TextColumn("Match", width="large"),
+                "Stats": st.column_config.LinkColumn("Stats", display_text="📊 Stats"),
+            },
+        )
         
-        for idx, row in df_top.iterrows():
-            match_str = f"{row['Home']} vs {row['Away']}"
-            is_selected = match_str in st.session_state['top_selected']
-            
-            # Get or generate badges (cache them)
-            if match_str not in st.session_state['cached_badges']:
-                st.session_state['cached_badges'][match_str] = get_match_badges(row)
-            badges = st.session_state['cached_badges'][match_str]
-            
-            c1, c2, c3, c4, c5, c6, c7 = st.columns([1, 4, 2, 2, 2, 2, 2])
-            if c1.checkbox("✓", key=f"top_{idx}", value=is_selected, label_visibility="collapsed"):
-                if not is_selected: toggle_select(match_str)
-            else:
-                if is_selected: toggle_select(match_str)
-                
-            c2.write(f"**{match_str}**")
-            c3.caption(badges)
-            c4.write(f"**{row['Confidence Text']}**")
-            c5.caption(f"{row.get('Probable Scores', '1:0, 1:1')}")
-            
-            # H2H Column with Fallback to External Search
-            h2h_val = row.get('H2H', '')
-            if not h2h_val or h2h_val == '—':
-                 # Fallback: Link to Flashscore/Google
-                 query = f"{row['Home']} vs {row['Away']} flashscore h2h"
-                 link = f"https://www.google.com/search?q={query}"
-                 c6.markdown(f"[📊 Stats]({link})")
-            else:
-                 c6.caption(h2h_val)
-            cols_date = row['Date'].split(' ')
-            c7.write(f"{cols_date[0] if len(cols_date)>0 else row['Date']}")
+        # Sync this page's ticks into the cross-page selection (keeps selection order)
+        on_page = set(edited["Match"])
+        ticked = list(edited.loc[edited["Sel"], "Match"])
+        kept = [m for m in st.session_state['top_selected'] if m not in on_page or m in ticked]
+        st.session_state['top_selected'] = kept + [m for m in ticked if m not in kept]
             
         st.divider()
         
@@ -417,7 +389,8 @@ with tab_top:
             1. **Разные даты** (40%) — 3 матча в разные дни (критично!)
             2. **Разные типы** (30%) — Микс: 🏠 H + ✈️ A + ⚔️ Bal
             3. **Watchlist** (20%) — Приоритет матчам с **👁️ W** или **🔍 W**
-            4. **Confidence >95%** (10%) — Минимум 90%, идеал 96-99%
+            4. **Confidence** (10%) — модельная вероятность ТМ 3.5 (Dixon-Coles), в %. Минимум 75%, идеал 85%+
+               (для лиг без модели — эвристическая оценка)
             
             ---
             
@@ -426,23 +399,23 @@ with tab_top:
             - ❌ **⚡ H/S Badge** — Пропускайте сразу (высокий риск >3.5)
             - ❌ **Все матчи в один день** — Критично избегать
             - ❌ **3× 🏠 H или 3× ✈️ A** — Нужно разнообразие
-            - ❌ **Confidence <90%** — Слишком рискованно
+            - ❌ **Confidence <75%** — Больше четверти таких матчей уходят в ТБ 3.5
             - ❌ **Более 2 ⭐ топ-клубов** — Ловушка переоценки
             
             ---
             
             ### 🎯 Пример оптимального выбора
             
-            **Альдосиви vs Росарио** (07.02) — ⚔️ Bal, 96%  
-            **Ривер Плейт vs КА Тигре** (08.02) — 🏠 H ⭐, 98%  
-            **Химнасия vs Институто** (09.02) — ✈️ A, 99%
+            **Альдосиви vs Росарио** (07.02) — ⚔️ Bal, 84%  
+            **Ривер Плейт vs КА Тигре** (08.02) — 🏠 H ⭐, 86%  
+            **Химнасия vs Институто** (09.02) — ✈️ A, 88%
             
             **Почему это работает:**
             - ✅ 3 разных дня (07, 08, 09)
             - ✅ 3 разных типа (Balanced, Home, Away)
             - ✅ Нет ⚡ H/S флагов
             - ✅ Есть ⭐ топ-команда (Ривер)
-            - ✅ Уверенность растет: 96% → 98% → 99%
+            - ✅ Все три ≥ 84% P(ТМ 3.5): вместе ~63% (0.84 × 0.86 × 0.88)
             
             ---
             
@@ -483,7 +456,7 @@ with tab_top:
             - [ ] 3 разных дня?
             - [ ] Минимум 2 разных типа (🏠/✈️/⚔️)?
             - [ ] Нет ⚡ H/S флагов?
-            - [ ] Все >95% уверенности?
+            - [ ] Все ≥ 75% P(ТМ 3.5), лучше 85%+?
             - [ ] Разнообразие в Probable Scores?
             
             **Если все ✅ → Вы готовы!** 🎯
@@ -513,8 +486,7 @@ with tab_top:
             }
             
             # Auto-Calculate Odds for Manual Transfer
-            all_outs = st.session_state['express_data']['outcomes_1'] + st.session_state['express_data']['outcomes_2'] + st.session_state['express_data']['outcomes_3']
-            st.session_state['odds_data'] = [suggest_odds(o) for o in all_outs]
+            st.session_state['odds_data'] = express_odds(st.session_state['express_data'])
 
             st.success("✅ Transferred! Go to 'Редактор Экспрессов' (Tab 2) to configure outcomes.")
             # Optional: Switch tab hack or just guide user
@@ -550,16 +522,27 @@ with tab3:
         else:
             with st.spinner(f"Analyzing with {model_choice}..."):
                 try:
-                    # 1. Call AI
+                    # 1. Call AI (one request per match, shown as each one lands)
                     matches_list = [m.strip() for m in matches_text.split('\n') if m.strip()]
-                    req = AnalyzeRequest(matches=matches_list, model=model_choice)
-                    result = analyze_express(req)
+                    progress = st.progress(0.0)
+                    live = st.empty()
+                    results = []
+                    for res in iter_analyses(matches_list, model_choice, structured=True):
+                        results.append(res)
+                        status = "cache" if res["cached"] else ("error" if res["error"] else "done")
+                        progress.progress(len(results) / len(matches_list),
+                                          text=f"{len(results)}/{len(matches_list)} · {res['match']} ({status})")
+                        live.markdown(combine_analyses(results))
+                    live.empty()
+                    result = {"analysis": combine_analyses(results)} if results else {}
                     
                     if "analysis" in result:
                         analysis_text = result["analysis"]
                         
-                        # 2. Parse Results
-                        parsed_matches = parse_analysis(analysis_text)
+                        # 2. Typed results (no text scraping); free text only as a fallback
+                        parsed_matches = [structured_match(r["data"]) for r in results if r.get("data")]
+                        if not parsed_matches:
+                            parsed_matches = parse_analysis(analysis_text)
                         
                         if len(parsed_matches) > 0:
                             # 3. Auto-fill Editor
@@ -568,14 +551,14 @@ with tab3:
                             # Match 1
                             m1 = parsed_matches[0]
                             ed_data['m1_name'] = m1['name']
-                            ed_data['m1_meta'] = {'date': '', 'reason': 'AI Analysis'}
+                            ed_data['m1_meta'] = {'date': m1.get('date', ''), 'reason': m1.get('reason') or 'AI Analysis'}
                             ed_data['outcomes_1'] = m1['scores']
                             
                             # Match 2 (Optional)
                             if len(parsed_matches) > 1:
                                 m2 = parsed_matches[1]
                                 ed_data['m2_name'] = m2['name']
-                                ed_data['m2_meta'] = {'date': '', 'reason': 'AI Analysis'}
+                                ed_data['m2_meta'] = {'date': m2.get('date', ''), 'reason': m2.get('reason') or 'AI Analysis'}
                                 ed_data['outcomes_2'] = m2['scores']
                             else:
                                 ed_data['m2_name'] = "Match 2 (Empty)"
@@ -586,7 +569,7 @@ with tab3:
                             if len(parsed_matches) > 2:
                                 m3 = parsed_matches[2]
                                 ed_data['m3_name'] = m3['name']
-                                ed_data['m3_meta'] = {'date': '', 'reason': 'AI Analysis'}
+                                ed_data['m3_meta'] = {'date': m3.get('date', ''), 'reason': m3.get('reason') or 'AI Analysis'}
                                 ed_data['outcomes_3'] = m3['scores']
                             else:
                                 ed_data['m3_name'] = "Match 3 (Empty)"
@@ -595,9 +578,8 @@ with tab3:
                             
                             st.session_state['express_data'] = ed_data
                             
-                            # Auto-Calculate Odds (Heuristic)
-                            all_outs = ed_data['outcomes_1'] + ed_data['outcomes_2'] + ed_data['outcomes_3']
-                            st.session_state['odds_data'] = [suggest_odds(o) for o in all_outs]
+                            # Auto-Calculate Odds (score model, heuristic fallback)
+                            st.session_state['odds_data'] = express_odds(ed_data)
                             
                             st.success(f"✅ Analysis Complete! Found {len(parsed_matches)} matches.")
                             st.expander("View Full AI Analysis").markdown(analysis_text)
@@ -635,8 +617,7 @@ with tab3:
         if self_healed:
              st.session_state['express_data'] = ed
              # RECALCULATE ODDS to prevent mismatch
-             all_outs = ed['outcomes_1'] + ed['outcomes_2'] + ed['outcomes_3']
-             st.session_state['odds_data'] = [suggest_odds(o) for o in all_outs]
+             st.session_state['odds_data'] = express_odds(ed)
         
         default_m1 = ed['m1_name']
         default_m2 = ed['m2_name']
@@ -656,82 +637,80 @@ with tab3:
     if is_transferred:
         st.markdown("**Outcomes & Odds (From AI):**")
         
-        if 'odds_data' not in st.session_state:
-            st.session_state['odds_data'] = [1.9]*9 
-        
-        def odds_row(match_idx, match_name, outcomes, offset):
-            st.markdown(f"**{match_name}**")
-            c1, c2, c3 = st.columns(3)
-            with c1: 
-                st.write(f"🔹 {outcomes[0]}")
-                st.session_state['odds_data'][offset] = st.number_input(f"Odds 1", 1.0, 100.0, st.session_state['odds_data'][offset], key=f"o_{offset}" )
-            with c2: 
-                st.write(f"🔹 {outcomes[1]}")
-                st.session_state['odds_data'][offset+1] = st.number_input(f"Odds 2", 1.0, 100.0, st.session_state['odds_data'][offset+1], key=f"o_{offset+1}" )
-            with c3: 
-                st.write(f"🔹 {outcomes[2]}")
-                st.session_state['odds_data'][offset+2] = st.number_input(f"Odds 3", 1.0, 100.0, st.session_state['odds_data'][offset+2], key=f"o_{offset+2}" )
-
         o1 = st.session_state['express_data']['outcomes_1']
         o2 = st.session_state['express_data']['outcomes_2']
         o3 = st.session_state['express_data']['outcomes_3']
+        outcome_lists = [o1, o2, o3]
+        offsets = np.cumsum([0] + [len(o) for o in outcome_lists])
         
-        odds_row(1, m1, o1, 0)
-        odds_row(2, m2, o2, 3)
-        odds_row(3, m3, o3, 6)
+        if len(st.session_state.get('odds_data', [])) != offsets[-1]:
+            st.session_state['odds_data'] = [1.9] * int(offsets[-1])
         
-        # ROI Calculator
+        def odds_row(match_name, outcomes, offset):
+            st.markdown(f"**{match_name}**")
+            for j, (col, outcome) in enumerate(zip(st.columns(len(outcomes)), outcomes)):
+                with col:
+                    st.write(f"🔹 {outcome}")
+                    st.session_state['odds_data'][offset+j] = st.number_input(f"Odds {j+1}", 1.0, 100.0, st.session_state['odds_data'][offset+j], key=f"o_{offset+j}" )
+
+        for name, outcomes, offset in zip([m1, m2, m3], outcome_lists, offsets):
+            odds_row(name, outcomes, int(offset))
+        
+        # ROI Calculator (recomputed live on every odds edit)
         st.markdown("### 💰 ROI Calculator")
         
-        st.markdown("### � ROI Calculator")
+        STAKE_MODES = {"Фикс. Бюджет": "budget", "Фикс. Прибыль": "profit", "Келли": "kelly"}
+        c_mode, c_step, c_min = st.columns(3)
+        stake_mode = STAKE_MODES[c_mode.radio("Режим (Mode)", list(STAKE_MODES), horizontal=True)]
+        stake_step = c_step.selectbox("Округление (RUB)", [0, 1, 10, 50, 100], index=2, format_func=lambda x: "Без округления" if x == 0 else f"до {x}")
+        min_stake = c_min.number_input("Мин. Ставка (RUB)", 0, 10000, 0, step=10)
+        
+        if stake_mode == "budget":
+            stake_params = {"budget": st.number_input("Общий Бюджет (Total Budget)", 1000, 1000000, 27000, step=1000)}
+        elif stake_mode == "profit":
+            stake_params = {"profit": st.number_input("Чистая Прибыль (Target Profit)", 100, 1000000, 5000, step=100)}
+        else:
+            c_bank, c_prob, c_scale = st.columns(3)
+            stake_params = {
+                "bankroll": c_bank.number_input("Банк (Bankroll)", 1000, 10000000, 100000, step=1000),
+                "win_prob": c_prob.number_input("Вероятность Прохода Системы (%)", 1.0, 99.0, 50.0, step=1.0) / 100,
+                "kelly_scale": c_scale.number_input("Доля Келли", 0.05, 1.0, 0.25, step=0.05),
+            }
         
-        # EQUAL PROFIT MODE (Default & Only)
-        total_budget = st.number_input("Общий Бюджет (Total Budget)", 1000, 1000000, 27000, step=1000)
+        try:
+            system = SystemBet(outcome_lists, st.session_state['odds_data'])
+            combo_odds = system.combo_odds()
+            plan = solve_stakes(combo_odds, stake_mode, step=stake_step or None, min_stake=min_stake, **stake_params)
+        except ValueError as e:
+            plan = None
+            st.warning(f"⚠️ {e}")
         
-        if st.button("Рассчитать Распределение (Dutching)"):
-            od = st.session_state['odds_data']
-            combos = []
-            implied_prob_sum = 0
-            for i in range(3):
-                for j in range(3,6):
-                        for k in range(6,9):
-                            combo_odd = od[i] * od[j] * od[k]
-                            if combo_odd <= 1.0: combo_odd = 1.01 
-                            prob = 1 / combo_odd
-                            implied_prob_sum += prob
-                            combos.append({"indices": (i, j, k), "odds": combo_odd, "prob": prob})
-            
-            constant_return = total_budget / implied_prob_sum
-            net_profit = constant_return - total_budget
+        if plan and plan["total"] <= 0:
+            st.warning("⚠️ Келли: нет перевеса, ставка не рекомендуется")
+        elif plan:
+            stakes, payouts, total_budget = plan["stakes"], plan["payouts"], plan["total"]
+            net_profit = plan["profit_min"]
             roi = (net_profit / total_budget) * 100
             
-            st.success(f"💎 Гарантированная Выплата (Payout): {constant_return:.2f} RUB")
-            col_res1, col_res2 = st.columns(2)
+            payout_str = f"{plan['payout_min']:.2f}" if plan["payout_max"] - plan["payout_min"] < 0.01 else f"{plan['payout_min']:.2f} – {plan['payout_max']:.2f}"
+            st.success(f"💎 Гарантированная Выплата (Payout): {payout_str} RUB")
+            col_res0, col_res1, col_res2 = st.columns(3)
+            col_res0.metric("Сумма Ставок (Total)", f"{total_budget:.2f} RUB")
             col_res1.metric("Чистая Прибыль (Net Profit)", f"{net_profit:.2f} RUB")
             col_res2.metric("ROI", f"{roi:.2f}%")
             
-            results_data = []
-            o1_names, o2_names, o3_names = st.session_state['express_data']['outcomes_1'], st.session_state['express_data']['outcomes_2'], st.session_state['express_data']['outcomes_3']
-            
-            for c in combos:
-                req_stake = constant_return / c['odds']
-                idx1, idx2, idx3 = c['indices'][0], c['indices'][1] - 3, c['indices'][2] - 6
-                name1 = o1_names[idx1] if idx1 < len(o1_names) else "?"
-                name2 = o2_names[idx2] if idx2 < len(o2_names) else "?"
-                name3 = o3_names[idx3] if idx3 < len(o3_names) else "?"
-                
-                results_data.append({
-                    "Вариант": f"{name1} + {name2} + {name3}",
-                    "Коэфф.": f"{c['odds']:.2f}",
-                    "Сумма Ставки (RUB)": f"{req_stake:.0f}",
-                    "Возможная Выплата": f"{req_stake * c['odds']:.2f}",
-                    "Чистая Прибыль": f"{(req_stake * c['odds']) - total_budget:.2f}"
-                })
+            results_data = pd.DataFrame({
+                "Вариант": [" + ".join(v) for v in system.iter_slips()],
+                "Коэфф.": [f"{o:.2f}" for o in combo_odds],
+                "Сумма Ставки (RUB)": [f"{x:.0f}" for x in stakes],
+                "Возможная Выплата": [f"{x:.2f}" for x in payouts],
+                "Чистая Прибыль": [f"{x - total_budget:.2f}" for x in payouts],
+            })
             
             st.write("### 📋 Распределение Ставок:")
-            st.dataframe(pd.DataFrame(results_data), use_container_width=True)
+            st.dataframe(results_data, use_container_width=True)
             st.session_state['last_roi'] = f"Const Profit: {net_profit:.0f}"
-            st.session_state['current_stakes'] = [constant_return / c['odds'] for c in combos]
+            st.session_state['current_stakes'] = stakes.tolist()
 
         # Save to History
         if st.button("💾 Save to History"):
@@ -741,8 +720,8 @@ with tab3:
                      "date": st.session_state['express_data'].get('m1_meta',{}).get('date', 'Today'),
                      "matches": [m1, m2, m3],
                      "outcomes": {"m1": o1, "m2": o2, "m3": o3},
-                     "odds": {"m1": st.session_state['odds_data'][0:3], "m2": st.session_state['odds_data'][3:6], "m3": st.session_state['odds_data'][6:9]},
-                     "variations_count": 27,
+                     "odds": {f"m{i+1}": st.session_state['odds_data'][offsets[i]:offsets[i+1]] for i in range(3)},
+                     "variations_count": len(SystemBet(outcome_lists)) if all(outcome_lists) else 0,
                      "roi_calculation": st.session_state.get('last_roi', "N/A"),
                      "timestamp": time.time()
                  }
@@ -750,7 +729,7 @@ with tab3:
                      save_history(HistoryItem(**item_data))
                      st.success("Saved to Backtest/History!")
                  else:
-                     requests.post(f"{API_URL}/save_history", json=item_data)
+                     http_client.post(f"{API_URL}/save_history", json=item_data)
                      st.success("Saved to Backtest/History!")
              except Exception as e:
                  st.error(f"Save failed: {e}")
@@ -763,13 +742,13 @@ with tab3:
     # Trigger Generation
     if should_generate:
         if 'generated_variations' not in st.session_state or st.button("Re-Generate"):
-             import itertools
-             # Simple generation for now
              if is_transferred:
-                 st.session_state['generated_variations'] = list(itertools.product(o1, o2, o3))
+                 # An empty outcome list (nothing selected for a match) means no variations
+                 st.session_state['generated_variations'] = list(SystemBet(outcome_lists).iter_slips()) if all(outcome_lists) else []
              else:
-                 st.info("Manual generation not fully implemented in refactor (add ExpressGenerator if needed)")
-                 st.session_state['generated_variations'] = []
+                 # Manual mode: classic 27 system over the 1X2 market
+                 st.session_state['generated_variations'] = list(SystemBet([["1", "X", "2"]] * 3).iter_slips())
+             st.session_state['variations_done'] = set()
 
     # RENDER VARIATIONS checklist ...
     variations = st.session_state.get('generated_variations', [])
@@ -793,13 +772,28 @@ with tab3:
         show_stakes = len(stakes_list) == len(variations)
 
         st.markdown("### 📋 Чек-лист Вариантов:")
-        for i, v in enumerate(variations):
-            bet_str = f"**1️⃣ {n1}**: {v[0]}   |   **2️⃣ {n2}**: {v[1]}   |   **3️⃣ {n3}**: {v[2]}"
-            if show_stakes: bet_str += f"   💰 **{stakes_list[i]:.0f} ₽**"
-            key = f"var_{i}"
-            is_checked = st.session_state.get(key, False)
-            label = f"~~🎫 Вариант #{i+1}:  {bet_str}~~" if is_checked else f"🎫 Вариант #{i+1}:  {bet_str}"
-            st.checkbox(label, key=key)
+        if 'variations_done' not in st.session_state: st.session_state['variations_done'] = set()
+        done = st.session_state['variations_done']
+        
+        checklist = pd.DataFrame(variations, columns=[f"{i+1}️⃣ {n}" for i, n in enumerate([n1, n2, n3])][:len(variations[0])])
+        checklist.insert(0, "✓", [i in done for i in range(len(variations))])
+        checklist.insert(1, "Вариант", np.arange(1, len(variations) + 1))
+        if show_stakes:
+            checklist["💰 ₽"] = np.round(stakes_list).astype(int)
+        
+        page_df, page_key = paged(checklist, "variations")
+        edited = st.data_editor(
+            page_df,
+            key=f"variations_editor_{len(variations)}_{page_key}",
+            hide_index=True,
+            use_container_width=True,
+            disabled=[c for c in checklist.columns if c != "✓"],
+            column_config={"✓": st.column_config.CheckboxColumn("✓", width="small")},
+        )
+        ticked = edited["✓"].to_numpy()
+        done.difference_update(page_df.index[~ticked].tolist())
+        done.update(page_df.index[ticked].tolist())
+        st.caption(f"Отмечено {len(done)} из {len(variations)}")
 
         # Telegram Notification (REFACTORED SECTION)
         if is_transferred and st.button("📲 Отправить в Telegram"):
@@ -852,7 +846,7 @@ with tab4:
         st.rerun()
 
     history = []
-    if USE_INTERNAL_API: history = get_history()
+    if USE_INTERNAL_API: history = load_history(history_version())
     
     for item in reversed(history):
         with st.expander(f"📅 {item.get('date')} | Matches: {len(item.get('matches',[]))}"):
@@ -0,0 +1,89 @@
+"""
+Display enrichment for signal tables: confidence score/text, probable scores, badges.
+
+Whole-column operations only. Model outputs stored by the scanner (scoring.py)
+are used where present; every heuristic "random" choice comes from a stable
+hash of the match (pd.util.hash_pandas_object uses a fixed key), so the same
+signal gets the same values in every process, session and worker.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Heuristic low-score sets for "Under 3.5" signals (picked per match)
+PROB_SCORE_OPTIONS = np.array(["1:0, 2:0, 1:1", "1:1, 0:0, 1:0", "0:1, 0:2, 1:1", "2:1, 1:1, 1:0", "1:0, 0:0, 0:1"])
+
+# Liga Argentina elite teams (heuristic ⭐ badge)
+ELITE_TEAMS = ['Ривер Плейт', 'Бока Хуниорс', 'Расинг', 'Индепендьенте']
+
+
+def stable_hash(df, columns):
+    """uint64 per row, identical across processes (unlike the salted builtin hash)"""
+    cols = [df[c].astype(str) for c in columns]
+    keys = cols[0].str.cat(cols[1:], sep="_")
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy()
+
+
+def confidence_scores(df):
+    """
+    Scanner confidence where numeric; otherwise a stable fallback per match
+    (HIGH -> 85..99, anything else -> 60..79).
+    """
+    conf = df['Confidence'] if 'Confidence' in df.columns else pd.Series(np.nan, index=df.index)
+    numeric = pd.to_numeric(conf, errors="coerce")
+    h = stable_hash(df, ['Date', 'Home', 'Away'])
+    fallback = np.where(conf.astype(str).eq('HIGH'), 85 + h % 15, 60 + h % 20)
+    return numeric.fillna(pd.Series(fallback, index=df.index)).astype(int)
+
+
+def confidence_text(scores):
+    """72 -> '7/10 (72%)' (90 and above read 9/10)"""
+    scores = pd.Series(scores).astype(int)
+    tens = np.minimum(scores // 10, 9)
+    return tens.astype(str) + "/10 (" + scores.astype(str) + "%)"
+
+
+def probable_scores(df):
+    """
+    The score model's top scorelines where the scanner stored them; otherwise
+    one of PROB_SCORE_OPTIONS, chosen by a stable hash of the teams.
+    """
+    h = stable_hash(df, ['Home', 'Away'])
+    heuristic = pd.Series(PROB_SCORE_OPTIONS[h % len(PROB_SCORE_OPTIONS)], index=df.index)
+    if 'Probable Scores' not in df.columns:
+        return heuristic
+    stored = df['Probable Scores']
+    return stored.where(stored.notna() & (stored.astype(str) != ''), heuristic)
+
+
+def match_badges(df):
+    """Badge string per row from watchlist flag, probable scores and elite teams ('—' if none)"""
+    scores = df['Probable Scores'].fillna('')
+    has = {s: scores.str.contains(s, regex=False) for s in ['1:0', '2:0', '0:1', '0:2', '1:1', '0:0', '2:1', '2:2']}
+    home_fav = has['1:0'] | has['2:0']
+    away_fav = has['0:1'] | has['0:2']
+    elite = '|'.join(ELITE_TEAMS)
+
+    parts = [
+        df['Watchlist'].fillna('').astype(str) if 'Watchlist' in df.columns else pd.Series('', index=df.index),
+        pd.Series(np.where(home_fav & ~away_fav, '🏠 H', ''), index=df.index),
+        pd.Series(np.where(away_fav & ~home_fav, '✈️ A', ''), index=df.index),
+        pd.Series(np.where((has['1:1'] | has['0:0']) & (has['1:0'] | has['0:1']), '⚔️ Bal', ''), index=df.index),
+        pd.Series(np.where(has['2:1'] | has['2:2'], '⚡ H/S', ''), index=df.index),
+        pd.Series(np.where(df['Home'].astype(str).str.contains(elite) | df['Away'].astype(str).str.contains(elite), '⭐', ''),
+                  index=df.index),
+    ]
+    joined = parts[0].str.cat(parts[1:], sep=' ').str.split().str.join(' ')
+    return joined.where(joined != '', '—')
+
+
+def enrich_signals(df):
+    """Adds 'Confidence Score', 'Confidence Text', 'Probable Scores' and 'Badges' (returns a copy)"""
+    df = df.copy()
+    if df.empty:
+        return df
+    df['Confidence Score'] = confidence_scores(df)
+    df['Confidence Text'] = confidence_text(df['Confidence Score'])
+    df['Probable Scores'] = probable_scores(df)
+    df['Badges'] = match_badges(df)
+    return df
@@ -1,4 +1,4 @@
-import itertools
+from system_bets import SystemBet
 
 class ExpressGenerator:
     def __init__(self):
@@ -6,30 +6,33 @@ class ExpressGenerator:
         self.outcomes_2way = ["Under", "Over"]      # Totals
         self.outcomes_oe = ["Odd", "Even"]          # Odd/Even
 
+    def generate_system(self, matches, outcomes):
+        """
+        Generates every combination for N matches with their own outcome lists.
+        Matches: list of strings ["Team A vs B", ...]
+        Outcomes: one outcome list per match (or a single list used for all)
+        Returns: List of bets (each bet is a list of N selection strings)
+        """
+        return list(self.iter_system(matches, outcomes))
+
+    def iter_system(self, matches, outcomes):
+        """Lazy generate_system for large systems (e.g. 6 matches x 4 outcomes = 4096 bets)"""
+        if not matches:
+            return iter(())
+        if outcomes and not isinstance(outcomes[0], (list, tuple)):
+            outcomes = [outcomes] * len(matches)
+        if len(outcomes) != len(matches) or any(not o for o in outcomes):
+            return iter(())
+        return SystemBet(outcomes, matches=matches).labelled_slips()
+
     def generate_27_system(self, matches):
         """
         Generates 27 combinations for 3 matches with 3 outcomes each.
-        Matches: list of strings ["Team A vs B", "Team C vs D", "Team E vs F"]
-        Returns: List of bets (each bet is a list of 3 selection strings)
+        Standard 27 system: all outcomes of 3 matches in a 3-way (1X2) market.
         """
         if len(matches) != 3:
             return []
-        
-        # Cross product of 3 matches x 3 outcomes
-        # Outcome list depends on market. Assuming 3-way (1x2) for the classic "27 express" system
-        # or it could be Correct Score groups etc. 
-        # Standard 27 system usually refers to covering all outcomes of 3 matches in a 3-way market.
-        
-        combinations = list(itertools.product(self.outcomes_3way, repeat=3))
-        
-        system_bets = []
-        for combo in combinations:
-            bet_slip = []
-            for i, outcome in enumerate(combo):
-                bet_slip.append(f"{matches[i]} - {outcome}")
-            system_bets.append(bet_slip)
-            
-        return system_bets
+        return self.generate_system(matches, self.outcomes_3way)
 
     def generate_binary_system(self, matches, mode="Under/Over"):
         """
@@ -37,18 +40,8 @@ class ExpressGenerator:
         """
         if len(matches) != 3:
             return []
-            
         outcomes = self.outcomes_2way if mode == "Under/Over" else self.outcomes_oe
-        combinations = list(itertools.product(outcomes, repeat=3))
-        
-        system_bets = []
-        for combo in combinations:
-            bet_slip = []
-            for i, outcome in enumerate(combo):
-                bet_slip.append(f"{matches[i]} - {outcome}")
-            system_bets.append(bet_slip)
-            
-        return system_bets
+        return self.generate_system(matches, outcomes)
 
     def swap_odd_even(self, current_selection):
         """
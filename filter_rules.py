@@ -0,0 +1,74 @@
+"""
+Rule engine for FILTER_PROFILES.
+
+Each threshold key in a profile maps to one feature column of the fixture
+frame built by under35_scanner.fixture_features and a bound direction.
+Profiles are compiled once at import; unknown keys or non-numeric thresholds
+fail loudly instead of being silently ignored.
+"""
+
+import numbers
+import pandas as pd
+
+# Profile key -> (fixture feature column, bound)
+# 'max': feature <= threshold passes, 'min': feature >= threshold passes.
+# A missing stat (NaN) never rejects a fixture.
+RULES = {
+    'opp_last5_max':        ('opp_last5_goals_scored', 'max'),   # Opponent goals, last 5
+    'opp_avg_g_max':        ('opp_avg_goals_scored', 'max'),     # Opponent goals per match, season
+    'xg_opp_max':           ('opp_avg_xg', 'max'),               # Opponent xG per match (goals if no xG data)
+    'clean_last3_min':      ('top_clean_sheets_last3', 'min'),   # Top team clean sheets, last 3
+    'clean_last4_min':      ('top_clean_sheets_last4', 'min'),   # Top team clean sheets, last 4
+    'clean_sheets_pct_min': ('top_clean_sheets_pct', 'min'),     # Top team clean sheet %, season
+    'btts_no_pct_min':      ('top_btts_no_pct', 'min'),          # Top team "both teams to score: no" %, season
+    'home_winrate_min':     ('top_home_winrate', 'min'),         # Top team home win %, season
+}
+
+# Keys that configure the league rather than filter fixtures
+META_KEYS = {'fbref_id', 'odds_key', 'team_top', 'min_odds'}
+
+
+class FilterProfileError(ValueError):
+    pass
+
+
+class CompiledProfile:
+    def __init__(self, name, rules):
+        self.name = name
+        self.rules = rules  # [(key, column, bound, threshold)]
+
+    @property
+    def columns(self):
+        return [col for _, col, _, _ in self.rules]
+
+    def mask(self, features):
+        """Boolean mask over a fixture_features frame"""
+        passes = pd.Series(True, index=features.index)
+        for _, col, bound, threshold in self.rules:
+            values = features[col]
+            # Comparisons with NaN are False, so data gaps pass
+            passes &= ~(values > threshold) if bound == 'max' else ~(values < threshold)
+        # No stats for the opponent at all (new team / data gap) -> allow
+        has_opp_stats = features['opp_last5_goals_scored'].notna()
+        return features['is_top_match'] & (~has_opp_stats | passes)
+
+
+def compile_profile(profile, name=""):
+    """Validate a profile and turn its thresholds into rules"""
+    if not profile.get('team_top'):
+        raise FilterProfileError(f"{name}: 'team_top' is required")
+    rules = []
+    for key, value in profile.items():
+        if key in META_KEYS:
+            continue
+        if key not in RULES:
+            raise FilterProfileError(f"{name}: unknown filter key '{key}'")
+        if isinstance(value, bool) or not isinstance(value, numbers.Real):
+            raise FilterProfileError(f"{name}: '{key}' must be a number, got {value!r}")
+        col, bound = RULES[key]
+        rules.append((key, col, bound, float(value)))
+    return CompiledProfile(name, rules)
+
+
+def compile_profiles(profiles):
+    return {name: compile_profile(profile, name) for name, profile in profiles.items()}
@@ -0,0 +1,149 @@
+"""
+Shared HTTP client for all outbound calls (Odds API, football-data, Telegram).
+
+One pooled requests.Session with keep-alive, default timeouts, a per-host
+concurrency cap and jittered exponential backoff on 429/5xx. Non-idempotent
+methods (POST) are only retried when the request never reached the server,
+unless the caller opts in with retry_non_idempotent=True.
+Per-host metrics (latency histogram, retries, errors) via metrics().
+"""
+
+import os
+import time
+import random
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+DEFAULT_TIMEOUT = (5, float(os.getenv("HTTP_TIMEOUT", "30")))  # (connect, read) seconds
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = 0.5   # seconds, doubled per attempt
+BACKOFF_CAP = 20.0
+HOST_CONCURRENCY = int(os.getenv("HTTP_HOST_CONCURRENCY", "4"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+UNSENT_STATUSES = (429,)  # Rejected before handling: safe to resend any method
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class HttpClient:
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES, host_concurrency=HOST_CONCURRENCY):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.host_concurrency = host_concurrency
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._host_slots = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _slot(self, host):
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.host_concurrency)
+            return self._host_slots[host]
+
+    def _record(self, host, elapsed=None, retried=False, failed=False):
+        with self._lock:
+            m = self._metrics.setdefault(host, {
+                "requests": 0, "retries": 0, "errors": 0,
+                "latency_sum": 0.0, "latency_buckets": [0] * len(LATENCY_BUCKETS)
+            })
+            if retried:
+                m["retries"] += 1
+            if failed:
+                m["errors"] += 1
+            if elapsed is not None:
+                m["requests"] += 1
+                m["latency_sum"] += elapsed
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    if elapsed <= bound:
+                        m["latency_buckets"][i] += 1
+                        break
+
+    def _backoff(self, attempt, res=None):
+        # Honour Retry-After when the server sends seconds, otherwise full-jitter exponential
+        if res is not None:
+            retry_after = res.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), BACKOFF_CAP)
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+    @staticmethod
+    def _not_sent(exc):
+        """True if the request failed while connecting, i.e. the server never saw it"""
+        if isinstance(exc, requests.ConnectTimeout):
+            return True
+        reason = getattr(exc.args[0], "reason", None) if exc.args else None
+        return isinstance(exc, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+    def request(self, method, url, retry_statuses=RETRY_STATUSES, retry_non_idempotent=False, **kwargs):
+        """
+        Send a request through the pooled session; returns the last response.
+        Idempotent methods retry connection errors, timeouts and `retry_statuses`.
+        Others (POST) retry only connect-phase failures and 429, so a slow or
+        failing server can't receive the same message twice - unless
+        retry_non_idempotent=True.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        host = urlsplit(url).netloc
+        safe = retry_non_idempotent or method.upper() in IDEMPOTENT_METHODS
+        if not safe:
+            retry_statuses = tuple(s for s in retry_statuses if s in UNSENT_STATUSES)
+        attempt = 0
+        while True:
+            res = None
+            started = time.monotonic()
+            try:
+                with self._slot(host):
+                    res = self.session.request(method, url, **kwargs)
+                self._record(host, elapsed=time.monotonic() - started)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(host, failed=True)
+                if attempt >= self.max_retries or not (safe or self._not_sent(e)):
+                    raise
+            else:
+                if res.status_code not in retry_statuses or attempt >= self.max_retries:
+                    return res
+            self._record(host, retried=True)
+            time.sleep(self._backoff(attempt, res))
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def metrics(self):
+        """Snapshot of per-host counters and latency histogram"""
+        with self._lock:
+            out = {}
+            for host, m in self._metrics.items():
+                buckets = {("+Inf" if b == float("inf") else str(b)): n
+                           for b, n in zip(LATENCY_BUCKETS, m["latency_buckets"])}
+                out[host] = {
+                    "requests": m["requests"],
+                    "retries": m["retries"],
+                    "errors": m["errors"],
+                    "avg_latency": round(m["latency_sum"] / m["requests"], 4) if m["requests"] else None,
+                    "latency_buckets": buckets,
+                }
+            return out
+
+
+# Process-wide client, so keep-alive connections are shared across modules
+client = HttpClient()
+
+def get(url, **kwargs):
+    return client.get(url, **kwargs)
+
+def post(url, **kwargs):
+    return client.post(url, **kwargs)
+
+def metrics():
+    return client.metrics()
@@ -1,10 +1,14 @@
 import os
 import sqlite3
-import requests
 import json
 import time
+import threading
+import numpy as np
+import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
+import http_client
+from teams import normalize_team, team_id, trigrams as _trigrams, similarity as _similarity
 
 load_dotenv()
 
@@ -13,32 +17,89 @@ BASE_URL = "https://api.the-odds-api.com/v4/sports"
 CACHE_FILE = "odds_cache.db"
 CACHE_DURATION = 3600 * 6  # 6 hours cache
 
+SWEEP_INTERVAL = 900  # Purge expired rows at most every 15 minutes
+
+# Versioned schema: entry N upgrades a database at user_version N to N+1.
+# Never drop tables here - the cache must survive process restarts.
+MIGRATIONS = [
+    # v1: base table
+    '''CREATE TABLE IF NOT EXISTS odds_cache
+       (sport_key TEXT, event_id TEXT, home_team TEXT, away_team TEXT, commence_time TEXT, 
+        h2h_home REAL, h2h_away REAL, h2h_draw REAL, last_updated INTEGER, UNIQUE(sport_key, event_id))''',
+    # v2: fast per-league freshness lookups and sweeps
+    "CREATE INDEX IF NOT EXISTS idx_odds_sport_updated ON odds_cache (sport_key, last_updated)",
+    # v3: full price ladder, one row per bookmaker x market x outcome x line
+    # (outcome: home/away/draw for h2h, over/under for totals; point 0 for h2h)
+    '''CREATE TABLE IF NOT EXISTS odds_prices
+       (sport_key TEXT NOT NULL, event_id TEXT NOT NULL, bookmaker TEXT NOT NULL, market TEXT NOT NULL,
+        outcome TEXT NOT NULL, point REAL NOT NULL, price REAL NOT NULL, last_updated INTEGER,
+        PRIMARY KEY (sport_key, event_id, bookmaker, market, outcome, point)) WITHOUT ROWID''',
+    "CREATE INDEX IF NOT EXISTS idx_prices_sport_updated ON odds_prices (sport_key, last_updated)",
+]
+
+DEFAULT_MARKETS = "h2h,totals"  # One request per league returns both markets for every bookmaker
+
+SELECT_FRESH_SQL = """SELECT event_id, home_team, away_team, commence_time, h2h_home, h2h_away, h2h_draw
+                      FROM odds_cache WHERE sport_key=? AND last_updated >= ?"""
+UPSERT_SQL = """INSERT OR REPLACE INTO odds_cache 
+                (sport_key, event_id, home_team, away_team, commence_time, h2h_home, h2h_away, h2h_draw, last_updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+SELECT_PRICES_SQL = """SELECT event_id, bookmaker, market, outcome, point, price
+                       FROM odds_prices WHERE sport_key=? AND last_updated >= ?"""
+UPSERT_PRICE_SQL = """INSERT OR REPLACE INTO odds_prices
+                      (sport_key, event_id, bookmaker, market, outcome, point, price, last_updated)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?)"""
+PRICE_COLUMNS = ['event_id', 'bookmaker', 'market', 'outcome', 'point', 'price']
+
+
+def ladder_rows(event):
+    """(bookmaker, market, outcome, point, price) for every h2h/totals price of an Odds API event"""
+    names = {event['home_team']: 'home', event['away_team']: 'away', 'Draw': 'draw', 'Over': 'over', 'Under': 'under'}
+    rows = []
+    for bookie in event.get('bookmakers', []):
+        for market in bookie.get('markets', []):
+            if market.get('key') not in ('h2h', 'totals'):
+                continue
+            for o in market.get('outcomes', []):
+                outcome = names.get(o.get('name'))
+                if outcome and o.get('price'):
+                    rows.append((bookie.get('key') or bookie.get('title', '?'), market['key'], outcome,
+                                 float(o.get('point') or 0.0), float(o['price'])))
+    return rows
+
+
 class OddsFetcher:
-    def __init__(self):
+    def __init__(self, cache_file=CACHE_FILE):
+        # One connection for the life of the fetcher (shared by scan threads under a lock)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_file, check_same_thread=False)
+        self._last_sweep = 0
         self._init_db()
 
     def _init_db(self):
-        conn = sqlite3.connect(CACHE_FILE)
-        c = conn.cursor()
-        # Dropping table to force schema update for new fields
-        c.execute("DROP TABLE IF EXISTS odds_cache")
-        c.execute('''CREATE TABLE IF NOT EXISTS odds_cache
-                     (sport_key TEXT, event_id TEXT, home_team TEXT, away_team TEXT, commence_time TEXT, 
-                      h2h_home REAL, h2h_away REAL, h2h_draw REAL, last_updated INTEGER, UNIQUE(sport_key, event_id))''')
-        conn.commit()
-        conn.close()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, stmt in enumerate(MIGRATIONS[version:], start=version + 1):
+                with self._conn:
+                    self._conn.execute(stmt)
+                    self._conn.execute(f"PRAGMA user_version = {target}")
+
+    def _sweep_expired(self, now):
+        """Delete stale rows periodically instead of on every read"""
+        if now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        with self._conn:
+            self._conn.execute("DELETE FROM odds_cache WHERE last_updated < ?", (now - CACHE_DURATION,))
+            self._conn.execute("DELETE FROM odds_prices WHERE last_updated < ?", (now - CACHE_DURATION,))
+        self._last_sweep = now
 
     def _get_from_cache(self, sport_key):
-        conn = sqlite3.connect(CACHE_FILE)
-        c = conn.cursor()
-        # Clean old cache
-        expiry = int(time.time()) - CACHE_DURATION
-        c.execute("DELETE FROM odds_cache WHERE last_updated < ?", (expiry,))
-        conn.commit()
-        
-        c.execute("SELECT event_id, home_team, away_team, commence_time, h2h_home, h2h_away, h2h_draw FROM odds_cache WHERE sport_key=?", (sport_key,))
-        rows = c.fetchall()
-        conn.close()
+        now = int(time.time())
+        with self._lock:
+            self._sweep_expired(now)
+            rows = self._conn.execute(SELECT_FRESH_SQL, (sport_key, now - CACHE_DURATION)).fetchall()
         
         if not rows:
             return None
@@ -55,40 +116,46 @@ class OddsFetcher:
         return data
 
     def _save_to_cache(self, sport_key, data):
-        conn = sqlite3.connect(CACHE_FILE)
-        c = conn.cursor()
         now = int(time.time())
+        rows = []
+        prices = []
         
         for event in data:
             event_id = event['id']
-            home = event['home_team']
-            away = event['away_team']
-            start = event['commence_time']
-            
-            # Extract H2H odds (avg or first bookie)
-            h2h = [0.0, 0.0, 0.0] # Home, Away, Draw
-            
-            # Simple extractor - take the first bookmaker 'pinnacle' or just first available
-            for bookie in event.get('bookmakers', []):
-                for market in bookie.get('markets', []):
-                    if market['key'] == 'h2h':
-                        # Assuming outcomes are [Home, Away] or [Home, Away, Draw]
-                        outcomes = {o['name']: o['price'] for o in market['outcomes']}
-                        h2h[0] = outcomes.get(home, 0.0)
-                        h2h[1] = outcomes.get(away, 0.0)
-                        # Draw logic is tricky as name is usually 'Draw'
-                        h2h[2] = outcomes.get('Draw', 0.0)
-                        break
-                if h2h[0]: break # Found odds from one bookie
+            ladder = ladder_rows(event)
+            prices.extend((sport_key, event_id, *r, now) for r in ladder)
             
-            c.execute('''INSERT OR REPLACE INTO odds_cache 
-                         (sport_key, event_id, home_team, away_team, commence_time, h2h_home, h2h_away, h2h_draw, last_updated)
-                         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''', 
-                         (sport_key, event_id, home, away, start, h2h[0], h2h[1], h2h[2], now))
-        conn.commit()
-        conn.close()
-
-    def get_odds(self, sport_key, regions='eu', markets='h2h'):
+            # Summary h2h columns: best price per outcome across bookmakers
+            best = {}
+            for _, market, outcome, _, price in ladder:
+                if market == 'h2h':
+                    best[outcome] = max(best.get(outcome, 0.0), price)
+            rows.append((sport_key, event_id, event['home_team'], event['away_team'], event['commence_time'],
+                         best.get('home', 0.0), best.get('away', 0.0), best.get('draw', 0.0), now))
+        
+        # One transaction, one prepared statement per table for the whole league
+        with self._lock, self._conn:
+            self._conn.executemany(UPSERT_SQL, rows)
+            self._conn.executemany(UPSERT_PRICE_SQL, prices)
+
+    def get_prices(self, sport_key):
+        """
+        Cached price ladder of a league as a DataFrame (PRICE_COLUMNS); never calls the API.
+        Empty for leagues not fetched since the ladder table was added.
+        """
+        with self._lock:
+            rows = self._conn.execute(SELECT_PRICES_SQL, (sport_key, int(time.time()) - CACHE_DURATION)).fetchall()
+        return pd.DataFrame(rows, columns=PRICE_COLUMNS)
+
+    def last_updated(self, sport_key):
+        """Timestamp of the freshest cached odds for a league, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(last_updated) FROM odds_cache WHERE sport_key=? AND last_updated >= ?",
+                (sport_key, int(time.time()) - CACHE_DURATION)).fetchone()
+        return row[0] if row else None
+
+    def get_odds(self, sport_key, regions='eu', markets=DEFAULT_MARKETS):
         """
         Get odds for a league. Checks cache first.
         Supports Key Rotation (comma separated in env).
@@ -121,7 +188,8 @@ class OddsFetcher:
             url = f"{BASE_URL}/{sport_key}/odds/?apiKey={key}&regions={regions}&markets={markets}"
             
             try:
-                res = requests.get(url)
+                # 401/429 mean this key is spent: rotate instead of backing off on it
+                res = http_client.get(url, retry_statuses=(500, 502, 503, 504))
                 if res.status_code == 200:
                     data = res.json()
                     self._save_to_cache(sport_key, data)
@@ -145,3 +213,109 @@ class OddsFetcher:
         
         print("  [Odds] All API Keys exhausted.")
         return {}
+
+
+# ========================================
+# ODDS INDEX (team-name matching)
+# ========================================
+# Team names resolve through the shared identity registry (teams.py)
+MIN_MATCH_CONFIDENCE = 0.6
+
+class OddsIndex:
+    """
+    In-memory index over one league's events, built once per scan.
+    Exact hits are a dict lookup on (home id, away id); fuzzy hits only score
+    events sharing a trigram with the home side.
+    """
+    def __init__(self, events):
+        self.events = list(events or [])
+        self._exact = {}
+        self._keys = []
+        self._by_gram = {}
+        for pos, event in enumerate(self.events):
+            home = normalize_team(event.get('home_team'))
+            away = normalize_team(event.get('away_team'))
+            self._keys.append((home, away))
+            self._exact.setdefault((team_id(event.get('home_team')), team_id(event.get('away_team'))), pos)
+            for gram in _trigrams(home):
+                self._by_gram.setdefault(gram, set()).add(pos)
+
+    def match(self, home_team, away_team):
+        """Returns (event, confidence 0..1); (None, 0.0) when nothing clears MIN_MATCH_CONFIDENCE"""
+        pos = self._exact.get((team_id(home_team), team_id(away_team)))
+        if pos is not None:
+            return self.events[pos], 1.0
+        
+        home = normalize_team(home_team)
+        away = normalize_team(away_team)
+
+        candidates = set()
+        for gram in _trigrams(home):
+            candidates |= self._by_gram.get(gram, set())
+
+        best, best_score = None, 0.0
+        for pos in candidates:
+            event_home, event_away = self._keys[pos]
+            # Both sides must agree - one good side is how the wrong game gets priced
+            score = min(_similarity(home, event_home), _similarity(away, event_away))
+            if score > best_score:
+                best, best_score = pos, score
+
+        if best is None or best_score < MIN_MATCH_CONFIDENCE:
+            return None, 0.0
+        return self.events[best], round(best_score, 3)
+
+
+# ========================================
+# CONSENSUS & VALUE (whole league at once)
+# ========================================
+UNDER_LINE = 3.5
+CONSENSUS_COLUMNS = ['line', 'p_under', 'best_under', 'best_under_book', 'best_over', 'n_books', 'overround']
+
+
+def totals_consensus(prices, point=UNDER_LINE):
+    """
+    Per event_id, on one half-goal totals line: `point` where any bookmaker
+    quotes both sides of it, otherwise the line most books quote (the bulk
+    odds endpoint mostly returns each book's main line, usually 2.5).
+    Over the books on that line: de-vigged consensus P(under) (each book's
+    1/price normalized by its overround, then averaged), best under/over
+    price, the book offering the best under, number of books, mean overround.
+    """
+    empty = pd.DataFrame(columns=CONSENSUS_COLUMNS, index=pd.Index([], name='event_id'))
+    if prices is None or prices.empty:
+        return empty
+    totals = prices[(prices['market'] == 'totals') & np.isclose(prices['point'] % 1, 0.5)]
+    book = totals.pivot_table(index=['event_id', 'point', 'bookmaker'], columns='outcome', values='price', aggfunc='max')
+    book = book.reindex(columns=['under', 'over']).dropna()
+    if book.empty:
+        return empty
+
+    # One line per event: the requested one, else the most quoted (ties: closest to it)
+    lines = book.groupby(level=['event_id', 'point']).size().rename('n_books').reset_index()
+    lines['requested'] = np.isclose(lines['point'], point)
+    lines['distance'] = (lines['point'] - point).abs()
+    chosen = (lines.sort_values(['requested', 'n_books', 'distance'], ascending=[False, False, True], kind='mergesort')
+                   .drop_duplicates('event_id'))
+    book = book.reset_index().merge(chosen[['event_id', 'point']], on=['event_id', 'point'])
+
+    implied = 1.0 / book[['under', 'over']]
+    book['overround'] = implied.sum(axis=1)
+    book['p_under'] = implied['under'] / book['overround']
+
+    grouped = book.groupby('event_id')
+    out = pd.DataFrame({
+        'line': grouped['point'].first(),
+        'p_under': grouped['p_under'].mean(),
+        'best_under': grouped['under'].max(),
+        'best_under_book': book.loc[grouped['under'].idxmax(), ['event_id', 'bookmaker']].set_index('event_id')['bookmaker'],
+        'best_over': grouped['over'].max(),
+        'n_books': grouped.size(),
+        'overround': grouped['overround'].mean(),
+    })
+    return out[CONSENSUS_COLUMNS]
+
+
+def value_edge(p_model, best_price):
+    """Expected return per unit at the best price: p_model * price - 1 (NaN where unknown)"""
+    return np.asarray(p_model, dtype=float) * np.asarray(best_price, dtype=float) - 1.0
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+FILTER_PROFILES threshold optimizer.
+
+Grid or random search over a league's filter thresholds, evaluated against
+past seasons with a process pool. Match features are built once, written to
+.npy files and memory-mapped by every worker, and each task scores a whole
+chunk of threshold combinations with NumPy broadcasting.
+
+Output: ranked table of ROI vs. signal volume with the Pareto front flagged.
+Bets are priced at the line-adjusted closing Under 3.5 price from the CSVs
+(backtest.under35_prices); ROI covers priced bets only.
+
+    python optimizer.py --league "Premier League" --random 5000 --workers 8
+"""
+
+import os
+import argparse
+import itertools
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+import under35_scanner as scanner
+from backtest import BACKTEST_SEASONS, FORM_COLS, season_matches
+from filter_rules import RULES
+
+OPTIMIZER_DIR = "data/optimizer"
+CHUNK_SIZE = 256
+
+# Candidate thresholds per profile key (feature column and bound come from filter_rules.RULES)
+SWEEP_GRID = {
+    'opp_last5_max': list(range(0, 16)),
+    'opp_avg_g_max': [round(0.5 + 0.1 * i, 1) for i in range(16)],
+    'xg_opp_max': [round(0.5 + 0.1 * i, 1) for i in range(16)],
+    'clean_last3_min': list(range(0, 4)),
+    'clean_last4_min': list(range(0, 5)),
+    'clean_sheets_pct_min': list(range(0, 85, 5)),
+    'btts_no_pct_min': list(range(0, 85, 5)),
+    'home_winrate_min': list(range(0, 105, 5)),
+}
+
+
+# ========================================
+# FEATURES (built once per league)
+# ========================================
+def build_feature_arrays(name, profile, seasons=None):
+    """Stacked per-match arrays over all seasons: features, has_opp, won, odds"""
+    frames = []
+    for season in seasons or BACKTEST_SEASONS:
+        season_df = scanner.load_football_data_csv(name, season)
+        matches = season_matches(season_df)
+        if matches.empty:
+            continue
+        home_form = matches[[f'home_{c}' for c in FORM_COLS]].set_axis(FORM_COLS, axis=1)
+        away_form = matches[[f'away_{c}' for c in FORM_COLS]].set_axis(FORM_COLS, axis=1)
+        features = scanner.fixture_features(matches['home'], matches['away'], home_form, away_form,
+                                            profile['team_top'])
+        features['won'] = ((matches['hg'] + matches['ag']) < 3.5).to_numpy()
+        features['odds'] = matches['odds'].to_numpy()
+        frames.append(features)
+    if not frames:
+        return None
+
+    features = pd.concat(frames, ignore_index=True)
+    features = features[features['is_top_match']]  # Nothing else can ever pass
+    arrays = {
+        'has_opp': features['opp_last5_goals_scored'].notna().to_numpy(),
+        'won': features['won'].to_numpy(dtype=bool),
+        'odds': features['odds'].to_numpy(dtype=float),
+    }
+    for col, _ in RULES.values():
+        arrays[col] = features[col].to_numpy(dtype=float)
+    return arrays
+
+
+def save_shared(arrays, directory):
+    """Write arrays as .npy so workers can memory-map instead of unpickling copies"""
+    paths = {}
+    for key, arr in arrays.items():
+        paths[key] = os.path.join(directory, f"{key}.npy")
+        np.save(paths[key], arr)
+    return paths
+
+
+# ========================================
+# WORKERS
+# ========================================
+_SHARED = {}
+
+def _init_worker(paths):
+    global _SHARED
+    _SHARED = {key: np.load(path, mmap_mode='r') for key, path in paths.items()}
+
+
+def _evaluate_chunk(param_names, combos):
+    """Scores k combinations at once: returns (k, 4) array of bets, wins, priced bets, profit"""
+    combos = np.asarray(combos, dtype=float)
+    has_opp = np.asarray(_SHARED['has_opp'])
+    won = np.asarray(_SHARED['won'])
+    odds = np.asarray(_SHARED['odds'])
+    priced = ~np.isnan(odds)
+    # Per-match return of a 1-unit stake (0 where unpriced, so it drops out of profit)
+    ret = np.where(priced, np.where(won, odds - 1.0, -1.0), 0.0)
+    passes = np.ones((len(combos), len(won)), dtype=bool)
+    for j, name in enumerate(param_names):
+        col, bound = RULES[name]
+        values = np.asarray(_SHARED[col])[None, :]
+        thresholds = combos[:, j][:, None]
+        # NaN comparisons are False, so a missing stat never rejects
+        failed = values > thresholds if bound == 'max' else values < thresholds
+        passes &= ~failed
+    mask = ~has_opp[None, :] | passes
+    bets = mask.sum(axis=1)
+    wins = (mask & won[None, :]).sum(axis=1)
+    return np.column_stack([bets, wins, mask @ priced.astype(float), mask @ ret])
+
+
+# ========================================
+# SEARCH
+# ========================================
+def candidate_combos(param_names, random_n=None, seed=0):
+    grids = [SWEEP_GRID[p] for p in param_names]
+    if not random_n:
+        return np.array(list(itertools.product(*grids)), dtype=float)
+    rng = np.random.default_rng(seed)
+    picks = [rng.choice(g, size=random_n) for g in grids]
+    return np.unique(np.column_stack(picks).astype(float), axis=0)
+
+
+def pareto_front(bets, roi):
+    """True where no other combination has at least as many bets and at least as much ROI (one strictly)"""
+    order = np.lexsort((-roi, -bets))
+    best_roi = -np.inf
+    front = np.zeros(len(bets), dtype=bool)
+    for i in order:
+        if roi[i] > best_roi:
+            front[i] = True
+            best_roi = roi[i]
+    return front
+
+
+def optimize_league(name, seasons=None, random_n=None, workers=None, min_bets=10, param_names=None):
+    """Ranked DataFrame of threshold combinations for one league"""
+    profile = scanner.FILTER_PROFILES[name]
+    # Default: sweep the thresholds this league's profile declares
+    param_names = param_names or [key for key in profile if key in SWEEP_GRID]
+    arrays = build_feature_arrays(name, profile, seasons)
+    if arrays is None:
+        print(f"No historical data for {name}")
+        return pd.DataFrame()
+
+    combos = candidate_combos(param_names, random_n)
+    chunks = [combos[i:i + CHUNK_SIZE] for i in range(0, len(combos), CHUNK_SIZE)]
+    print(f"🔧 {name}: {len(combos)} combinations x {len(arrays['won'])} matches")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = save_shared(arrays, tmp)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(paths,)) as pool:
+            scores = list(pool.map(_evaluate_chunk, itertools.repeat(param_names), chunks))
+
+    scores = np.vstack(scores)
+    table = pd.DataFrame(combos, columns=param_names)
+    table['bets'] = scores[:, 0].astype(int)
+    table['wins'] = scores[:, 1].astype(int)
+    table['priced'] = scores[:, 2].astype(int)
+    table['profit'] = scores[:, 3].round(2)
+    table = table[table['priced'] >= min_bets].copy()
+    if table.empty:
+        return table
+    table['hit_rate'] = (table['wins'] / table['bets'] * 100).round(1)
+    table['roi'] = (table['profit'] / table['priced'] * 100).round(2)
+    table['pareto'] = pareto_front(table['bets'].to_numpy(), table['roi'].to_numpy())
+    return table.sort_values(['pareto', 'roi', 'bets'], ascending=[False, False, False]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep FILTER_PROFILES thresholds against past seasons")
+    parser.add_argument("--league", action="append", help="League name (repeatable); default: all with CSVs")
+    parser.add_argument("--seasons", default=",".join(BACKTEST_SEASONS))
+    parser.add_argument("--random", type=int, default=None, help="Random search with N samples instead of full grid")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--min-bets", type=int, default=10)
+    parser.add_argument("--params", default=None, help=f"Comma-separated keys to sweep: {', '.join(SWEEP_GRID)}")
+    args = parser.parse_args()
+    params = args.params.split(",") if args.params else None
+
+    leagues = args.league or [n for n in scanner.FILTER_PROFILES if n in scanner.FOOTBALL_DATA_CODES]
+    os.makedirs(OPTIMIZER_DIR, exist_ok=True)
+    for league in leagues:
+        table = optimize_league(league, args.seasons.split(","), args.random, args.workers, args.min_bets, params)
+        if table.empty:
+            continue
+        out = os.path.join(OPTIMIZER_DIR, f"{league.replace(' ', '_')}.csv")
+        table.to_csv(out, index=False)
+        print(table[table['pareto']].head(10).to_string(index=False))
+        print(f"✅ {len(table)} rows saved to {out}\n")
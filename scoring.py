@@ -0,0 +1,268 @@
+"""
+Score-probability engine: Dixon-Coles on football-data results.
+
+Per league-season, attack/defence strengths are fitted by weighted Poisson
+maximum likelihood (multiplicative fixed-point updates, older matches decayed
+by XI per day, SHRINK pseudo-matches pulling thin teams to the league mean),
+then the Dixon-Coles low-score correction rho by grid search. For a slate of
+fixtures the full scoreline matrix is one (n, G, G) array, from which
+P(Under 3.5), P(even total), 1X2 and the top-k scores are plain reductions.
+Fitted parameters are cached per league-season (memory + JSON) and refitted
+only when the results change.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from teams import team_ids
+
+SCORING_CACHE_FILE = "data/scoring_params.json"
+MAX_GOALS = 10          # Matrix covers 0..MAX_GOALS goals per side
+XI = 0.0019             # Time decay per day (Dixon & Coles 1997)
+SHRINK = 2.0            # Pseudo-matches at league average per team
+FIT_ITERATIONS = 100
+RHO_GRID = np.linspace(-0.25, 0.25, 101)
+MIN_MATCHES = 20        # Fewer results than this: no model for the league
+
+_cache_lock = threading.Lock()
+_models = {}
+
+
+# ========================================
+# MODEL
+# ========================================
+class ScoreModel:
+    def __init__(self, ids, attack, defence, base_home, base_away, rho, n_matches=0):
+        order = np.argsort(ids)
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.attack = np.asarray(attack, dtype=float)[order]
+        self.defence = np.asarray(defence, dtype=float)[order]
+        self.base_home = float(base_home)
+        self.base_away = float(base_away)
+        self.rho = float(rho)
+        self.n_matches = int(n_matches)
+
+    def _lookup(self, values, names):
+        """Per-name strength (1.0 = league average for teams without results)"""
+        ids = team_ids(names)
+        pos = np.clip(np.searchsorted(self.ids, ids), 0, max(len(self.ids) - 1, 0))
+        found = (self.ids[pos] == ids) if len(self.ids) else np.zeros(len(ids), dtype=bool)
+        return np.where(found, values[pos] if len(values) else 1.0, 1.0)
+
+    def expected_goals(self, home, away):
+        """(lambda_home, mu_away) arrays for fixture name arrays"""
+        lam = self.base_home * self._lookup(self.attack, home) * self._lookup(self.defence, away)
+        mu = self.base_away * self._lookup(self.attack, away) * self._lookup(self.defence, home)
+        return lam, mu
+
+    def to_dict(self):
+        return {'ids': self.ids.tolist(), 'attack': self.attack.tolist(), 'defence': self.defence.tolist(),
+                'base_home': self.base_home, 'base_away': self.base_away, 'rho': self.rho,
+                'n_matches': self.n_matches}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['ids'], data['attack'], data['defence'], data['base_home'], data['base_away'],
+                   data['rho'], data.get('n_matches', 0))
+
+
+def _tau(hg, ag, lam, mu, rho):
+    """Dixon-Coles correction factor for scores 0:0, 0:1, 1:0, 1:1 (1 elsewhere); rho may broadcast"""
+    return np.select(
+        [(hg == 0) & (ag == 0), (hg == 0) & (ag == 1), (hg == 1) & (ag == 0), (hg == 1) & (ag == 1)],
+        [1 - lam * mu * rho, 1 + lam * rho, 1 + mu * rho, 1 - rho + 0 * lam],
+        1.0)
+
+
+def fit(results, xi=XI, shrink=SHRINK, iterations=FIT_ITERATIONS):
+    """
+    ScoreModel from finished matches (columns home, away, hg, ag[, date]),
+    or None with fewer than MIN_MATCHES results.
+    """
+    results = results.dropna(subset=['home', 'away', 'hg', 'ag'])
+    if len(results) < MIN_MATCHES:
+        return None
+
+    home_ids, away_ids = team_ids(results['home']), team_ids(results['away'])
+    ids, codes = np.unique(np.concatenate([home_ids, away_ids]), return_inverse=True)
+    h, a = codes[:len(results)], codes[len(results):]
+    hg = results['hg'].to_numpy(dtype=float)
+    ag = results['ag'].to_numpy(dtype=float)
+    n = len(ids)
+
+    w = np.ones(len(results))
+    if 'date' in results.columns and results['date'].notna().any():
+        age = (results['date'].max() - results['date']).dt.days.to_numpy(dtype=float)
+        w = np.exp(-xi * np.nan_to_num(age, nan=0.0))
+
+    def per_team(values, idx):
+        return np.bincount(idx, weights=values, minlength=n)
+
+    scored = per_team(w * hg, h) + per_team(w * ag, a)
+    conceded = per_team(w * ag, h) + per_team(w * hg, a)
+    attack, defence = np.ones(n), np.ones(n)
+    base_home = (w * hg).sum() / w.sum()
+    base_away = (w * ag).sum() / w.sum()
+
+    for _ in range(iterations):
+        # Expected goals per team at strength 1.0, given the other side's strengths
+        exp_for = per_team(w * base_home * defence[a], h) + per_team(w * base_away * defence[h], a)
+        attack = (scored + shrink) / (exp_for + shrink)
+        attack /= attack.mean()
+        exp_against = per_team(w * base_away * attack[a], h) + per_team(w * base_home * attack[h], a)
+        defence = (conceded + shrink) / (exp_against + shrink)
+        defence /= defence.mean()
+        base_home = (w * hg).sum() / (w * attack[h] * defence[a]).sum()
+        base_away = (w * ag).sum() / (w * attack[a] * defence[h]).sum()
+
+    lam = base_home * attack[h] * defence[a]
+    mu = base_away * attack[a] * defence[h]
+    tau = _tau(hg[None, :], ag[None, :], lam[None, :], mu[None, :], RHO_GRID[:, None])
+    loglik = np.where(tau > 0, w * np.log(np.maximum(tau, 1e-12)), -np.inf).sum(axis=1)
+    rho = float(RHO_GRID[np.argmax(loglik)])
+
+    return ScoreModel(ids, attack, defence, base_home, base_away, rho, len(results))
+
+
+# ========================================
+# PER LEAGUE-SEASON CACHE
+# ========================================
+def _fingerprint(results):
+    cols = results[['home', 'away', 'hg', 'ag']].astype(str)
+    digest = pd.util.hash_pandas_object(cols, index=False).to_numpy().tobytes()
+    return hashlib.sha1(digest).hexdigest()
+
+
+def _load_cache_file():
+    try:
+        with open(SCORING_CACHE_FILE, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def league_model(league, season, results):
+    """Fitted model for a league-season, reused while its results are unchanged"""
+    key = f"{league}|{season}"
+    fingerprint = _fingerprint(results)
+    with _cache_lock:
+        cached = _models.get(key)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        stored = _load_cache_file().get(key)
+        if stored and stored.get('fingerprint') == fingerprint:
+            model = ScoreModel.from_dict(stored['params']) if stored.get('params') else None
+            _models[key] = (fingerprint, model)
+            return model
+
+    model = fit(results)
+    with _cache_lock:
+        _models[key] = (fingerprint, model)
+        data = _load_cache_file()
+        data[key] = {'fingerprint': fingerprint, 'params': model.to_dict() if model else None}
+        os.makedirs(os.path.dirname(SCORING_CACHE_FILE) or ".", exist_ok=True)
+        tmp = SCORING_CACHE_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, SCORING_CACHE_FILE)
+    return model
+
+
+# ========================================
+# SCORELINE MATRICES
+# ========================================
+def poisson_pmf(rate, max_goals=MAX_GOALS):
+    """(n, max_goals + 1) Poisson probabilities of 0..max_goals"""
+    k = np.arange(max_goals + 1)
+    log_fact = np.concatenate([[0.0], np.cumsum(np.log(np.arange(1, max_goals + 1)))])
+    rate = np.asarray(rate, dtype=float)[:, None]
+    return np.exp(k * np.log(np.maximum(rate, 1e-12)) - rate - log_fact)
+
+
+def score_matrix(lam, mu, rho=0.0, max_goals=MAX_GOALS):
+    """(n, G, G) scoreline probabilities, [i, j] = home i : away j (renormalized)"""
+    lam = np.asarray(lam, dtype=float)
+    mu = np.asarray(mu, dtype=float)
+    m = poisson_pmf(lam, max_goals)[:, :, None] * poisson_pmf(mu, max_goals)[:, None, :]
+    m[:, 0, 0] *= 1 - lam * mu * rho
+    m[:, 0, 1] *= 1 + lam * rho
+    m[:, 1, 0] *= 1 + mu * rho
+    m[:, 1, 1] *= 1 - rho
+    m = np.maximum(m, 0.0)
+    return m / m.sum(axis=(1, 2), keepdims=True)
+
+
+def _goal_grids(max_goals):
+    i, j = np.indices((max_goals + 1, max_goals + 1))
+    return i, j, i + j
+
+
+def matrix_summary(matrix, top_k=3):
+    """Market probabilities and the top-k scorelines of (n, G, G) matrices"""
+    g = matrix.shape[1]
+    i, j, total = _goal_grids(g - 1)
+    flat = matrix.reshape(len(matrix), -1)
+    top = np.argsort(-flat, axis=1, kind="stable")[:, :top_k]
+    labels = np.array([f"{a}:{b}" for a, b in zip(i.ravel(), j.ravel())])
+    return {
+        'p_under35': (matrix * (total <= 3)).sum(axis=(1, 2)),
+        'p_even': (matrix * (total % 2 == 0)).sum(axis=(1, 2)),
+        'p_home': (matrix * (i > j)).sum(axis=(1, 2)),
+        'p_draw': (matrix * (i == j)).sum(axis=(1, 2)),
+        'p_away': (matrix * (i < j)).sum(axis=(1, 2)),
+        'top_scores': labels[top],
+        'top_probs': np.take_along_axis(flat, top, axis=1),
+    }
+
+
+def slate_probabilities(model, home, away, top_k=3):
+    """
+    One batched pass over a slate: DataFrame with exp_home, exp_away, rho,
+    p_under35, p_even, p_home/p_draw/p_away, probable_scores ('1:0, 1:1, 0:0'),
+    top_probs and fair_under35 (1 / p_under35).
+    """
+    lam, mu = model.expected_goals(home, away)
+    summary = matrix_summary(score_matrix(lam, mu, model.rho), top_k)
+    out = pd.DataFrame({
+        'exp_home': lam,
+        'exp_away': mu,
+        'rho': model.rho,
+        'p_under35': summary['p_under35'],
+        'p_even': summary['p_even'],
+        'p_home': summary['p_home'],
+        'p_draw': summary['p_draw'],
+        'p_away': summary['p_away'],
+        'probable_scores': [", ".join(s) for s in summary['top_scores']],
+        'top_probs': list(summary['top_probs']),
+    })
+    out['fair_under35'] = 1.0 / out['p_under35']
+    return out
+
+
+def p_under_line(exp_home, exp_away, rho, lines, max_goals=MAX_GOALS):
+    """P(total goals < line) per fixture for half-goal lines (NaN where the line is unknown)"""
+    lines = np.asarray(lines, dtype=float)
+    matrix = score_matrix(exp_home, exp_away, rho, max_goals)
+    _, _, total = _goal_grids(max_goals)
+    p = (matrix * (total[None, :, :] < lines[:, None, None])).sum(axis=(1, 2))
+    return np.where(np.isnan(lines), np.nan, p)
+
+
+def outcome_probability(exp_home, exp_away, rho, outcome):
+    """P of an editor outcome for one fixture: 'i:j' / 'Счет i:j', 'ЧЕТ' or 'НЕЧЕТ' (None if unknown)"""
+    matrix = score_matrix([exp_home], [exp_away], rho)[0]
+    _, _, total = _goal_grids(matrix.shape[0] - 1)
+    text = str(outcome).lower().replace("счет", "").strip()
+    if text == "чет":
+        return float(matrix[total % 2 == 0].sum())
+    if text == "нечет":
+        return float(matrix[total % 2 == 1].sum())
+    parts = text.split(":")
+    if len(parts) == 2 and all(p.strip().isdigit() for p in parts):
+        hg, ag = (int(p) for p in parts)
+        if hg < matrix.shape[0] and ag < matrix.shape[1]:
+            return float(matrix[hg, ag])
+    return None
@@ -0,0 +1,198 @@
+"""
+Signal store (SQLite).
+
+Every scan publishes its signals under a new scan id in one transaction, so
+readers see either the previous scan or the complete new one, never half of
+it. Reads are filtered in SQL (league, kickoff range, confidence, top-N)
+against the latest published scan unless a scan id is given.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+import pandas as pd
+
+SIGNALS_DB = os.getenv("SIGNALS_DB", "data/signals.db")
+
+SIGNAL_COLUMNS = ['League', 'Date', 'Home', 'Away', 'Prediction', 'Odds', 'Confidence', 'Watchlist']
+# Score-model and market fields; NULL where a league has no model / no priced line
+MODEL_COLUMNS = {'Probable Scores': 'probable_scores', 'P Under 3.5': 'p_under35', 'Fair Odds': 'fair_odds',
+                 'Exp Home': 'exp_home', 'Exp Away': 'exp_away', 'Rho': 'rho',
+                 # Market fields (odds_api consensus over all bookmakers)
+                 'Market Line': 'market_line', 'Market Prob': 'market_prob', 'Best Book': 'best_book', 'Edge': 'edge'}
+
+# Versioned schema, same scheme as the odds cache: entry N upgrades user_version N to N+1
+MIGRATIONS = [
+    # v1: scans + signals
+    '''CREATE TABLE IF NOT EXISTS scans
+       (scan_id INTEGER PRIMARY KEY AUTOINCREMENT, published_at REAL, days INTEGER, n_signals INTEGER)''',
+    '''CREATE TABLE IF NOT EXISTS signals
+       (scan_id INTEGER NOT NULL, rank INTEGER NOT NULL, league TEXT, date TEXT, kickoff TEXT,
+        home TEXT, away TEXT, prediction TEXT, odds REAL, confidence INTEGER, watchlist TEXT,
+        home_ru TEXT, away_ru TEXT, PRIMARY KEY (scan_id, rank))''',
+    # v2: filtered reads
+    "CREATE INDEX IF NOT EXISTS idx_signals_league_kickoff ON signals (scan_id, league, kickoff)",
+    "CREATE INDEX IF NOT EXISTS idx_signals_confidence ON signals (scan_id, confidence)",
+    "CREATE INDEX IF NOT EXISTS idx_signals_kickoff ON signals (scan_id, kickoff)",
+    # v3: score-model fields
+    "ALTER TABLE signals ADD COLUMN probable_scores TEXT",
+    "ALTER TABLE signals ADD COLUMN p_under35 REAL",
+    "ALTER TABLE signals ADD COLUMN fair_odds REAL",
+    "ALTER TABLE signals ADD COLUMN exp_home REAL",
+    "ALTER TABLE signals ADD COLUMN exp_away REAL",
+    "ALTER TABLE signals ADD COLUMN rho REAL",
+    # v4: market consensus / value fields
+    "ALTER TABLE signals ADD COLUMN market_prob REAL",
+    "ALTER TABLE signals ADD COLUMN best_book TEXT",
+    "ALTER TABLE signals ADD COLUMN edge REAL",
+    # v5: totals line the market fields refer to
+    "ALTER TABLE signals ADD COLUMN market_line REAL",
+]
+
+INSERT_SQL = """INSERT INTO signals
+                (scan_id, rank, league, date, kickoff, home, away, prediction, odds, confidence, watchlist,
+                 probable_scores, p_under35, fair_odds, exp_home, exp_away, rho, market_line, market_prob, best_book, edge)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+
+def _kickoff(date_str):
+    """'2025-01-18 20:00 (MSK)' -> '2025-01-18 20:00' (sortable, range-queryable)"""
+    return str(date_str)[:16]
+
+
+def _confidence(value):
+    # Numeric scores are stored as integers; labels such as 'INFO' as NULL
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _optional(value):
+    # NaN (missing fields in a mixed DataFrame) -> NULL
+    return None if value is None or (isinstance(value, float) and value != value) else value
+
+
+class SignalStore:
+    def __init__(self, db_file=SIGNALS_DB):
+        if os.path.dirname(db_file):
+            os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, stmt in enumerate(MIGRATIONS[version:], start=version + 1):
+                with self._conn:
+                    self._conn.execute(stmt)
+                    self._conn.execute(f"PRAGMA user_version = {target}")
+
+    # --- write ---
+    def publish(self, signals_df, days=None):
+        """Store a scan's signals (in their ranked order) atomically; returns the new scan id"""
+        records = signals_df.to_dict(orient="records") if signals_df is not None else []
+        with self._lock, self._conn:
+            cur = self._conn.execute("INSERT INTO scans (published_at, days, n_signals) VALUES (?, ?, ?)",
+                                     (time.time(), days, len(records)))
+            scan_id = cur.lastrowid
+            self._conn.executemany(INSERT_SQL, [
+                (scan_id, rank, r.get('League'), r.get('Date'), _kickoff(r.get('Date')),
+                 r.get('Home'), r.get('Away'), r.get('Prediction'), float(r.get('Odds') or 0.0),
+                 _confidence(r.get('Confidence')), _optional(r.get('Watchlist')) or '',
+                 *(_optional(r.get(col)) for col in MODEL_COLUMNS))
+                for rank, r in enumerate(records)
+            ])
+        return scan_id
+
+    def save_translations(self, scan_id, names):
+        """Store Russian team names ({original: ru}) for a scan's signals"""
+        if not names:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE signals SET home_ru=? WHERE scan_id=? AND home=?",
+                                   [(ru, scan_id, name) for name, ru in names.items()])
+            self._conn.executemany("UPDATE signals SET away_ru=? WHERE scan_id=? AND away=?",
+                                   [(ru, scan_id, name) for name, ru in names.items()])
+
+    # --- read ---
+    def latest_scan_id(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(scan_id) FROM scans").fetchone()
+        return row[0] if row else None
+
+    def scan_info(self, scan_id=None):
+        scan_id = scan_id or self.latest_scan_id()
+        if scan_id is None:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT scan_id, published_at, days, n_signals FROM scans WHERE scan_id=?",
+                                     (scan_id,)).fetchone()
+        if not row:
+            return None
+        return {'scan_id': row[0], 'published_at': row[1], 'days': row[2], 'n_signals': row[3]}
+
+    def read(self, scan_id=None, league=None, date_from=None, date_to=None, min_confidence=None,
+             top=None, by_confidence=False, translated=False):
+        """
+        Signals of one scan (latest by default) as a DataFrame with the scanner's columns.
+        date_from/date_to: 'YYYY-MM-DD[ HH:MM]' bounds on kickoff (inclusive).
+        top: first N rows, by confidence when by_confidence else in published order.
+        translated: Home/Away in Russian where a translation is stored.
+        """
+        scan_id = scan_id or self.latest_scan_id()
+        if scan_id is None:
+            return pd.DataFrame(columns=SIGNAL_COLUMNS + list(MODEL_COLUMNS))
+
+        where, params = ["scan_id = ?"], [scan_id]
+        if league:
+            where.append("league = ?")
+            params.append(league)
+        if date_from:
+            where.append("kickoff >= ?")
+            params.append(str(date_from))
+        if date_to:
+            where.append("kickoff <= ?")
+            # A bare date includes the whole day
+            params.append(str(date_to) + (" 99:99" if len(str(date_to)) == 10 else ""))
+        if min_confidence is not None:
+            where.append("confidence >= ?")
+            params.append(min_confidence)
+        order = "confidence DESC, rank" if by_confidence else "rank"
+        sql = (f"SELECT league, date, home, away, prediction, odds, confidence, watchlist, "
+               f"{', '.join(MODEL_COLUMNS.values())}, home_ru, away_ru "
+               f"FROM signals WHERE {' AND '.join(where)} ORDER BY {order}")
+        if top:
+            sql += " LIMIT ?"
+            params.append(int(top))
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        df = pd.DataFrame(rows, columns=SIGNAL_COLUMNS + list(MODEL_COLUMNS) + ['home_ru', 'away_ru'])
+        df['Confidence'] = [int(c) if pd.notna(c) else 'INFO' for c in df['Confidence']]
+        # Keep missing model fields as None (JSON-safe), not NaN
+        model = df[list(MODEL_COLUMNS)].astype(object)
+        df[list(MODEL_COLUMNS)] = model.where(model.notna(), None)
+        if translated:
+            df['Home'] = df['home_ru'].fillna(df['Home'])
+            df['Away'] = df['away_ru'].fillna(df['Away'])
+        return df.drop(columns=['home_ru', 'away_ru'])
+
+    def untranslated_teams(self, scan_id=None):
+        """Team names in a scan that have no stored translation yet"""
+        scan_id = scan_id or self.latest_scan_id()
+        if scan_id is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                """SELECT home FROM signals WHERE scan_id=? AND home_ru IS NULL
+                   UNION SELECT away FROM signals WHERE scan_id=? AND away_ru IS NULL""",
+                (scan_id, scan_id)).fetchall()
+        return [r[0] for r in rows if r[0]]
+
+
+store = SignalStore()
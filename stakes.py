@@ -0,0 +1,108 @@
+"""
+Stake solver for dutched systems (one payout whichever slip wins).
+
+Equal-return stakes are proportional to the implied probabilities 1/odds.
+Modes differ only in how the total is chosen:
+    budget  - spend exactly `budget`
+    profit  - net `profit` whichever slip wins (needs sum(1/odds) < 1)
+    kelly   - Kelly-sized total: the system is one bet at odds 1/sum(1/odds)
+Rounded stakes (multiples of `step`, at least `min_stake`) are allocated by
+largest remainder on the payout error, so payouts stay as even as the
+rounding allows.
+"""
+
+import numpy as np
+
+
+def implied_probs(odds):
+    return 1.0 / np.asarray(odds, dtype=float)
+
+
+def kelly_fraction(odds, win_prob):
+    """f* = (bp - q) / b, b = odds - 1 (negative = no edge)"""
+    b = odds - 1
+    return (b * win_prob - (1 - win_prob)) / b
+
+
+def system_total(odds, mode="budget", budget=None, profit=None, bankroll=None,
+                 win_prob=None, kelly_scale=1.0):
+    """Total amount to stake on the system for the given mode"""
+    book = implied_probs(odds).sum()
+    if mode == "budget":
+        return float(budget)
+    if mode == "profit":
+        if book >= 1:
+            raise ValueError(f"No fixed profit possible: implied probability sum is {book:.3f} >= 1")
+        return float(profit) * book / (1 - book)
+    if mode == "kelly":
+        if win_prob is None:
+            raise ValueError("Kelly mode needs the system's win probability")
+        if book >= 1:
+            return 0.0  # System pays at most the stake back: never an edge
+        return float(bankroll) * max(kelly_fraction(1 / book, win_prob), 0.0) * kelly_scale
+    raise ValueError(f"Unknown stake mode: {mode!r}")
+
+
+def equal_return_stakes(odds, total):
+    """Stakes with identical payout, summing to `total`"""
+    probs = implied_probs(odds)
+    return total * probs / probs.sum()
+
+
+def round_stakes(odds, stakes, step=1.0, min_stake=0.0):
+    """
+    Round stakes to multiples of `step` (>= min_stake) keeping their total:
+    floor everything, then hand the leftover units to the slips where rounding
+    up cuts the squared payout error most (largest remainder, weighted by odds).
+    """
+    odds = np.asarray(odds, dtype=float)
+    ideal = np.asarray(stakes, dtype=float) / step
+    total_units = int(round(ideal.sum()))
+    min_units = int(np.ceil(min_stake / step - 1e-9)) if min_stake else 0
+    if min_units * len(ideal) > total_units:
+        raise ValueError(f"Budget too small for {len(ideal)} stakes of at least {min_stake}")
+
+    # Slips under the minimum are pinned to it; the rest re-share what is left
+    pinned = np.zeros(len(ideal), dtype=bool)
+    while True:
+        below = ~pinned & (ideal < min_units)
+        if not below.any():
+            break
+        pinned |= below
+        ideal = np.where(pinned, min_units, ideal)
+        free = total_units - min_units * pinned.sum()
+        if (~pinned).any():
+            ideal[~pinned] = free * equal_return_stakes(odds[~pinned], 1.0)
+
+    units = np.maximum(np.floor(ideal + 1e-9), min_units).astype(np.int64)
+    leftover = total_units - units.sum()
+    if leftover > 0:
+        # Squared payout error saved by rounding a slip up instead of down
+        frac = ideal - units
+        gain = odds ** 2 * (2 * frac - 1)
+        units[np.argsort(-gain, kind="stable")[:leftover]] += 1
+    return units * step
+
+
+def solve_stakes(odds, mode="budget", step=None, min_stake=0.0, **params):
+    """
+    Stake plan for a system: {"stakes", "payouts", "total", "payout_min",
+    "payout_max", "profit_min", "profit_max"} (arrays in slip order).
+    params: budget / profit / bankroll + win_prob (+ kelly_scale) per mode.
+    """
+    odds = np.asarray(odds, dtype=float)
+    total = system_total(odds, mode, **params)
+    stakes = equal_return_stakes(odds, total)
+    if step:
+        stakes = round_stakes(odds, stakes, step, min_stake)
+    payouts = stakes * odds
+    total = float(stakes.sum())
+    return {
+        "stakes": stakes,
+        "payouts": payouts,
+        "total": total,
+        "payout_min": float(payouts.min()),
+        "payout_max": float(payouts.max()),
+        "profit_min": float(payouts.min()) - total,
+        "profit_max": float(payouts.max()) - total,
+    }
@@ -0,0 +1,124 @@
+"""
+System bets: N matches x M_i outcomes, every combination one express slip.
+
+Slip order is the C-order of the outcome grid, i.e. exactly itertools.product
+order, and a slip's flat index is np.ravel_multi_index of its outcome
+positions. Combination odds are one outer product over the per-match odds, so
+a 6x4 system (4096 slips) costs a single array op; the slips themselves are
+generated lazily.
+"""
+
+import itertools
+import numpy as np
+
+DEFAULT_ODD = 1.9     # Placeholder price when a match has no odds yet
+MIN_COMBO_ODD = 1.01  # Floor for degenerate (<= 1.0) combination odds
+
+
+def split_odds(odds, shape, default=DEFAULT_ODD):
+    """
+    Per-match odds arrays for a system of the given shape. Accepts a list per
+    match, or a flat list [m1_o1, m1_o2, ..., m2_o1, ...]; None means `default`
+    for every outcome. Odds that do not fit the shape raise ValueError.
+    """
+    if odds is None:
+        return [np.full(n, default, dtype=float) for n in shape]
+    if len(odds) and all(np.ndim(o) == 1 for o in odds):
+        lengths = [len(o) for o in odds]
+        if lengths != list(shape):
+            raise ValueError(f"Odds per match {lengths} do not match the system's outcomes {list(shape)}")
+        return [np.asarray(o, dtype=float) for o in odds]
+    if len(odds) != sum(shape):
+        raise ValueError(f"Got {len(odds)} odds for a system with {sum(shape)} outcomes {list(shape)}")
+    bounds = np.cumsum((0,) + tuple(shape))
+    flat = np.asarray(odds, dtype=float)
+    return [flat[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+class SystemBet:
+    def __init__(self, outcomes, odds=None, matches=None):
+        """
+        outcomes: one list of outcome labels per match
+        odds: per-match lists or a flat list (see split_odds); None = DEFAULT_ODD
+        A label listed twice for one match is enumerated as given but cannot be
+        mapped back to a position (positions/index_of raise ValueError).
+        matches: optional match labels (used by labelled_slips)
+        """
+        self.outcomes = [list(o) for o in outcomes]
+        if not self.outcomes or any(not o for o in self.outcomes):
+            raise ValueError("A system needs at least one match and one outcome per match")
+        self.shape = tuple(len(o) for o in self.outcomes)
+        self.odds = split_odds(odds, self.shape)
+        self.matches = list(matches) if matches is not None else [f"Match {i + 1}" for i in range(len(self.shape))]
+        self._positions = [{label: i for i, label in enumerate(o)} for o in self.outcomes]
+        self._duplicates = [{label for label in o if o.count(label) > 1} for o in self.outcomes]
+
+    def __len__(self):
+        return int(np.prod(self.shape))
+
+    # ========================================
+    # ODDS
+    # ========================================
+    def combo_odds(self):
+        """Flat array of combination odds, one per slip in slip order"""
+        grid = self.odds[0]
+        for odds in self.odds[1:]:
+            grid = np.multiply.outer(grid, odds)
+        return np.maximum(grid.ravel(), MIN_COMBO_ODD)
+
+    # ========================================
+    # INDEX MAPPING
+    # ========================================
+    def positions(self, slip):
+        """Outcome position per match of a slip given as labels"""
+        if len(slip) != len(self.shape):
+            raise ValueError(f"Slip has {len(slip)} selections, system has {len(self.shape)} matches")
+        for match, (dups, label) in enumerate(zip(self._duplicates, slip)):
+            if label in dups:
+                raise ValueError(f"Outcome {label!r} is listed more than once for match {match + 1}; "
+                                 f"its slip position is ambiguous")
+        try:
+            return tuple(pos[label] for pos, label in zip(self._positions, slip))
+        except KeyError as e:
+            raise ValueError(f"Unknown outcome {e.args[0]!r} in slip {slip!r}") from None
+
+    def index_of(self, slips):
+        """Flat slip indices of label tuples (exact, independent of their order)"""
+        slips = list(slips)
+        if not slips:
+            return np.zeros(0, dtype=np.intp)
+        pos = np.array([self.positions(s) for s in slips]).T
+        return np.ravel_multi_index(tuple(pos), self.shape)
+
+    def slip(self, index):
+        """Label tuple of the slip at a flat index"""
+        pos = np.unravel_index(index, self.shape)
+        return tuple(o[int(p)] for o, p in zip(self.outcomes, pos))
+
+    # ========================================
+    # ENUMERATION
+    # ========================================
+    def iter_slips(self, start=0, stop=None):
+        """Lazily yields label tuples in slip order"""
+        return itertools.islice(itertools.product(*self.outcomes), start, stop)
+
+    def iter_chunks(self, chunk_size=512):
+        """Lazily yields (indices, slips, combo odds) chunks for large systems"""
+        odds = self.combo_odds()
+        slips = self.iter_slips()
+        for start in range(0, len(self), chunk_size):
+            chunk = list(itertools.islice(slips, chunk_size))
+            yield np.arange(start, start + len(chunk)), chunk, odds[start:start + len(chunk)]
+
+    def labelled_slips(self, sep=" - "):
+        """Lazily yields slips as ["match - outcome", ...] lists"""
+        for combo in self.iter_slips():
+            yield [f"{m}{sep}{o}" for m, o in zip(self.matches, combo)]
+
+
+def infer_outcomes(variations):
+    """Per-match outcome lists of a variation list, in first-seen order"""
+    variations = list(variations)
+    if not variations:
+        return []
+    return [list(dict.fromkeys(v[i] for v in variations)) for i in range(len(variations[0]))]
@@ -0,0 +1,133 @@
+"""
+Team identity: one stable integer id per club, whatever the source calls it.
+
+football-data CSVs, FBref, the Odds API, FILTER_PROFILES and the watchlist
+all spell clubs differently ("Man United" / "Manchester Utd", "Paris SG" /
+"Paris Saint-Germain", Russian names). Every name goes through normalize_team
+and the alias registry to a canonical key; the id is a hash of that key, so it
+is the same in every process and never needs storing.
+"""
+
+import re
+import hashlib
+import unicodedata
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# ========================================
+# ALIAS REGISTRY
+# ========================================
+# Normalized alias -> canonical key
+TEAM_ALIASES = {
+    "man city": "manchester city",
+    "man united": "manchester united",
+    "manchester utd": "manchester united",
+    "man utd": "manchester united",
+    "nottm forest": "nottingham forest",
+    "spurs": "tottenham hotspur",
+    "tottenham": "tottenham hotspur",
+    "wolves": "wolverhampton wanderers",
+    "newcastle": "newcastle united",
+    "west ham": "west ham united",
+    "brighton": "brighton and hove albion",
+    "paris sg": "paris saint germain",
+    "psg": "paris saint germain",
+    "psv": "psv eindhoven",
+    "inter": "inter milan",
+    "internazionale": "inter milan",
+    "milan": "ac milan",
+    "ath madrid": "atletico madrid",
+    "ath bilbao": "athletic bilbao",
+    "sociedad": "real sociedad",
+    "betis": "real betis",
+    "bayern munchen": "bayern munich",
+    "leverkusen": "bayer leverkusen",
+    "dortmund": "borussia dortmund",
+    "mgladbach": "borussia monchengladbach",
+    "ein frankfurt": "eintracht frankfurt",
+    "sp lisbon": "sporting lisbon",
+    "sporting cp": "sporting lisbon",
+    "olympiakos": "olympiacos",
+    "aek": "aek athens",
+    "valladolid": "real valladolid",
+    "espanol": "espanyol",
+    # Russian spellings (watchlist)
+    "зенит": "zenit",
+    "zenit st petersburg": "zenit",
+    "рубин": "rubin kazan",
+    "балтика": "baltika",
+    "динамо махачкала": "dynamo makhachkala",
+}
+
+# Club-type prefixes/suffixes that feeds add or drop at will
+NOISE_TOKENS = {"fc", "cf", "sc", "ac", "afc", "cd", "ca", "sl", "rcd", "club", "as", "ssc", "us", "1"}
+
+
+def register_alias(alias, canonical):
+    """Teach the registry another spelling (either side may be a raw name)"""
+    TEAM_ALIASES[_normalize(alias)] = normalize_team(canonical)
+    normalize_team.cache_clear()
+    team_id.cache_clear()
+
+
+# ========================================
+# NORMALIZATION
+# ========================================
+def _normalize(name):
+    """Lowercase, strip accents/punctuation and club-type tokens (no alias lookup)"""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"[^a-z0-9а-я ]+", " ", text.replace("'", ""))  # Latin + Cyrillic
+    tokens = [t for t in text.split() if t not in NOISE_TOKENS]
+    return " ".join(tokens) or text.strip()
+
+
+@lru_cache(maxsize=8192)
+def normalize_team(name):
+    """Canonical key for a team name (normalized, then resolved through the aliases)"""
+    if not name or (isinstance(name, float) and np.isnan(name)):
+        return ""
+    key = _normalize(name)
+    return TEAM_ALIASES.get(key, key)
+
+
+@lru_cache(maxsize=8192)
+def team_id(name):
+    """Stable positive 63-bit id of a team name; 0 for a missing name"""
+    key = normalize_team(name)
+    if not key:
+        return 0
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+def team_ids(names):
+    """Vectorized team_id: int64 array, each distinct name resolved once"""
+    names = pd.Series(names, dtype=object)
+    codes, uniques = pd.factorize(names, use_na_sentinel=False)
+    lookup = np.array([team_id(n) for n in uniques], dtype=np.int64)
+    return lookup[codes] if len(codes) else np.zeros(0, dtype=np.int64)
+
+
+def same_team(a, b):
+    return team_id(a) == team_id(b) != 0
+
+
+# ========================================
+# FUZZY SIMILARITY (for feeds the aliases don't cover yet)
+# ========================================
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a, b):
+    """0..1 similarity of two normalized names (trigram Jaccard, or token containment)"""
+    if a == b:
+        return 1.0
+    ta, tb = trigrams(a), trigrams(b)
+    jaccard = len(ta & tb) / len(ta | tb) if ta and tb else 0.0
+    wa, wb = set(a.split()), set(b.split())
+    contain = len(wa & wb) / min(len(wa), len(wb)) if wa and wb else 0.0
+    return max(jaccard, 0.9 * contain)
@@ -0,0 +1,17 @@
+"""
+Test setup: repo root importable, and every runtime store (SQLite files,
+CSV/scan/scoring caches) created under a throwaway working directory.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_workdir = tempfile.mkdtemp(prefix="under35-tests-")
+for var, filename in (("SIGNALS_DB", "signals.db"), ("AI_CACHE_DB", "ai_cache.db"),
+                      ("TRANSLATIONS_DB", "translations.db"), ("CSV_CACHE_DIR", "csv_cache")):
+    os.environ.setdefault(var, os.path.join(_workdir, filename))
+os.chdir(_workdir)  # Relative paths (odds_cache.db, data/*.json) land here
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtest
+
+
+def test_poisson_cdf_matches_pmf_sum():
+    lam = np.array([0.5, 2.7, 6.0])
+    k = np.arange(4)
+    pmf = np.exp(-lam[:, None]) * lam[:, None] ** k / np.array([1, 1, 2, 6])
+    np.testing.assert_allclose(backtest._poisson_cdf(lam, 3), pmf.sum(axis=1))
+
+
+def test_under35_price_from_fair_2_5_market():
+    df = pd.DataFrame({'AvgC<2.5': [2.0, 1.6], 'AvgC>2.5': [2.0, 2.667]})
+    prices = backtest.under35_prices(df)
+    # A fair 2.5 market implies a rate whose P(Under 2.5) is the quoted one...
+    lam = np.array([2.674060])
+    np.testing.assert_allclose(backtest._poisson_cdf(lam, 2), 0.5, atol=1e-5)
+    assert prices[0] == pytest.approx(1 / backtest._poisson_cdf(lam, 3)[0], abs=1e-3)
+    # ...and a lower-scoring match gets a shorter Under 3.5 price
+    assert 1 < prices[1] < prices[0] < 2.0
+
+
+def test_fallback_columns_and_missing_prices():
+    df = pd.DataFrame({'AvgC<2.5': [np.nan, 1.9, np.nan], 'AvgC>2.5': [np.nan, 1.9, np.nan],
+                       'B365<2.5': [1.9, 1.5, np.nan], 'B365>2.5': [1.9, 2.5, np.nan]})
+    prices = backtest.under35_prices(df)
+    assert prices[0] == pytest.approx(prices[1])  # same 1.9/1.9 market, first available source wins
+    assert np.isnan(prices[2])
+    # The 2.5 overround carries over to the derived price
+    fair = backtest.under35_prices(pd.DataFrame({'AvgC<2.5': [2.0], 'AvgC>2.5': [2.0]}))[0]
+    assert prices[1] == pytest.approx(fair / (2 / 1.9), abs=2e-3)
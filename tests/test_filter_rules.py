@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_rules import FilterProfileError, compile_profile, compile_profiles
+
+
+BASE = {'team_top': ["Porto"], 'odds_key': "soccer_x", 'min_odds': 1.8}
+
+
+def features(**cols):
+    n = len(next(iter(cols.values())))
+    frame = {'is_top_match': [True] * n, 'opp_last5_goals_scored': [5.0] * n}
+    frame.update(cols)
+    return pd.DataFrame(frame)
+
+
+def test_unknown_key_raises():
+    with pytest.raises(FilterProfileError, match="unknown filter key 'opp_last6_max'"):
+        compile_profile(dict(BASE, opp_last6_max=8), "League")
+
+
+@pytest.mark.parametrize("value", ["8", None, True, [8]])
+def test_non_numeric_threshold_raises(value):
+    with pytest.raises(FilterProfileError, match="must be a number"):
+        compile_profile(dict(BASE, opp_last5_max=value), "League")
+
+
+def test_team_top_is_required():
+    with pytest.raises(FilterProfileError, match="'team_top' is required"):
+        compile_profile({'opp_last5_max': 8}, "League")
+
+
+def test_scanner_profiles_compile():
+    import under35_scanner as scanner
+    assert set(compile_profiles(scanner.FILTER_PROFILES)) == set(scanner.FILTER_PROFILES)
+
+
+def test_bounds_and_missing_stats():
+    profile = compile_profile(dict(BASE, opp_last5_max=6, clean_sheets_pct_min=40), "League")
+    frame = features(
+        opp_last5_goals_scored=[4.0, 7.0, 4.0, 4.0, np.nan],
+        top_clean_sheets_pct=[50.0, 50.0, 30.0, np.nan, 0.0],
+    )
+    # pass, too many opponent goals, too few clean sheets, missing stat passes, no opponent stats passes
+    assert profile.mask(frame).tolist() == [True, False, False, True, True]
+
+
+def test_only_top_matches_pass():
+    profile = compile_profile(dict(BASE, opp_last5_max=6), "League")
+    frame = features(opp_last5_goals_scored=[4.0, 4.0])
+    frame['is_top_match'] = [True, False]
+    assert profile.mask(frame).tolist() == [True, False]
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import odds_api
+from odds_api import totals_consensus, value_edge, ladder_rows, PRICE_COLUMNS
+
+
+def totals(event_id, bookmaker, point, under, over):
+    return [(event_id, bookmaker, 'totals', 'under', point, under),
+            (event_id, bookmaker, 'totals', 'over', point, over)]
+
+
+def frame(*groups):
+    return pd.DataFrame([row for g in groups for row in g], columns=PRICE_COLUMNS)
+
+
+def test_prefers_the_3_5_line_when_quoted():
+    prices = frame(totals('e1', 'a', 2.5, 1.80, 2.05), totals('e1', 'b', 2.5, 1.85, 2.00),
+                   totals('e1', 'c', 2.5, 1.82, 2.02), totals('e1', 'd', 3.5, 1.30, 3.50))
+    out = totals_consensus(prices)
+    assert out.loc['e1', 'line'] == 3.5
+    assert out.loc['e1', 'n_books'] == 1
+    assert out.loc['e1', 'best_under'] == 1.30
+
+
+def test_falls_back_to_most_quoted_line():
+    prices = frame(totals('e1', 'a', 2.5, 1.80, 2.05), totals('e1', 'b', 2.5, 1.85, 2.00),
+                   totals('e1', 'c', 1.5, 3.40, 1.30))
+    out = totals_consensus(prices)
+    assert out.loc['e1', 'line'] == 2.5
+    assert out.loc['e1', 'n_books'] == 2
+
+
+def test_one_sided_and_quarter_lines_are_ignored():
+    prices = frame(totals('e1', 'a', 3.25, 1.40, 2.90), totals('e1', 'b', 2.5, 1.80, 2.05),
+                   [('e1', 'c', 'totals', 'under', 3.5, 1.35)])
+    out = totals_consensus(prices)
+    assert out.loc['e1', 'line'] == 2.5
+    assert out.loc['e1', 'n_books'] == 1
+
+
+def test_devigged_consensus_and_best_book():
+    prices = frame(totals('e1', 'a', 3.5, 1.25, 3.60), totals('e1', 'b', 3.5, 1.30, 3.40),
+                   totals('e2', 'a', 3.5, 1.50, 2.50),
+                   [('e2', 'a', 'h2h', 'home', 0.0, 2.10)])
+    out = totals_consensus(prices)
+
+    def p_under(u, o):
+        return (1 / u) / (1 / u + 1 / o)
+
+    assert out.loc['e1', 'p_under'] == pytest.approx((p_under(1.25, 3.60) + p_under(1.30, 3.40)) / 2)
+    assert out.loc['e1', 'best_under_book'] == 'b'
+    assert out.loc['e1', 'best_over'] == 3.60
+    assert out.loc['e2', 'overround'] == pytest.approx(1 / 1.5 + 1 / 2.5)
+    assert list(out.columns) == odds_api.CONSENSUS_COLUMNS
+
+
+def test_empty_input():
+    assert totals_consensus(None).empty
+    assert totals_consensus(frame([('e1', 'a', 'h2h', 'home', 0.0, 2.0)])).empty
+
+
+def test_value_edge():
+    edge = value_edge([0.8, 0.5, 0.7], [1.30, 2.0, np.nan])
+    np.testing.assert_allclose(edge[:2], [0.04, 0.0])
+    assert np.isnan(edge[2])
+
+
+EVENT = {
+    'id': 'e1', 'home_team': 'Arsenal', 'away_team': 'Chelsea', 'commence_time': '2025-01-01T15:00:00Z',
+    'bookmakers': [
+        {'key': 'pinnacle', 'markets': [
+            {'key': 'h2h', 'outcomes': [{'name': 'Arsenal', 'price': 2.1}, {'name': 'Chelsea', 'price': 3.6},
+                                        {'name': 'Draw', 'price': 3.4}]},
+            {'key': 'totals', 'outcomes': [{'name': 'Under', 'price': 1.3, 'point': 3.5},
+                                           {'name': 'Over', 'price': 3.5, 'point': 3.5}]},
+            {'key': 'spreads', 'outcomes': [{'name': 'Arsenal', 'price': 1.9, 'point': -0.5}]},
+        ]},
+        {'key': 'bet365', 'markets': [
+            {'key': 'h2h', 'outcomes': [{'name': 'Arsenal', 'price': 2.2}, {'name': 'Chelsea', 'price': 3.4},
+                                        {'name': 'Draw', 'price': None}]},
+        ]},
+    ],
+}
+
+
+def test_ladder_rows():
+    rows = ladder_rows(EVENT)
+    assert ('pinnacle', 'totals', 'under', 3.5, 1.3) in rows
+    assert ('pinnacle', 'h2h', 'draw', 0.0, 3.4) in rows
+    assert not any(r[1] == 'spreads' for r in rows)
+    assert len(rows) == 7
+
+
+def test_cache_roundtrip(tmp_path):
+    fetcher = odds_api.OddsFetcher(str(tmp_path / "odds.db"))
+    fetcher._save_to_cache('soccer_epl', [EVENT])
+
+    cached = fetcher._get_from_cache('soccer_epl')
+    assert cached[0]['h2h'] == {'home': 2.2, 'away': 3.6, 'draw': 3.4}
+    prices = fetcher.get_prices('soccer_epl')
+    assert len(prices) == 7
+    assert totals_consensus(prices).loc['e1', 'line'] == 3.5
+    assert fetcher.get_prices('soccer_spain_la_liga').empty
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import scoring
+
+
+def synthetic_results(seed=0, rounds=6, rho=0.0):
+    """Double round-robin repeated `rounds` times with known strengths"""
+    rng = np.random.default_rng(seed)
+    attack = {"Strong": 1.6, "Mid A": 1.0, "Mid B": 1.0, "Weak": 0.6}
+    defence = {"Strong": 0.6, "Mid A": 1.0, "Mid B": 1.0, "Weak": 1.5}
+    rows, day = [], pd.Timestamp("2024-08-01")
+    for _ in range(rounds):
+        for home in attack:
+            for away in attack:
+                if home == away:
+                    continue
+                lam = 1.4 * attack[home] * defence[away]
+                mu = 1.1 * attack[away] * defence[home]
+                rows.append({'home': home, 'away': away, 'hg': rng.poisson(lam), 'ag': rng.poisson(mu), 'date': day})
+                day += pd.Timedelta(days=1)
+    return pd.DataFrame(rows)
+
+
+def test_score_matrix_is_a_distribution():
+    m = scoring.score_matrix([0.5, 1.4, 3.0], [0.4, 1.1, 2.5], rho=-0.1)
+    assert m.shape == (3, scoring.MAX_GOALS + 1, scoring.MAX_GOALS + 1)
+    np.testing.assert_allclose(m.sum(axis=(1, 2)), 1.0)
+    assert (m >= 0).all()
+
+
+def test_rho_zero_is_independent_poisson():
+    m = scoring.score_matrix([1.3], [0.9], rho=0.0)[0]
+    expected = np.outer(scoring.poisson_pmf([1.3])[0], scoring.poisson_pmf([0.9])[0])
+    np.testing.assert_allclose(m, expected / expected.sum())
+
+
+def test_summary_markets_are_consistent():
+    m = scoring.score_matrix([1.3, 2.0], [0.9, 1.7], rho=-0.05)
+    s = scoring.matrix_summary(m)
+    np.testing.assert_allclose(s['p_home'] + s['p_draw'] + s['p_away'], 1.0)
+    np.testing.assert_allclose(s['p_under35'], scoring.p_under_line([1.3, 2.0], [0.9, 1.7], -0.05, [3.5, 3.5]))
+    assert (np.diff(s['top_probs'], axis=1) <= 0).all()
+
+
+def test_p_under_line_is_monotone_and_nan_for_unknown():
+    p = scoring.p_under_line([1.4] * 4, [1.1] * 4, 0.0, [1.5, 2.5, 3.5, np.nan])
+    assert p[0] < p[1] < p[2]
+    assert np.isnan(p[3])
+
+
+def test_outcome_probability():
+    exp_home, exp_away, rho = 1.3, 0.9, -0.05
+    m = scoring.score_matrix([exp_home], [exp_away], rho)[0]
+    assert scoring.outcome_probability(exp_home, exp_away, rho, "Счет 1:0") == pytest.approx(m[1, 0])
+    assert (scoring.outcome_probability(exp_home, exp_away, rho, "ЧЕТ")
+            + scoring.outcome_probability(exp_home, exp_away, rho, "НЕЧЕТ")) == pytest.approx(1.0)
+    assert scoring.outcome_probability(exp_home, exp_away, rho, "П1") is None
+
+
+def test_fit_recovers_team_order():
+    model = scoring.fit(synthetic_results(rounds=10))
+    lam, mu = model.expected_goals(["Strong", "Weak"], ["Weak", "Strong"])
+    assert lam[0] > 2.5 * lam[1]
+    assert mu[1] > mu[0]
+    assert abs(model.rho) <= 0.25
+
+
+def test_fit_needs_enough_results():
+    assert scoring.fit(synthetic_results().head(scoring.MIN_MATCHES - 1)) is None
+
+
+def test_unknown_team_is_league_average():
+    model = scoring.fit(synthetic_results())
+    lam, mu = model.expected_goals(["Promoted FC"], ["Also New"])
+    assert lam[0] == pytest.approx(model.base_home)
+    assert mu[0] == pytest.approx(model.base_away)
+
+
+def test_model_roundtrip_and_league_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(scoring, "SCORING_CACHE_FILE", str(tmp_path / "params.json"))
+    monkeypatch.setattr(scoring, "_models", {})
+    results = synthetic_results()
+    model = scoring.league_model("Test League", "2425", results)
+    restored = scoring.ScoreModel.from_dict(model.to_dict())
+    np.testing.assert_allclose(restored.expected_goals(["Strong"], ["Weak"]), model.expected_goals(["Strong"], ["Weak"]))
+
+    # A fresh process reads the JSON cache instead of refitting
+    monkeypatch.setattr(scoring, "_models", {})
+    monkeypatch.setattr(scoring, "fit", lambda *a, **k: pytest.fail("refit with unchanged results"))
+    cached = scoring.league_model("Test League", "2425", results)
+    assert cached.rho == model.rho
+
+
+def test_slate_probabilities_columns():
+    model = scoring.fit(synthetic_results())
+    slate = scoring.slate_probabilities(model, ["Strong", "Mid A"], ["Weak", "Mid B"])
+    assert len(slate) == 2
+    np.testing.assert_allclose(slate['fair_under35'], 1 / slate['p_under35'])
+    assert all(len(s.split(", ")) == 3 for s in slate['probable_scores'])
@@ -0,0 +1,78 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from stakes import equal_return_stakes, kelly_fraction, round_stakes, solve_stakes, system_total
+
+
+def system_odds(seed=0, n=27):
+    rng = np.random.default_rng(seed)
+    return np.round(rng.uniform(20, 400, n), 2)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("step", [1, 10, 50])
+def test_rounded_stakes_sum_exactly_to_budget(seed, step):
+    plan = solve_stakes(system_odds(seed), "budget", step=step, budget=27000)
+    assert plan["total"] == pytest.approx(27000)
+    assert np.allclose(plan["stakes"] % step, 0)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rounding_minimizes_payout_error(seed):
+    # Among all floor/ceil roundings with the exact total, none has a smaller squared payout error
+    odds = system_odds(seed, n=10)
+    ideal = equal_return_stakes(odds, 3000)
+    target = ideal[0] * odds[0]
+    rounded = round_stakes(odds, ideal, step=10)
+    floor = np.floor(ideal / 10) * 10
+    ups = int(round((3000 - floor.sum()) / 10))
+    best = min(((floor + 10 * np.isin(np.arange(len(odds)), combo)) * odds - target) @
+               ((floor + 10 * np.isin(np.arange(len(odds)), combo)) * odds - target)
+               for combo in itertools.combinations(range(len(odds)), ups))
+    error = (rounded * odds - target) @ (rounded * odds - target)
+    assert error == pytest.approx(best)
+
+
+def test_min_stake_is_respected():
+    odds = np.array([1.5, 3.0, 400.0, 900.0])
+    stakes = round_stakes(odds, equal_return_stakes(odds, 1000), step=10, min_stake=50)
+    assert stakes.min() >= 50
+    assert stakes.sum() == pytest.approx(1000)
+
+
+def test_min_stake_too_large_raises():
+    with pytest.raises(ValueError):
+        round_stakes([2.0, 2.0, 2.0], [10, 10, 10], step=1, min_stake=20)
+
+
+def test_profit_mode_hits_target():
+    odds = system_odds(1)
+    plan = solve_stakes(odds, "profit", profit=5000)
+    assert plan["profit_min"] == pytest.approx(5000)
+    assert plan["profit_max"] == pytest.approx(5000)
+
+
+def test_profit_mode_impossible_when_book_over_one():
+    with pytest.raises(ValueError, match="No fixed profit"):
+        system_total(np.array([1.9, 1.9]), "profit", profit=100)
+
+
+def test_equal_payouts_unrounded():
+    plan = solve_stakes(system_odds(2), "budget", budget=10000)
+    assert plan["payout_max"] - plan["payout_min"] < 1e-6
+    assert plan["total"] == pytest.approx(10000)
+
+
+def test_kelly():
+    assert kelly_fraction(2.0, 0.6) == pytest.approx(0.2)
+    # System of two evens slips = one bet at 1 / (0.5 + 0.5) = 1.0: no edge, nothing staked
+    assert system_total(np.array([2.0, 2.0]), "kelly", bankroll=1000, win_prob=0.9) == 0.0
+    total = system_total(np.array([4.0, 4.0]), "kelly", bankroll=1000, win_prob=0.6, kelly_scale=0.5)
+    assert total == pytest.approx(1000 * kelly_fraction(2.0, 0.6) * 0.5)
+
+
+def test_unknown_mode_raises():
+    with pytest.raises(ValueError, match="Unknown stake mode"):
+        solve_stakes([2.0, 3.0], "martingale", budget=100)
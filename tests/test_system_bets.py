@@ -0,0 +1,78 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from system_bets import DEFAULT_ODD, SystemBet, infer_outcomes, split_odds
+
+
+OUTCOMES = [["ЧЕТ", "1:1", "0:0"], ["ЧЕТ", "1:0"], ["ЧЕТ", "0:1", "1:1", "2:2"]]
+ODDS = [[1.87, 5.8, 7.5], [1.9, 6.5], [1.85, 6.5, 5.8, 11.0]]
+
+
+def test_slips_in_product_order_with_outer_product_odds():
+    system = SystemBet(OUTCOMES, ODDS)
+    slips = list(system.iter_slips())
+    assert slips == list(itertools.product(*OUTCOMES))
+    expected = [np.prod(combo) for combo in itertools.product(*ODDS)]
+    np.testing.assert_allclose(system.combo_odds(), expected)
+    assert len(system) == 24
+
+
+def test_index_roundtrip_any_order():
+    system = SystemBet(OUTCOMES, ODDS)
+    slips = list(system.iter_slips())[::-1]
+    idx = system.index_of(slips)
+    assert [system.slip(i) for i in idx] == slips
+
+
+def test_flat_and_nested_odds_agree():
+    flat = [o for match in ODDS for o in match]
+    np.testing.assert_allclose(SystemBet(OUTCOMES, flat).combo_odds(), SystemBet(OUTCOMES, ODDS).combo_odds())
+
+
+def test_missing_odds_default():
+    assert [list(o) for o in split_odds(None, (2, 3))] == [[DEFAULT_ODD] * 2, [DEFAULT_ODD] * 3]
+
+
+@pytest.mark.parametrize("odds", [[1.9] * 8, [[1.9, 2.0], [1.9, 2.0], [1.9] * 4], [[1.9] * 3, [1.9] * 2]])
+def test_mismatched_odds_raise(odds):
+    with pytest.raises(ValueError):
+        SystemBet(OUTCOMES, odds)
+
+
+def test_duplicate_labels_are_ambiguous():
+    # bot_runner pads short outcome lists with "ЧЕТ"
+    system = SystemBet([["ЧЕТ", "1:0", "ЧЕТ"], ["1", "2"]])
+    assert len(list(system.iter_slips())) == 6
+    assert list(system.index_of([("1:0", "2")])) == [3]
+    with pytest.raises(ValueError, match="listed more than once"):
+        system.index_of([("ЧЕТ", "1")])
+
+
+def test_unknown_outcome_raises():
+    with pytest.raises(ValueError, match="Unknown outcome"):
+        SystemBet(OUTCOMES).index_of([("ЧЕТ", "ЧЕТ", "5:5")])
+
+
+def test_empty_system_raises():
+    with pytest.raises(ValueError):
+        SystemBet([])
+    with pytest.raises(ValueError):
+        SystemBet([["1"], []])
+
+
+def test_infer_outcomes_first_seen_order():
+    variations = list(itertools.product(*OUTCOMES))[::-1]
+    assert infer_outcomes(variations) == [o[::-1] for o in OUTCOMES]
+    assert infer_outcomes([]) == []
+
+
+def test_chunks_cover_large_system():
+    system = SystemBet([["1", "X", "2", "12"]] * 6)
+    seen = 0
+    for indices, chunk, odds in system.iter_chunks(1000):
+        assert len(indices) == len(chunk) == len(odds)
+        assert list(system.index_of(chunk)) == list(indices)
+        seen += len(chunk)
+    assert seen == 4096
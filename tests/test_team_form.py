@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+import under35_scanner as scanner
+
+
+def season(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    teams = ["Alpha", "Beta", "Gamma", "Delta", "Epsilon"]
+    rows = []
+    for k in range(n):
+        home, away = rng.choice(teams, 2, replace=False)
+        rows.append({'Date': (pd.Timestamp("2024-08-01") + pd.Timedelta(days=k)).strftime("%d/%m/%Y"),
+                     'HomeTeam': home, 'AwayTeam': away,
+                     'FTHG': int(rng.poisson(1.4)), 'FTAG': int(rng.poisson(1.1))})
+    return pd.DataFrame(rows)
+
+
+def naive_form(df, team, last_n=scanner.FORM_LAST_N, clean_k=scanner.FORM_CLEAN_K):
+    """Per-team loop over the season, as the scanner computed form before the table"""
+    gf, ga, home_games, home_wins = [], [], 0, 0
+    for _, r in df.iterrows():
+        if r['HomeTeam'] == team:
+            gf.append(r['FTHG']); ga.append(r['FTAG'])
+            home_games += 1
+            home_wins += r['FTHG'] > r['FTAG']
+        elif r['AwayTeam'] == team:
+            gf.append(r['FTAG']); ga.append(r['FTHG'])
+    clean = [g == 0 for g in ga]
+    return {
+        'last5_goals_scored': sum(gf[-last_n:]),
+        'last5_goals_conceded': sum(ga[-last_n:]),
+        'clean_sheets_last3': sum(clean[-clean_k:]),
+        'clean_sheets_last4': sum(clean[-(clean_k + 1):]),
+        'matches_played': len(gf),
+        'avg_goals_scored': np.mean(gf),
+        'clean_sheets_pct': np.mean(clean) * 100,
+        'btts_no_pct': np.mean([a == 0 or b == 0 for a, b in zip(gf, ga)]) * 100,
+        'home_winrate': home_wins / home_games * 100 if home_games else np.nan,
+    }
+
+
+def test_form_table_matches_per_team_loop():
+    df = season()
+    table = scanner.build_team_form_table(df)
+    for team in ["Alpha", "Beta", "Gamma", "Delta", "Epsilon"]:
+        row = table.loc[scanner.team_id(team)]
+        for col, expected in naive_form(df, team).items():
+            np.testing.assert_allclose(row[col], expected, err_msg=f"{team} {col}")
+
+
+def test_lookup_team_form():
+    df = season()
+    form = scanner.lookup_team_form(scanner.build_team_form_table(df), "Alpha")
+    expected = naive_form(df, "Alpha")
+    assert form == {k: int(expected[k]) for k in ('last5_goals_scored', 'last5_goals_conceded',
+                                                  'clean_sheets_last3', 'matches_played')}
+    assert scanner.lookup_team_form(scanner.build_team_form_table(df), "Nobody FC") is None
+
+
+def test_unfinished_matches_are_ignored():
+    df = season(30)
+    upcoming = pd.DataFrame([{'Date': "01/01/2025", 'HomeTeam': "Alpha", 'AwayTeam': "Beta",
+                              'FTHG': np.nan, 'FTAG': np.nan}])
+    pd.testing.assert_frame_equal(scanner.build_team_form_table(df),
+                                  scanner.build_team_form_table(pd.concat([df, upcoming], ignore_index=True)))
@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from watchlist import (ELITE_DEFENSIVE_TEAMS, LOW_TIER_STARS, ALL_WATCHLIST_TEAMS, match_watchlist,
+                       is_watchlist_team, fixture_watchlist_badges)
+
+
+def substring_loop(team_name):
+    """The original matcher: bidirectional substring scan, elite first"""
+    name = team_name.strip().lower()
+    for team in ELITE_DEFENSIVE_TEAMS:
+        if team.lower() in name or name in team.lower():
+            return ("elite", "👁️ W")
+    for team in LOW_TIER_STARS:
+        if team.lower() in name or name in team.lower():
+            return ("low_tier_star", "🔍 W")
+    return (None, None)
+
+
+def sample_names(seed=0, n=400):
+    rng = random.Random(seed)
+    entries = sorted(ALL_WATCHLIST_TEAMS)
+    names = list(entries)
+    names += [f"FC {e}" for e in entries[:40]] + [e.upper() + " II" for e in entries[40:80]]
+    for e in rng.sample(entries, 60):  # Fragments: the name sits inside an entry
+        i = rng.randrange(len(e))
+        names.append(e[i:i + rng.randint(1, 6)])
+    names += ["Manchester City", "Arsenal", "Real Madrid", "Boca Juniors", "  inter  ", "Zenit St Petersburg"]
+    names += ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(rng.randint(3, 14)))
+              for _ in range(n)]
+    return [name for name in names if name.strip()]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_agree_with_substring_loop(seed):
+    for name in sample_names(seed):
+        assert match_watchlist(name) == substring_loop(name), name
+
+
+def test_elite_wins_over_low_tier():
+    # "Porto" is elite, "Porto Vitoria" is a low-tier star; a name containing both is elite
+    assert match_watchlist("Porto Vitoria") == ("elite", "👁️ W")
+
+
+def test_empty_name_is_not_on_watchlist():
+    assert match_watchlist("") == (None, None)
+    assert not is_watchlist_team("")
+
+
+def test_fixture_badges_prefer_home():
+    badges = fixture_watchlist_badges(["FC Porto", "Arsenal", "Arsenal"], ["Gor Mahia", "Gor Mahia", "Chelsea"])
+    assert badges == ["👁️ W", "🔍 W", ""]
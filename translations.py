@@ -0,0 +1,116 @@
+"""
+Persistent team-name translations (English feed names -> Russian, Winline style).
+
+Keyed by canonical team name (teams.normalize_team), so spelling variants
+from different feeds share one entry. Only names missing from the table are sent to the LLM, in
+chunks translated concurrently; answers are written back for every later scan.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from teams import normalize_team
+from watchlist import ELITE_DEFENSIVE_TEAMS, LOW_TIER_STARS
+
+TRANSLATIONS_DB = os.getenv("TRANSLATIONS_DB", "data/translations.db")
+CHUNK_SIZE = 40          # Names per LLM request
+MAX_CONCURRENT = 4       # LLM requests in flight
+
+CYRILLIC = re.compile(r"[А-Яа-яЁё]")
+
+# English spellings of the watchlist's Russian clubs
+SEED_PAIRS = {
+    "Zenit": "Зенит",
+    "Zenit St Petersburg": "Зенит",
+    "Rubin Kazan": "Рубин",
+    "Baltika": "Балтика",
+    "Dynamo Makhachkala": "Динамо Махачкала",
+}
+
+MIGRATIONS = [
+    '''CREATE TABLE IF NOT EXISTS team_translations
+       (key TEXT PRIMARY KEY, name TEXT, ru TEXT NOT NULL, source TEXT, updated REAL)''',
+]
+
+
+def team_key(name):
+    return normalize_team(name) or str(name).strip().lower()
+
+
+class TranslationStore:
+    def __init__(self, db_file=TRANSLATIONS_DB):
+        if os.path.dirname(db_file):
+            os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._init_db()
+        self.seed()
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            for target, stmt in enumerate(MIGRATIONS[version:], start=version + 1):
+                with self._conn:
+                    self._conn.execute(stmt)
+                    self._conn.execute(f"PRAGMA user_version = {target}")
+
+    def seed(self):
+        """Watchlist Cyrillic names (already Russian) + known English spellings; never overwrites"""
+        rows = {name: name for name in ELITE_DEFENSIVE_TEAMS | LOW_TIER_STARS if CYRILLIC.search(name)}
+        rows.update(SEED_PAIRS)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO team_translations (key, name, ru, source, updated) VALUES (?, ?, ?, 'seed', ?)",
+                [(team_key(name), name, ru, now) for name, ru in rows.items()])
+
+    def lookup(self, names):
+        """{name: ru} for names already in the table"""
+        keys = {name: team_key(name) for name in names}
+        if not keys:
+            return {}
+        unique = list(set(keys.values()))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, ru FROM team_translations WHERE key IN ({','.join('?' * len(unique))})",
+                unique).fetchall()
+        by_key = dict(rows)
+        return {name: by_key[key] for name, key in keys.items() if key in by_key}
+
+    def save(self, names, source="llm"):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO team_translations (key, name, ru, source, updated) VALUES (?, ?, ?, ?, ?)",
+                [(team_key(name), name, ru, source, now) for name, ru in names.items()])
+
+    def translate(self, names, translator, chunk_size=CHUNK_SIZE, max_workers=MAX_CONCURRENT):
+        """
+        {name: ru} for every name. translator(list_of_names) -> {name: ru} is only
+        called for names not in the table; unresolved names map to themselves.
+        """
+        names = list(dict.fromkeys(n for n in names if n))
+        result = self.lookup(names)
+        missing = [n for n in names if n not in result]
+        if missing:
+            chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+            print(f"Translating {len(missing)} new team names in {len(chunks)} batch(es)...")
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                answers = list(pool.map(translator, chunks))
+            learned = {}
+            for chunk, answer in zip(chunks, answers):
+                for name in chunk:
+                    ru = (answer or {}).get(name)
+                    # Keep only real translations: a failed call echoes the English name back
+                    if ru and CYRILLIC.search(ru):
+                        learned[name] = ru
+            self.save(learned)
+            result.update(learned)
+        return {n: result.get(n, n) for n in names}
+
+
+store = TranslationStore()
@@ -8,12 +8,36 @@ import pandas as pd
 import requests
 import numpy as np
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 import os
-from watchlist import is_watchlist_team, get_watchlist_info
+import json
+import time
+import hashlib
+import threading
+from watchlist import fixture_watchlist_badges
+from csv_store import SeasonCSVStore
+from filter_rules import compile_profile, compile_profiles
+from signal_store import store as signal_store
+from teams import team_id, team_ids
+import scoring
 
 # Set to True if you have a working proxy/VPN for FBref, otherwise use CSV (False)
 USE_FBREF = False
 
+# Parallel scan: leagues fetched concurrently, each bounded by its own timeout (seconds)
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "4"))
+SCAN_LEAGUE_TIMEOUT = float(os.getenv("SCAN_LEAGUE_TIMEOUT", "120"))
+
+class ScanCancelled(Exception):
+    """A league's scan was abandoned (timed out); raised at the next checkpoint"""
+
+def check_cancelled(cancel, name):
+    """Checkpoint between fetches/writes: stop a league whose cancel event is set"""
+    if cancel is not None and cancel.is_set():
+        raise ScanCancelled(f"{name} cancelled")
+
+TOP_LEAGUES = ['Premier League', 'La Liga', 'Serie A', 'Bundesliga', 'Ligue 1']
+
 # ========================================
 # 5 ЛИГ + ОПТИМИЗИРОВАННЫЕ ФИЛЬТРЫ
 # ========================================
@@ -103,57 +127,47 @@ FILTER_PROFILES = {
     }
 }
 
+# Unknown or malformed filter keys fail here, at import, not mid-scan
+COMPILED_PROFILES = compile_profiles(FILTER_PROFILES)
+
 # ... [DATA LOADERS kept as is] ...
 
 # ========================================
 # ODDS ENGINE
 # ========================================
-from odds_api import OddsFetcher
+from odds_api import OddsFetcher, OddsIndex, UNDER_LINE, totals_consensus, value_edge
 odds_fetcher = OddsFetcher()
 
-def get_real_odds(odds_key, home_team, away_team):
-    """Finds odds in cache for fuzzy matched teams"""
-    odds_data = odds_fetcher.get_odds(odds_key)
-    if not odds_data:
-        return None
-    
-    # Normalize team names for matching
-    home_normalized = home_team.lower().strip()
-    away_normalized = away_team.lower().strip()
+def get_odds_index(odds_key):
+    """Index a league's odds once per scan (exact + fuzzy team matching)"""
+    return OddsIndex(odds_fetcher.get_odds(odds_key) or [])
+
+def get_league_consensus(odds_key):
+    """Totals consensus/best price per event id (3.5 line where quoted), from the cached ladder (no API call)"""
+    return totals_consensus(odds_fetcher.get_prices(odds_key))
+
+def match_events(index, home_names, away_names):
+    """Odds API event id per fixture (None where no event matches)"""
+    event_ids = []
+    for home_team, away_team in zip(home_names, away_names):
+        event, confidence = index.match(home_team, away_team)
+        if event is not None and confidence < 1.0:
+            print(f"  [Odds] Fuzzy match {home_team} vs {away_team} -> "
+                  f"{event['home_team']} vs {event['away_team']} ({confidence:.2f})")
+        event_ids.append(event['id'] if event is not None else None)
+    return event_ids
+
+def get_real_odds(odds_key, home_team, away_team, index=None, consensus=None):
+    """Best available Under 3.5 price for the fixture (None if no bookmaker quotes the line)"""
+    if index is None:
+        index = get_odds_index(odds_key)
+    if consensus is None:
+        consensus = get_league_consensus(odds_key)
     
-    # Try exact and fuzzy matching
-    for event in odds_data:
-        event_home = event['home_team'].lower().strip()
-        event_away = event['away_team'].lower().strip()
-        
-        # Exact match
-        if event_home == home_normalized and event_away == away_normalized:
-            # Return average of home and away odds (for Under 3.5, we care about draw/low-scoring)
-            h2h = event.get('h2h', {})
-            home_odds = h2h.get('home', 0)
-            away_odds = h2h.get('away', 0)
-            draw_odds = h2h.get('draw', 0)
-            
-            # For Under 3.5, draw odds are most relevant
-            if draw_odds > 0:
-                return draw_odds
-            # Otherwise return average
-            if home_odds > 0 and away_odds > 0:
-                return (home_odds + away_odds) / 2
-        
-        # Fuzzy match (contains)
-        if (home_normalized in event_home or event_home in home_normalized) and \
-           (away_normalized in event_away or event_away in away_normalized):
-            h2h = event.get('h2h', {})
-            draw_odds = h2h.get('draw', 0)
-            if draw_odds > 0:
-                return draw_odds
-            home_odds = h2h.get('home', 0)
-            away_odds = h2h.get('away', 0)
-            if home_odds > 0 and away_odds > 0:
-                return (home_odds + away_odds) / 2
-    
-    return None  # No match found
+    event_id = match_events(index, [home_team], [away_team])[0]
+    if event_id is None or event_id not in consensus.index or consensus.at[event_id, 'line'] != UNDER_LINE:
+        return None
+    return float(consensus.at[event_id, 'best_under'])
 
 # ========================================
 # MAIN SCANNER
@@ -175,26 +189,28 @@ def scan_5leagues(days_ahead=7):
 # ========================================
 # DATA LOADERS
 # ========================================
-def load_football_data_csv(league_code, season='2425'):
-    """football-data.co.uk CSV"""
-    base_url = f"https://www.football-data.co.uk/mmz4281/{season}"
-    csv_map = {
-        'Primeira Liga': 'P1', 
-        'La Liga 2': 'SP2', 
-        'Eredivisie': 'N1', 
-        'Greek Super League': 'G1',
-        'Premier League': 'E0',
-        'La Liga': 'SP1',
-        'Serie A': 'I1',
-        'Bundesliga': 'D1',
-        'Ligue 1': 'F1'
-    } 
-    # Note: Greek and Argentina may not have direct CSVs on football-data, handle gracefully
-    
-    if league_code in csv_map:
-        url = f"{base_url}/{csv_map[league_code]}.csv"
+FOOTBALL_DATA_CODES = {
+    'Primeira Liga': 'P1', 
+    'La Liga 2': 'SP2', 
+    'Eredivisie': 'N1', 
+    'Greek Super League': 'G1',
+    'Premier League': 'E0',
+    'La Liga': 'SP1',
+    'Serie A': 'I1',
+    'Bundesliga': 'D1',
+    'Ligue 1': 'F1'
+}
+# Note: Greek and Argentina may not have direct CSVs on football-data, handle gracefully
+
+CSV_SEASON = '2425'
+
+csv_store = SeasonCSVStore()
+
+def load_football_data_csv(league_code, season=CSV_SEASON):
+    """football-data.co.uk CSV (served from the local store when fresh)"""
+    if league_code in FOOTBALL_DATA_CODES:
         try:
-            return pd.read_csv(url)
+            return csv_store.get(FOOTBALL_DATA_CODES[league_code], season)
         except Exception as e:
             print(f"Error loading CSV for {league_code}: {e}")
             return pd.DataFrame()
@@ -222,107 +238,135 @@ def load_fbref_fixtures(league_id, season='2425'):
 # ========================================
 # FILTER ENGINE
 # ========================================
+FORM_LAST_N = 5       # Window for goals for/against
+FORM_CLEAN_K = 3      # Window for clean sheets
+
+# Per-team form columns (rolling windows + season rates), as of the end of each match
+FORM_COLUMNS = ['last5_goals_scored', 'last5_goals_conceded', 'clean_sheets_last3', 'clean_sheets_last4',
+                'matches_played', 'avg_goals_scored', 'avg_xg', 'clean_sheets_pct', 'btts_no_pct',
+                'home_winrate']
+
+def _results_frame(df):
+    """Normalize CSV (HomeTeam/FTHG) or FBref (home_team/home_goals) columns"""
+    def col(*names):
+        for n in names:
+            if n in df.columns:
+                return df[n]
+        return pd.Series(np.nan, index=df.index)
+
+    res = pd.DataFrame({
+        'home': col('HomeTeam', 'home_team'),
+        'away': col('AwayTeam', 'away_team'),
+        'hg': pd.to_numeric(col('FTHG', 'home_goals'), errors='coerce'),
+        'ag': pd.to_numeric(col('FTAG', 'away_goals'), errors='coerce'),
+        'hxg': pd.to_numeric(col('home_xg', 'HomeXG'), errors='coerce'),
+        'axg': pd.to_numeric(col('away_xg', 'AwayXG'), errors='coerce'),
+    })
+    if 'Date' in df.columns:
+        res['date'] = pd.to_datetime(df['Date'], dayfirst=True, errors='coerce')
+    elif 'date' in df.columns:
+        res['date'] = pd.to_datetime(df['date'], dayfirst=True, errors='coerce')
+    else:
+        res['date'] = pd.NaT
+    # Only finished matches count towards form
+    return res.dropna(subset=['home', 'away', 'hg', 'ag'])
+
+def build_team_form(df, last_n=FORM_LAST_N, clean_k=FORM_CLEAN_K):
+    """
+    Long team-match frame (one row per team per match, oldest first) with
+    rolling form columns as of the end of each match.
+    """
+    res = _results_frame(df)
+    if res.empty:
+        return pd.DataFrame()
+
+    n = len(res)
+    long = pd.DataFrame({
+        'team': np.concatenate([res['home'].to_numpy(), res['away'].to_numpy()]),
+        'team_id': np.concatenate([team_ids(res['home']), team_ids(res['away'])]),
+        'date': np.concatenate([res['date'].to_numpy(), res['date'].to_numpy()]),
+        'order': np.concatenate([np.arange(n), np.arange(n)]),
+        'is_home': np.repeat([True, False], n),
+        'gf': np.concatenate([res['hg'].to_numpy(), res['ag'].to_numpy()]),
+        'ga': np.concatenate([res['ag'].to_numpy(), res['hg'].to_numpy()]),
+        'xg': np.concatenate([res['hxg'].to_numpy(), res['axg'].to_numpy()]),
+    })
+    long['xg'] = long['xg'].fillna(long['gf'])  # CSVs carry no xG: goals stand in
+    long['clean'] = (long['ga'] == 0).astype(int)
+    long['btts_no'] = ((long['gf'] == 0) | (long['ga'] == 0)).astype(int)
+    long['home_win'] = (long['is_home'] & (long['gf'] > long['ga'])).astype(int)
+    long = long.sort_values(['team_id', 'date', 'order'], na_position='last', kind='mergesort').reset_index(drop=True)
+
+    # Rolling sums as differences of per-team cumulative sums (no Python loop per team)
+    g = long.groupby('team_id', sort=False)
+    for src_col, window, out in (('gf', last_n, 'last5_goals_scored'),
+                                 ('ga', last_n, 'last5_goals_conceded'),
+                                 ('clean', clean_k, 'clean_sheets_last3'),
+                                 ('clean', clean_k + 1, 'clean_sheets_last4')):
+        cum = g[src_col].cumsum()
+        long[out] = cum - cum.groupby(long['team_id']).shift(window).fillna(0)
+    long['matches_played'] = g.cumcount() + 1
+    
+    # Season-to-date rates
+    played = long['matches_played']
+    long['avg_goals_scored'] = g['gf'].cumsum() / played
+    long['avg_xg'] = g['xg'].cumsum() / played
+    long['clean_sheets_pct'] = g['clean'].cumsum() / played * 100
+    long['btts_no_pct'] = g['btts_no'].cumsum() / played * 100
+    home_played = g['is_home'].cumsum()
+    long['home_winrate'] = (g['home_win'].cumsum() / home_played.where(home_played > 0)) * 100
+    return long
+
+def build_team_form_table(df, last_n=FORM_LAST_N, clean_k=FORM_CLEAN_K):
+    """Current form per team (indexed by team id), built once per league"""
+    if df is None or df.empty:
+        return pd.DataFrame()
+    long = build_team_form(df, last_n, clean_k)
+    if long.empty:
+        return long
+    return long.groupby('team_id', sort=False)[FORM_COLUMNS].last()
+
+def lookup_team_form(form_table, team_name):
+    """O(1) lookup of a team's row in the form table"""
+    tid = team_id(team_name)
+    if form_table is None or form_table.empty or tid not in form_table.index:
+        return None
+    row = form_table.loc[tid]
+    return {
+        'last5_goals_scored': int(row['last5_goals_scored']),
+        'last5_goals_conceded': int(row['last5_goals_conceded']),
+        'clean_sheets_last3': int(row['clean_sheets_last3']),
+        'matches_played': int(row['matches_played'])
+    }
+
 def calculate_team_stats(df, team_name):
     """Calculate team performance stats from historical data"""
-    if df.empty:
+    if df is None or df.empty:
         return None
-    
     try:
-        # Filter matches where team played (home or away)
-        team_matches = df[
-            (df.get('HomeTeam', df.get('home_team', '')) == team_name) |
-            (df.get('AwayTeam', df.get('away_team', '')) == team_name)
-        ].copy()
-        
-        if team_matches.empty:
-            return None
-        
-        # Sort by date (most recent last)
-        if 'Date' in team_matches.columns:
-            team_matches['Date'] = pd.to_datetime(team_matches['Date'], dayfirst=True, errors='coerce')
-            team_matches = team_matches.sort_values('Date')
-        
-        # Last 5 matches
-        last_5 = team_matches.tail(5)
-        
-        # Calculate goals for/against
-        goals_for = 0
-        goals_against = 0
-        for _, match in last_5.iterrows():
-            home_team = match.get('HomeTeam', match.get('home_team'))
-            fthg = match.get('FTHG', match.get('home_goals', 0))
-            ftag = match.get('FTAG', match.get('away_goals', 0))
-            
-            if home_team == team_name:
-                goals_for += fthg
-                goals_against += ftag
-            else:
-                goals_for += ftag
-                goals_against += fthg
-        
-        # Last 3 matches (clean sheets)
-        last_3 = team_matches.tail(3)
-        clean_sheets = 0
-        for _, match in last_3.iterrows():
-            home_team = match.get('HomeTeam', match.get('home_team'))
-            fthg = match.get('FTHG', match.get('home_goals', 0))
-            ftag = match.get('FTAG', match.get('away_goals', 0))
-            
-            if home_team == team_name and ftag == 0:
-                clean_sheets += 1
-            elif home_team != team_name and fthg == 0:
-                clean_sheets += 1
-        
-        return {
-            'last5_goals_scored': goals_for,
-            'last5_goals_conceded': goals_against,
-            'clean_sheets_last3': clean_sheets,
-            'matches_played': len(team_matches)
-        }
+        return lookup_team_form(build_team_form_table(df), team_name)
     except Exception as e:
         print(f"Error calculating stats for {team_name}: {e}")
         return None
 
-def apply_league_filters(row, profile, league_name, historical_df=None):
-    """Apply statistical filters based on league profile"""
+def apply_league_filters(row, profile, league_name, historical_df=None, form_table=None):
+    """Apply statistical filters based on league profile (single fixture; see league_filter_mask)"""
     home = row.get('home_team', row.get('HomeTeam', ''))
     away = row.get('away_team', row.get('AwayTeam', ''))
     
-    # 1. Check if this is a top team match
-    is_top_match = home in profile['team_top'] or away in profile['team_top']
-    if not is_top_match:
+    # No top team involved -> nothing to check
+    top_ids = set(team_ids(profile['team_top']))
+    if team_id(home) not in top_ids and team_id(away) not in top_ids:
         return False
     
-    # 2. Get opponent (the non-top team)
-    opponent = away if home in profile['team_top'] else home
-    
-    # 3. If no historical data, allow match (trust watchlist/basic filter)
-    if historical_df is None or historical_df.empty:
-        return True
-    
-    # 4. Get opponent stats
-    opp_stats = calculate_team_stats(historical_df, opponent)
-    
-    # 5. If no stats available for opponent, allow (new team or data gap)
-    if not opp_stats:
-        return True
-    
-    # 6. Filter: Opponent goals scored in last 5 matches
-    if 'opp_last5_max' in profile:
-        if opp_stats['last5_goals_scored'] > profile['opp_last5_max']:
-            return False  # Opponent too strong offensively
-    
-    # 7. Filter: Top team clean sheets in last 3 (if configured)
-    if 'clean_last3_min' in profile:
-        top_team = home if home in profile['team_top'] else away
-        top_stats = calculate_team_stats(historical_df, top_team)
-        if top_stats and top_stats['clean_sheets_last3'] < profile['clean_last3_min']:
-            return False  # Top team not defensively solid
-    
-    return True
+    if form_table is None:
+        form_table = build_team_form_table(historical_df)
+    home_form, away_form = fixture_form(form_table, [home], [away])
+    features = fixture_features([home], [away], home_form, away_form, profile['team_top'], watchlist=[''])
+    return bool(league_filter_mask(features, profile).iloc[0])
 
 def calculate_confidence(home_team, away_team, watchlist_badge, opp_stats, top_stats, league_name):
-    """Calculate confidence score 0-100 based on multiple factors"""
+    """Heuristic confidence score 0-100 (fallback for leagues without a score model)"""
     base = 70
     
     # 1. Watchlist bonus (0-15 points)
@@ -342,8 +386,7 @@ def calculate_confidence(home_team, away_team, watchlist_badge, opp_stats, top_s
             base += 4   # Moderate attack
     
     # 3. League tier bonus (0-5 points)
-    top_leagues = ['Premier League', 'La Liga', 'Serie A', 'Bundesliga', 'Ligue 1']
-    if league_name in top_leagues:
+    if league_name in TOP_LEAGUES:
         base += 5  # Top 5 leagues have more reliable data
     
     # 4. Top team defensive bonus (0-5 points)
@@ -361,131 +404,414 @@ def calculate_confidence(home_team, away_team, watchlist_badge, opp_stats, top_s
 # ========================================
 # MAIN SCANNER
 # ========================================
-def scan_5leagues(days_ahead=7):
-    """Скан матчей на N дней"""
-    signals = []
+def fixture_form(form_table, home, away):
+    """Per-fixture form rows for both sides (NaN where a team has no history)"""
+    if form_table is None:
+        form_table = pd.DataFrame()
+    home_form = form_table.reindex(index=team_ids(home), columns=FORM_COLUMNS)
+    away_form = form_table.reindex(index=team_ids(away), columns=FORM_COLUMNS)
+    return home_form, away_form
+
+def fixture_features(home, away, home_form, away_form, team_top, watchlist=None):
+    """
+    Fixture-level feature frame for the vectorized filter/confidence below:
+    top_<col> / opp_<col> for every form column, from the top team's side.
+    home_form/away_form: per-fixture form rows (NaN where a team has no history).
+    """
+    home = pd.Series(home).reset_index(drop=True)
+    away = pd.Series(away).reset_index(drop=True)
+    home_form = pd.DataFrame(home_form).reset_index(drop=True)
+    away_form = pd.DataFrame(away_form).reset_index(drop=True)
     
-    for name, config in FILTER_PROFILES.items():
-        print(f"Scanning {name}...")
-        
-        # 1. Try FBref first (if enabled)
-        fixtures = pd.DataFrame()
+    # Joins on team ids: "Manchester Utd" in a profile matches "Man United" in a CSV
+    home_ids = pd.Series(team_ids(home), index=home.index)
+    away_ids = pd.Series(team_ids(away), index=home.index)
+    top_ids = team_ids(team_top)
+    top_is_home = home_ids.isin(top_ids)
+    
+    features = pd.DataFrame({
+        'home': home,
+        'away': away,
+        'home_id': home_ids,
+        'away_id': away_ids,
+        'is_top_match': top_is_home | away_ids.isin(top_ids),
+        'top_is_home': top_is_home,
+    })
+    for col in FORM_COLUMNS:
+        h = home_form[col] if col in home_form else pd.Series(np.nan, index=home.index)
+        a = away_form[col] if col in away_form else pd.Series(np.nan, index=home.index)
+        features[f'top_{col}'] = h.where(top_is_home, a)
+        features[f'opp_{col}'] = a.where(top_is_home, h)
+    features['watchlist'] = list(watchlist) if watchlist is not None else fixture_watchlist_badges(home, away)
+    return features
+
+def league_filter_mask(features, profile):
+    """Vectorized filters: boolean mask over a fixture_features frame"""
+    compiled = profile if hasattr(profile, 'mask') else compile_profile(profile)
+    return compiled.mask(features)
+
+def confidence_vector(features, league_name):
+    """Vectorized calculate_confidence over a fixture_features frame"""
+    badge = features['watchlist']
+    opp = features['opp_last5_goals_scored']
+    clean = features['top_clean_sheets_last3']
+    score = np.full(len(features), 70)
+    score += np.select([badge == '👁️ W', badge == '🔍 W'], [15, 10], 0)
+    score += np.select([opp < 3, opp < 5, opp < 7], [10, 7, 4], 0)
+    score += 5 if league_name in TOP_LEAGUES else 0
+    score += np.select([clean >= 2, clean == 1], [5, 3], 0)
+    return pd.Series(np.minimum(score, 99), index=features.index)
+
+def model_confidence(p_under35):
+    """Confidence 1-99 from the score model's P(Under 3.5)"""
+    return pd.Series(np.clip(np.round(np.asarray(p_under35) * 100), 1, 99).astype(int),
+                     index=getattr(p_under35, 'index', None))
+
+def league_score_model(name, historical_df):
+    """Dixon-Coles model of the league's current season (None without enough results)"""
+    if historical_df is None or historical_df.empty:
+        return None
+    return scoring.league_model(name, CSV_SEASON, _results_frame(historical_df))
+
+# ========================================
+# INCREMENTAL SCAN CACHE
+# ========================================
+SCAN_CACHE_FILE = "data/scan_cache.json"
+SCAN_LOGIC_VERSION = 6  # Bump when filter/confidence logic changes to invalidate stored results
+_scan_cache_lock = threading.Lock()
+
+def league_fingerprint(name, config, upcoming):
+    """Hash of everything a league's signals depend on"""
+    fixtures_key = ""
+    if not upcoming.empty:
+        slate = pd.DataFrame({
+            'date': upcoming['date'].astype(str),
+            'home': _team_column(upcoming, 'home').astype(str),
+            'away': _team_column(upcoming, 'away').astype(str),
+        })
+        fixtures_key = slate.to_csv(index=False)
+    
+    csv_version = None
+    if name in FOOTBALL_DATA_CODES:
+        csv_version = csv_store.version(FOOTBALL_DATA_CODES[name], CSV_SEASON)
+    
+    odds_version = None
+    if 'odds_key' in config and not upcoming.empty:
+        odds_fetcher.get_odds(config['odds_key'])  # Refresh if expired so the stamp is current
+        odds_version = odds_fetcher.last_updated(config['odds_key'])
+    
+    payload = json.dumps([SCAN_LOGIC_VERSION, config, csv_version, odds_version, fixtures_key],
+                         sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def load_scan_cache():
+    """Per-league results from previous scans: {league: {fingerprint, signals, updated}}"""
+    with _scan_cache_lock:
+        if not os.path.exists(SCAN_CACHE_FILE):
+            return {}
+        try:
+            with open(SCAN_CACHE_FILE, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Scan cache unreadable, ignoring: {e}")
+            return {}
+
+def store_league_result(name, fingerprint, signals):
+    with _scan_cache_lock:
+        cache = {}
+        if os.path.exists(SCAN_CACHE_FILE):
+            try:
+                with open(SCAN_CACHE_FILE, "r") as f:
+                    cache = json.load(f)
+            except Exception:
+                cache = {}
+        cache[name] = {'fingerprint': fingerprint, 'signals': signals, 'updated': time.time()}
+        os.makedirs(os.path.dirname(SCAN_CACHE_FILE), exist_ok=True)
+        tmp = SCAN_CACHE_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(cache, f, ensure_ascii=False, default=str)
+        os.replace(tmp, SCAN_CACHE_FILE)
+
+def _team_column(df, side):
+    """Home/away team names whatever the source's column naming"""
+    for col in (f'{side}_team', side.capitalize(), f'{side.capitalize()}Team'):
+        if col in df.columns:
+            return df[col]
+    return pd.Series('', index=df.index)
+
+def load_league_inputs(name, config, days_ahead=7, cancel=None):
+    """Fixtures in the scan window + full-season history for one league"""
+    print(f"Scanning {name}...")
+    
+    # 1. Try FBref first (if enabled)
+    fixtures = pd.DataFrame()
+    if USE_FBREF:
+        fixtures = load_fbref_fixtures(config['fbref_id'])
+    
+    # 2. Fallback to CSV if empty
+    if fixtures.empty:
         if USE_FBREF:
-            fixtures = load_fbref_fixtures(config['fbref_id'])
+            print(f"FBref empty for {name}, trying CSV...")
+        fixtures = load_football_data_csv(name)
         
-        # 2. Fallback to CSV if empty
-        if fixtures.empty:
-            if USE_FBREF:
-                print(f"FBref empty for {name}, trying CSV...")
-            fixtures = load_football_data_csv(name)
-            
-        # 3. Fallback to Odds API (The Ultimate Fallback)
-        if fixtures.empty and 'odds_key' in config:
-            print(f"CSV empty for {name}, trying Odds API...")
-            odds_data = odds_fetcher.get_odds(config['odds_key'])
-            if odds_data:
-                # Normalize Odds API data to DataFrame
-                # expected: date, home_team, away_team
-                clean_data = []
-                for m in odds_data:
-                    clean_data.append({
-                        'date': m['commence_time'],
-                        'home_team': m['home_team'],
-                        'away_team': m['away_team'],
-                        'odds_h': m['h2h']['home'],
-                        'odds_a': m['h2h']['away']
-                    })
-                fixtures = pd.DataFrame(clean_data)
-                
-                # Convert date to datetime (UTC by default from Odds API)
-                fixtures['date'] = pd.to_datetime(fixtures['date'])
-                
-                # Check if timezone aware, if not assume UTC (Odds API returns ISO8601 with Z usually)
-                if fixtures['date'].dt.tz is None:
-                    fixtures['date'] = fixtures['date'].dt.tz_localize('UTC')
-                
-                # Convert to MSK (Europe/Moscow or UTC+3)
-                # Since pytz might not be installed (though pandas usually has it), we can use fixed offset if needed
-                # But let's try standard tz_convert with 'Europe/Moscow' or simple timedelta if relying on minimal env
-                try:
-                    fixtures['date'] = fixtures['date'].dt.tz_convert('Europe/Moscow').dt.tz_localize(None)
-                except:
-                    # Fallback manually to UTC+3
-                    fixtures['date'] = fixtures['date'] + pd.Timedelta(hours=3)
-                    fixtures['date'] = fixtures['date'].dt.tz_localize(None) # Make naive local
-
-        if not fixtures.empty:
-            # Normalize structure
-            if 'date' not in fixtures.columns and 'Date' in fixtures.columns:
-                fixtures['date'] = pd.to_datetime(fixtures['Date'], dayfirst=True, errors='coerce')
-            elif 'date' in fixtures.columns and not pd.api.types.is_datetime64_any_dtype(fixtures['date']):
-                fixtures['date'] = pd.to_datetime(fixtures['date'], dayfirst=True, errors='coerce')
-            
-            
-            # 5. Load historical data for stats (full season CSV)
-            historical_df = load_football_data_csv(name)  # Load full CSV for stats
+    # 3. Fallback to Odds API (The Ultimate Fallback)
+    check_cancelled(cancel, name)
+    if fixtures.empty and 'odds_key' in config:
+        print(f"CSV empty for {name}, trying Odds API...")
+        odds_data = odds_fetcher.get_odds(config['odds_key'])
+        if odds_data:
+            # Normalize Odds API data to DataFrame
+            # expected: date, home_team, away_team
+            clean_data = []
+            for m in odds_data:
+                clean_data.append({
+                    'date': m['commence_time'],
+                    'home_team': m['home_team'],
+                    'away_team': m['away_team'],
+                    'odds_h': m['h2h']['home'],
+                    'odds_a': m['h2h']['away']
+                })
+            fixtures = pd.DataFrame(clean_data)
             
-            # Drop invalid dates
-            fixtures = fixtures.dropna(subset=['date'])
+            # Convert date to datetime (UTC by default from Odds API)
+            fixtures['date'] = pd.to_datetime(fixtures['date'])
             
-            # Filter upcoming
-            today = datetime.now()
-            week = today + timedelta(days=days_ahead)
+            # Check if timezone aware, if not assume UTC (Odds API returns ISO8601 with Z usually)
+            if fixtures['date'].dt.tz is None:
+                fixtures['date'] = fixtures['date'].dt.tz_localize('UTC')
             
-            mask = (fixtures['date'] >= today) & (fixtures['date'] <= week)
-            upcoming = fixtures[mask]
-            
-            for _, match in upcoming.iterrows():
-                # Pass historical data to filter function
-                if apply_league_filters(match, config, name, historical_df):
-                    date_str = match['date'].strftime('%Y-%m-%d %H:%M (MSK)')
-                    home_team = match.get('home_team') or match.get('Home')
-                    away_team = match.get('away_team') or match.get('Away')
-                    
-                    # Check watchlist
-                    watchlist_badge = ""
-                    if is_watchlist_team(home_team) or is_watchlist_team(away_team):
-                        home_cat, home_badge = get_watchlist_info(home_team)
-                        away_cat, away_badge = get_watchlist_info(away_team)
-                        watchlist_badge = home_badge or away_badge or "👁️ W"
-                    
-                    # Get stats for confidence calculation
-                    top_team = home_team if home_team in config['team_top'] else away_team
-                    opponent = away_team if home_team in config['team_top'] else home_team
-                    
-                    opp_stats = calculate_team_stats(historical_df, opponent) if (historical_df is not None and not historical_df.empty) else None
-                    top_stats = calculate_team_stats(historical_df, top_team) if (historical_df is not None and not historical_df.empty) else None
-                    
-                    # Calculate dynamic confidence
-                    confidence_score = calculate_confidence(
-                        home_team, away_team, watchlist_badge,
-                        opp_stats, top_stats, name
-                    )
-                    
-                    # Fetch real odds
-                    real_odds = None
-                    if 'odds_key' in config:
-                        real_odds = get_real_odds(config['odds_key'], home_team, away_team)
-                    
-                    # Use real odds or fallback to min_odds
-                    signal_odds = real_odds if real_odds else config.get('min_odds', 1.80)
-                    
-                    signals.append({
-                        'League': name,
-                        'Date': date_str,
-                        'Home': home_team,
-                        'Away': away_team,
-                        'Prediction': 'Under 3.5 Opponent Goals',
-                        'Odds': round(signal_odds, 2),
-                        'Confidence': confidence_score,  # Now a number 70-99
-                        'Watchlist': watchlist_badge
-                    })
+            # Convert to MSK (Europe/Moscow or UTC+3)
+            # Since pytz might not be installed (though pandas usually has it), we can use fixed offset if needed
+            # But let's try standard tz_convert with 'Europe/Moscow' or simple timedelta if relying on minimal env
+            try:
+                fixtures['date'] = fixtures['date'].dt.tz_convert('Europe/Moscow').dt.tz_localize(None)
+            except:
+                # Fallback manually to UTC+3
+                fixtures['date'] = fixtures['date'] + pd.Timedelta(hours=3)
+                fixtures['date'] = fixtures['date'].dt.tz_localize(None) # Make naive local
+
+    if fixtures.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    
+    # Normalize structure
+    if 'date' not in fixtures.columns and 'Date' in fixtures.columns:
+        fixtures['date'] = pd.to_datetime(fixtures['Date'], dayfirst=True, errors='coerce')
+    elif 'date' in fixtures.columns and not pd.api.types.is_datetime64_any_dtype(fixtures['date']):
+        fixtures['date'] = pd.to_datetime(fixtures['date'], dayfirst=True, errors='coerce')
+    
+    # 5. Load historical data for stats (full season CSV)
+    check_cancelled(cancel, name)
+    historical_df = load_football_data_csv(name)  # Load full CSV for stats
+    
+    # Drop invalid dates
+    fixtures = fixtures.dropna(subset=['date'])
+    
+    # Filter upcoming
+    today = datetime.now()
+    week = today + timedelta(days=days_ahead)
+    
+    mask = (fixtures['date'] >= today) & (fixtures['date'] <= week)
+    upcoming = fixtures[mask]
+    return upcoming, historical_df
+
+def evaluate_league(name, config, upcoming, historical_df, cancel=None):
+    """Apply filters, confidence and odds to a league's upcoming fixtures"""
+    signals = []
+    if upcoming.empty:
+        return signals
+    
+    form_table = build_team_form_table(historical_df)  # One pass per league
+    
+    # Team names may come as home_team (FBref/Odds API) or HomeTeam (CSV)
+    home_names = _team_column(upcoming, 'home')
+    away_names = _team_column(upcoming, 'away')
+    
+    # Whole slate at once: form lookup, watchlist tags, filters and confidence
+    home_form, away_form = fixture_form(form_table, home_names, away_names)
+    features = fixture_features(home_names, away_names, home_form, away_form, config['team_top'])
+    compiled = COMPILED_PROFILES.get(name) or compile_profile(config, name)
+    mask = compiled.mask(features).to_numpy()
+    if not mask.any():
+        return signals
+    
+    picked = features[mask]
+    
+    # Score model: confidence, probable scores and fair odds for the slate in one pass
+    model = league_score_model(name, historical_df)
+    probs = None
+    if model is not None:
+        probs = scoring.slate_probabilities(model, picked['home'], picked['away']).set_axis(picked.index)
+        confidence = model_confidence(probs['p_under35'])
+    else:
+        confidence = confidence_vector(picked, name)  # No season results: heuristic
+    dates = upcoming['date'].to_numpy()[mask]
+    
+    # Market for the slate: one odds index and one totals consensus per league, from the cached ladder.
+    # Only the Under 3.5 line prices the pick; fixtures quoted on other lines only (the bulk
+    # endpoint's main line is usually 2.5) stay unpriced so they are never ranked by another market.
+    market = pd.DataFrame(np.nan, index=picked.index, columns=['line', 'p_under', 'best_under', 'best_under_book'])
+    if 'odds_key' in config:
+        check_cancelled(cancel, name)
+        odds_index = get_odds_index(config['odds_key'])
+        consensus = get_league_consensus(config['odds_key'])
+        event_ids = match_events(odds_index, picked['home'], picked['away'])
+        market = consensus.reindex(event_ids)[market.columns].set_axis(picked.index)
+        off_line = market['line'].notna() & (market['line'] != UNDER_LINE)
+        if off_line.any():
+            print(f"  [Odds] {name}: {int(off_line.sum())} fixtures quoted without an Under {UNDER_LINE} line, left unpriced")
+        market = market.where(~off_line)
+    p_model = np.full(len(picked), np.nan)
+    if probs is not None:
+        p_model = scoring.p_under_line(probs['exp_home'], probs['exp_away'], model.rho, market['line'])
+    edge = pd.Series(value_edge(p_model, market['best_under']), index=picked.index)
+    
+    for date, (pos, fixture) in zip(dates, picked.iterrows()):
+        # Best Under 3.5 price across bookmakers, or the profile's min_odds
+        best = market.at[pos, 'best_under']
+        signal_odds = float(best) if pd.notna(best) else config.get('min_odds', 1.80)
+        
+        signals.append({
+            'League': name,
+            'Date': pd.Timestamp(date).strftime('%Y-%m-%d %H:%M (MSK)'),
+            'Home': fixture['home'],
+            'Away': fixture['away'],
+            'Prediction': 'Under 3.5 Total Goals',
+            'Odds': round(signal_odds, 2),
+            'Confidence': int(confidence[pos]),  # 1-99 (P(Under 3.5) %), 70-99 heuristic fallback
+            'Watchlist': fixture['watchlist'],
+            **(model_fields(probs.loc[pos]) if probs is not None else {}),
+            # Market fields: Under 3.5 consensus, None where the line is not quoted
+            'Market Line': _rounded(market.at[pos, 'line'], 1),
+            'Market Prob': _rounded(market.at[pos, 'p_under'], 4),
+            'Best Book': market.at[pos, 'best_under_book'] if pd.notna(market.at[pos, 'best_under_book']) else None,
+            'Edge': _rounded(edge[pos], 4),
+        })
+    
+    return signals
+
+def _rounded(value, digits):
+    return round(float(value), digits) if pd.notna(value) else None
+
+def model_fields(row):
+    """Signal fields from one slate_probabilities row"""
+    return {
+        'Probable Scores': row['probable_scores'],
+        'P Under 3.5': round(float(row['p_under35']), 4),
+        'Fair Odds': round(float(row['fair_under35']), 2),
+        'Exp Home': round(float(row['exp_home']), 3),
+        'Exp Away': round(float(row['exp_away']), 3),
+        'Rho': round(float(row['rho']), 3),
+    }
+
+def scan_league(name, config, days_ahead=7, incremental=False, cancel=None):
+    """
+    Скан одной лиги: returns list of signal dicts.
+    incremental: reuse the stored result when the league's inputs are unchanged.
+    cancel: optional threading.Event; once set, the scan stops at the next
+    checkpoint (ScanCancelled) without further fetches or cache writes.
+    """
+    upcoming, historical_df = load_league_inputs(name, config, days_ahead, cancel)
+    check_cancelled(cancel, name)
+    # Fingerprinting may refresh the league's odds, so full scans skip it (stored unfingerprinted)
+    fingerprint = league_fingerprint(name, config, upcoming) if incremental else None
+    
+    if incremental:
+        cached = load_scan_cache().get(name)
+        if cached and cached.get('fingerprint') == fingerprint:
+            print(f"♻️ {name} unchanged, reusing {len(cached['signals'])} cached signals")
+            return cached['signals']
+    
+    signals = evaluate_league(name, config, upcoming, historical_df, cancel)
+    check_cancelled(cancel, name)
+    store_league_result(name, fingerprint, signals)
+    return signals
+
+def scan_5leagues(days_ahead=7, max_workers=None, league_timeout=None, progress=None, incremental=False):
+    """
+    Скан матчей на N дней.
+    progress: optional callback(league, status, **info), status in
+    running / done / timeout / failed (called from worker threads).
+    incremental: only recompute leagues whose inputs changed since the last scan.
+    """
+    if max_workers is None:
+        max_workers = SCAN_WORKERS
+    if league_timeout is None:
+        league_timeout = SCAN_LEAGUE_TIMEOUT
+    
+    def report(name, status, **info):
+        if progress:
+            try:
+                progress(name, status, **info)
+            except Exception as e:
+                print(f"Progress callback error: {e}")
+    
+    started = {}
+    timed_out = set()  # Abandoned leagues keep their 'timeout' status when their thread finishes
+    cancels = {name: threading.Event() for name in FILTER_PROFILES}  # Set on timeout: stop at next checkpoint
+    
+    def timed_scan(name, config):
+        started[name] = time.monotonic()
+        report(name, 'running')
+        try:
+            league_signals = scan_league(name, config, days_ahead, incremental, cancels[name])
+        except ScanCancelled:
+            print(f"🛑 {name} stopped after timeout")
+            raise
+        except Exception as e:
+            if name not in timed_out:
+                report(name, 'failed', seconds=round(time.monotonic() - started[name], 2), error=str(e))
+            raise
+        if name not in timed_out:
+            report(name, 'done', seconds=round(time.monotonic() - started[name], 2), signals=len(league_signals))
+        return league_signals
+    
+    results = {}
+    if max_workers <= 1:
+        for name, config in FILTER_PROFILES.items():
+            try:
+                results[name] = timed_scan(name, config)
+            except Exception as e:
+                print(f"Error scanning {name}: {e}")
+    else:
+        # Fan leagues out; each gets its own deadline so one slow host can't stall the scan
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scan")
+        futures = {name: pool.submit(timed_scan, name, config)
+                   for name, config in FILTER_PROFILES.items()}
+        for name, future in futures.items():
+            try:
+                while True:
+                    try:
+                        results[name] = future.result(timeout=1.0 if league_timeout else None)
+                        break
+                    except FuturesTimeout:
+                        # Deadline counts from when the league started, not while it sat in the queue
+                        begun = started.get(name)
+                        if begun is not None and time.monotonic() - begun >= league_timeout:
+                            raise
+            except FuturesTimeout:
+                print(f"⏱️ {name} timed out after {league_timeout}s, skipping")
+                timed_out.add(name)
+                cancels[name].set()
+                report(name, 'timeout', seconds=league_timeout)
+            except Exception as e:
+                print(f"Error scanning {name}: {e}")
+        pool.shutdown(wait=False, cancel_futures=True)
+    
+    # Deterministic merge: profile order, regardless of completion order
+    signals = []
+    for name in FILTER_PROFILES:
+        signals.extend(results.get(name, []))
+    
+    # Value coverage: signals with an Under 3.5 price (the rest are ranked by date)
+    if signals:
+        priced = sum(1 for sig in signals if sig.get('Edge') is not None)
+        print(f"💱 Priced {priced}/{len(signals)} signals on Under {UNDER_LINE}")
     
     # If no strict signals, get popular matches
     if not signals:
         print("No strict signals found. Fetching popular matches...")
         for name, config in FILTER_PROFILES.items():
-            if name not in ["Premier League", "La Liga", "Serie A", "Bundesliga", "Ligue 1"]:
+            if name not in TOP_LEAGUES:
                 continue
                 
             try:
@@ -500,13 +826,14 @@ def scan_5leagues(days_ahead=7):
                     fixtures = fixtures.dropna(subset=['date'])
                     today = datetime.now()
                     upcoming = fixtures[(fixtures['date'] >= today) & (fixtures['date'] <= today + timedelta(days=days_ahead))]
+                    top_ids = set(team_ids(config['team_top']))
                     
                     for idx, row in upcoming.iterrows():
                         home = row.get('HomeTeam') or row.get('Home')
                         away = row.get('AwayTeam') or row.get('Away')
                         
                         # Check if top team is playing
-                        is_top_match = (home in config['team_top']) or (away in config['team_top'])
+                        is_top_match = team_id(home) in top_ids or team_id(away) in top_ids
                         
                         if is_top_match:
                             signals.append({
@@ -525,11 +852,16 @@ def scan_5leagues(days_ahead=7):
         print("No signals found.")
         signals_df = pd.DataFrame(columns=['League', 'Date', 'Home', 'Away', 'Prediction', 'Odds', 'Confidence'])
     else:
-        signals_df = pd.DataFrame(signals).sort_values('Date').head(10) # Limit to 10 popular
+        signals_df = pd.DataFrame(signals)
+        if 'Edge' in signals_df.columns:
+            # Rank by value (edge at the best price); unpriced signals follow by date
+            signals_df = signals_df.sort_values(['Edge', 'Date'], ascending=[False, True], na_position='last', kind='mergesort')
+        else:
+            signals_df = signals_df.sort_values('Date', kind='mergesort')
+        signals_df = signals_df.head(10) # Limit to 10 popular
     
-    output_file = 'under35_signals_5leagues.csv'
-    signals_df.to_csv(output_file, index=False)
-    print(f"✅ {len(signals_df)} signals saved to {output_file}!")
+    scan_id = signal_store.publish(signals_df, days=days_ahead)
+    print(f"✅ {len(signals_df)} signals published as scan #{scan_id}!")
     return signals_df
 
 # ========================================
@@ -6,6 +6,9 @@ Two categories:
 2. Low-tier teams with strong Under 2.5 track record
 """
 
+from collections import deque
+from functools import lru_cache
+
 # ===========================================
 # ELITE DEFENSIVE TEAMS
 # ===========================================
@@ -109,15 +112,102 @@ LOW_TIER_STARS = {
 ALL_WATCHLIST_TEAMS = ELITE_DEFENSIVE_TEAMS | LOW_TIER_STARS
 
 
+# ===========================================
+# COMPILED MATCHER
+# ===========================================
+# Matching is case-insensitive and bidirectional: a team matches an entry if
+# either name contains the other. Elite wins when both categories match.
+CATEGORIES = (
+    ("elite", "👁️ W", ELITE_DEFENSIVE_TEAMS),
+    ("low_tier_star", "🔍 W", LOW_TIER_STARS),
+)
+
+
+class _Automaton:
+    """Aho–Corasick automaton: finds every entry contained in a name in one pass"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [set()]
+        for pattern, payload in patterns.items():
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(set())
+                    self.goto[node][ch] = nxt
+                node = nxt
+            self.out[node].add(payload)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] | self.out[self.fail[nxt]]
+
+    def search(self, text):
+        node = 0
+        found = set()
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            found |= self.out[node]
+        return found
+
+
+def _compile():
+    # Pattern -> best (lowest) category rank
+    patterns = {}
+    for rank, (_, _, teams) in enumerate(CATEGORIES):
+        for team in teams:
+            key = team.lower()
+            patterns[key] = min(rank, patterns.get(key, rank))
+
+    # Reverse direction (name inside an entry): every substring of every entry
+    substrings = {}
+    for key, rank in patterns.items():
+        for i in range(len(key)):
+            for j in range(i + 1, len(key) + 1):
+                sub = key[i:j]
+                substrings[sub] = min(rank, substrings.get(sub, rank))
+    return _Automaton(patterns), substrings
+
+
+_AUTOMATON, _SUBSTRINGS = _compile()
+
+
+@lru_cache(maxsize=8192)
+def match_watchlist(team_name):
+    """
+    Compiled lookup: (category, badge) or (None, None)
+    """
+    if not team_name:
+        return (None, None)
+    team_normalized = team_name.strip().lower()
+    ranks = _AUTOMATON.search(team_normalized)
+    if team_normalized in _SUBSTRINGS:
+        ranks.add(_SUBSTRINGS[team_normalized])
+    if not ranks:
+        return (None, None)
+    category, badge, _ = CATEGORIES[min(ranks)]
+    return (category, badge)
+
+
 def is_watchlist_team(team_name):
     """
     Check if team is on watchlist (case-insensitive, fuzzy)
     """
-    team_normalized = team_name.strip().lower()
-    for watchlist_team in ALL_WATCHLIST_TEAMS:
-        if watchlist_team.lower() in team_normalized or team_normalized in watchlist_team.lower():
-            return True
-    return False
+    return match_watchlist(team_name)[0] is not None
 
 
 def get_watchlist_info(team_name):
@@ -125,16 +215,23 @@ def get_watchlist_info(team_name):
     Get watchlist category and badge
     Returns: (category, badge) or (None, None)
     """
-    team_normalized = team_name.strip().lower()
-    
-    # Check elite defensive first
-    for elite_team in ELITE_DEFENSIVE_TEAMS:
-        if elite_team.lower() in team_normalized or team_normalized in elite_team.lower():
-            return ("elite", "👁️ W")
-    
-    # Check low-tier stars
-    for star_team in LOW_TIER_STARS:
-        if star_team.lower() in team_normalized or team_normalized in star_team.lower():
-            return ("low_tier_star", "🔍 W")
-    
-    return (None, None)
+    return match_watchlist(team_name)
+
+
+def tag_watchlist(team_names):
+    """
+    Batch API: (category, badge) for each name, each distinct name matched once
+    """
+    names = list(team_names)
+    lookup = {name: match_watchlist(name) for name in set(names)}
+    return [lookup[name] for name in names]
+
+
+def fixture_watchlist_badges(home_teams, away_teams):
+    """
+    Badge per fixture (home badge first, then away, else ""), for whole columns at once
+    """
+    home_teams, away_teams = list(home_teams), list(away_teams)
+    tags = tag_watchlist(home_teams + away_teams)
+    n = len(home_teams)
+    return [tags[i][1] or tags[n + i][1] or "" for i in range(n)]